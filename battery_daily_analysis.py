@@ -8,7 +8,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, time
 from pathlib import Path
-import json
+
+from gap_filling import regularize
+from result_stream import ResultStreamWriter, write_json_from_stream
+from stage_profiler import print_report, setup_from_argv, stage
 
 # Battery specs
 BATTERY_USABLE_KWH = 27.36
@@ -25,7 +28,7 @@ def load_solar_data(csv_files):
                     df = pd.read_csv(csv_file, encoding=encoding, encoding_errors='ignore')
                     df['datetime'] = pd.to_datetime(df['RTCTime'], format='%Y/%m/%d %H:%M:%S')
                     df = df[['datetime', 'Power Now (W)']].copy()
-                    df['Power Now (W)'] = pd.to_numeric(df['Power Now (W)'], errors='coerce').fillna(0)
+                    df['Power Now (W)'] = pd.to_numeric(df['Power Now (W)'], errors='coerce')
                     all_data.append(df)
                     break
                 except:
@@ -35,14 +38,23 @@ def load_solar_data(csv_files):
 
     combined = pd.concat(all_data, ignore_index=True)
     combined = combined.sort_values('datetime').drop_duplicates(subset=['datetime']).set_index('datetime')
-    return combined
+    return regularize(combined)
 
 def analyze_daily_charging(solar_df):
     """
     Analyze daily battery charging patterns
 
     Returns:
-        Dictionary with daily charging statistics
+        List of daily charging statistics
+    """
+    return list(iter_daily_charging(solar_df))
+
+def iter_daily_charging(solar_df):
+    """
+    Analyze daily battery charging patterns, one day at a time
+
+    Yields:
+        Daily charging statistics dict per day
     """
     solar_df = solar_df.copy()
     solar_df['date'] = solar_df.index.date
@@ -51,8 +63,6 @@ def analyze_daily_charging(solar_df):
 
     interval_hours = 5 / 60.0  # 5-minute intervals
 
-    daily_results = []
-
     # Group by date
     for date, day_data in solar_df.groupby('date'):
         if len(day_data) == 0:
@@ -94,7 +104,7 @@ def analyze_daily_charging(solar_df):
         # Average SOC by hour
         avg_hourly_soc = {hour: np.mean(soc_list) for hour, soc_list in hourly_soc.items()}
 
-        daily_results.append({
+        yield {
             'date': str(date),
             'day_of_week': pd.Timestamp(date).day_name(),
             'total_solar_kwh': round(total_solar, 2),
@@ -102,125 +112,161 @@ def analyze_daily_charging(solar_df):
             'battery_filled_pct': round((max_soc / BATTERY_USABLE_KWH) * 100, 1),
             'time_to_full': time_to_full,
             'hourly_soc': {str(h): round(v, 2) for h, v in avg_hourly_soc.items()}
-        })
-
-    return daily_results
+        }
 
-def calculate_summary_stats(daily_results):
-    """Calculate summary statistics from daily results"""
+def _season(month):
+    """Season for a month (Southern Hemisphere - Adelaide)"""
+    if month in [12, 1, 2]:
+        return 'Summer'
+    elif month in [3, 4, 5]:
+        return 'Autumn'
+    elif month in [6, 7, 8]:
+        return 'Winter'
+    return 'Spring'
+
+def _minutes(time_to_full):
+    """'HH:MM' -> minutes from midnight (None if it doesn't parse)"""
+    try:
+        h, m = map(int, time_to_full.split(':'))
+        return h * 60 + m
+    except (AttributeError, ValueError):
+        return None
+
+def _hhmm(minutes):
+    return f"{int(minutes // 60):02d}:{int(minutes % 60):02d}"
+
+class SummaryStats:
+    """
+    Running summary statistics, fed one day at a time so results can be streamed
 
-    # Days that reached full charge
-    days_full = [d for d in daily_results if d['time_to_full'] is not None]
+    max_soc_key names the day's peak-SOC field (the enhanced analysis'
+    continuous simulation calls it 'max_soc_kwh').
+    """
 
-    # Extract time to full (convert to minutes from midnight)
-    times_to_full_minutes = []
-    for d in days_full:
-        try:
-            h, m = map(int, d['time_to_full'].split(':'))
-            times_to_full_minutes.append(h * 60 + m)
-        except:
-            continue
+    def __init__(self, max_soc_key='max_battery_soc_kwh'):
+        self.max_soc_key = max_soc_key
+        self.total_days = 0
+        self.days_full = 0
+        self.full_minutes_sum = 0
+        self.full_minutes_count = 0
+        self.earliest_full = None
+        self.latest_full = None
+        self.hourly_soc_sum = {}
+        self.hourly_soc_count = {}
+        self.seasons = {}
+
+    def add(self, day):
+        self.total_days += 1
+        for hour, soc in day['hourly_soc'].items():
+            self.hourly_soc_sum[hour] = self.hourly_soc_sum.get(hour, 0.0) + soc
+            self.hourly_soc_count[hour] = self.hourly_soc_count.get(hour, 0) + 1
+
+        season = self.seasons.setdefault(_season(pd.Timestamp(day['date']).month), {
+            'days': 0, 'days_full': 0, 'solar_sum': 0.0, 'max_soc_sum': 0.0, 'minutes_sum': 0, 'minutes_count': 0})
+        season['days'] += 1
+        season['solar_sum'] += day['total_solar_kwh']
+        season['max_soc_sum'] += day[self.max_soc_key]
+
+        time_to_full = day['time_to_full']
+        if time_to_full is None:
+            return
+        self.days_full += 1
+        season['days_full'] += 1
+        self.earliest_full = time_to_full if self.earliest_full is None else min(self.earliest_full, time_to_full)
+        self.latest_full = time_to_full if self.latest_full is None else max(self.latest_full, time_to_full)
+        minutes = _minutes(time_to_full)
+        if minutes is not None:
+            self.full_minutes_sum += minutes
+            self.full_minutes_count += 1
+            season['minutes_sum'] += minutes
+            season['minutes_count'] += 1
+
+    def result(self):
+        # Average hourly SOC across all days
+        avg_soc_by_hour = {}
+        for hour in range(24):
+            count = self.hourly_soc_count.get(str(hour))
+            if count:
+                avg_soc_by_hour[hour] = round(self.hourly_soc_sum[str(hour)] / count, 2)
+
+        seasonal_stats = {}
+        for name, season in self.seasons.items():
+            days = season['days']
+            minutes = season['minutes_count']
+            seasonal_stats[name] = {
+                'total_days': days,
+                'days_reached_full': season['days_full'],
+                'pct_days_full': round((season['days_full'] / days * 100), 1) if days > 0 else 0,
+                'avg_solar_kwh': round(season['solar_sum'] / days, 2),
+                'avg_max_soc_kwh': round(season['max_soc_sum'] / days, 2),
+                'avg_time_to_full': _hhmm(season['minutes_sum'] / minutes) if minutes else None
+            }
+
+        avg_minutes = self.full_minutes_sum / self.full_minutes_count if self.full_minutes_count else None
+        return {
+            'total_days_analyzed': self.total_days,
+            'days_reached_full': self.days_full,
+            'pct_days_full': round((self.days_full / self.total_days * 100), 1) if self.total_days > 0 else 0,
+            'avg_time_to_full_minutes': round(avg_minutes, 0) if avg_minutes is not None else None,
+            'avg_time_to_full': _hhmm(avg_minutes) if avg_minutes is not None else None,
+            'earliest_full': self.earliest_full,
+            'latest_full': self.latest_full,
+            'avg_hourly_soc': avg_soc_by_hour,
+            'seasonal_stats': seasonal_stats
+        }
 
-    # Average hourly SOC across all days
-    all_hours = range(24)
-    avg_soc_by_hour = {}
-    for hour in all_hours:
-        hour_values = []
-        for day in daily_results:
-            if str(hour) in day['hourly_soc']:
-                hour_values.append(day['hourly_soc'][str(hour)])
-        if hour_values:
-            avg_soc_by_hour[hour] = round(np.mean(hour_values), 2)
-
-    # Seasonal breakdown
-    seasons = {}
+def calculate_summary_stats(daily_results):
+    """Calculate summary statistics from daily results (any iterable of day dicts)"""
+    stats = SummaryStats()
     for day in daily_results:
-        date = pd.Timestamp(day['date'])
-        month = date.month
-
-        # Determine season (Southern Hemisphere - Adelaide)
-        if month in [12, 1, 2]:
-            season = 'Summer'
-        elif month in [3, 4, 5]:
-            season = 'Autumn'
-        elif month in [6, 7, 8]:
-            season = 'Winter'
-        else:
-            season = 'Spring'
-
-        if season not in seasons:
-            seasons[season] = []
-        seasons[season].append(day)
-
-    seasonal_stats = {}
-    for season, days in seasons.items():
-        days_reached_full = [d for d in days if d['time_to_full'] is not None]
-        avg_solar = np.mean([d['total_solar_kwh'] for d in days])
-        avg_max_soc = np.mean([d['max_battery_soc_kwh'] for d in days])
-
-        seasonal_times = []
-        for d in days_reached_full:
-            try:
-                h, m = map(int, d['time_to_full'].split(':'))
-                seasonal_times.append(h * 60 + m)
-            except:
-                continue
-
-        avg_time_to_full = None
-        if seasonal_times:
-            avg_minutes = np.mean(seasonal_times)
-            avg_time_to_full = f"{int(avg_minutes // 60):02d}:{int(avg_minutes % 60):02d}"
-
-        seasonal_stats[season] = {
-            'total_days': len(days),
-            'days_reached_full': len(days_reached_full),
-            'pct_days_full': round((len(days_reached_full) / len(days) * 100), 1) if len(days) > 0 else 0,
-            'avg_solar_kwh': round(avg_solar, 2),
-            'avg_max_soc_kwh': round(avg_max_soc, 2),
-            'avg_time_to_full': avg_time_to_full
-        }
+        stats.add(day)
+    return stats.result()
 
-    return {
-        'total_days_analyzed': len(daily_results),
-        'days_reached_full': len(days_full),
-        'pct_days_full': round((len(days_full) / len(daily_results) * 100), 1) if len(daily_results) > 0 else 0,
-        'avg_time_to_full_minutes': round(np.mean(times_to_full_minutes), 0) if times_to_full_minutes else None,
-        'avg_time_to_full': f"{int(np.mean(times_to_full_minutes) // 60):02d}:{int(np.mean(times_to_full_minutes) % 60):02d}" if times_to_full_minutes else None,
-        'earliest_full': min([d['time_to_full'] for d in days_full]) if days_full else None,
-        'latest_full': max([d['time_to_full'] for d in days_full]) if days_full else None,
-        'avg_hourly_soc': avg_soc_by_hour,
-        'seasonal_stats': seasonal_stats
-    }
-
-def main():
+def main(solar_df=None):
+    """Run the analysis; solar_df is a fresh copy of already-loaded readings (default: read the CSVs)"""
     print("=" * 80)
     print("Daily Battery Charging Analysis")
     print("=" * 80)
     print()
 
     # Load solar data
-    data_dir = Path(__file__).parent
-    csv_files = sorted(data_dir.glob("C03AEC7B*.csv"))
+    if solar_df is None:
+        data_dir = Path(__file__).parent
+        csv_files = sorted(data_dir.glob("C03AEC7B*.csv"))
 
-    if not csv_files:
-        print("ERROR: No CSV files found!")
-        return
+        if not csv_files:
+            print("ERROR: No CSV files found!")
+            return
 
-    print(f"Loading {len(csv_files)} CSV files...")
-    solar_df = load_solar_data(csv_files)
+        print(f"Loading {len(csv_files)} CSV files...")
+        with stage('load_solar_data'):
+            solar_df = load_solar_data(csv_files)
     print(f"Loaded {len(solar_df)} records from {solar_df.index.min()} to {solar_df.index.max()}")
     print()
 
-    # Analyze daily charging patterns
+    # Analyze daily charging patterns, streaming each day to disk as it completes
     print("Analyzing daily charging patterns...")
-    daily_results = analyze_daily_charging(solar_df)
-    print(f"Analyzed {len(daily_results)} days")
-    print()
-
-    # Calculate summary statistics
-    print("Calculating summary statistics...")
-    summary = calculate_summary_stats(daily_results)
-    print()
+    # (summary statistics accumulate alongside, so no day is kept in memory)
+    with ResultStreamWriter('battery_daily_charging.ndjson') as writer:
+        stats = SummaryStats()
+        with stage('daily_charging'):
+            for day in iter_daily_charging(solar_df):
+                writer.write('', day)
+                stats.add(day)
+        print(f"Analyzed {stats.total_days} days")
+        print()
+
+        # Calculate summary statistics
+        print("Calculating summary statistics...")
+        with stage('summary_stats'):
+            summary = stats.result()
+        print()
+
+        writer.write_meta('summary', summary)
+        writer.write_meta('battery_spec', {
+            'usable_kwh': BATTERY_USABLE_KWH,
+            'charge_rate_kw': BATTERY_CHARGE_RATE_KW
+        })
 
     # Display results
     print("=" * 80)
@@ -262,21 +308,15 @@ def main():
     print()
     print("=" * 80)
 
-    # Save results
-    results = {
-        'summary': summary,
-        'daily_results': daily_results,  # Include ALL days for granular view
-        'battery_spec': {
-            'usable_kwh': BATTERY_USABLE_KWH,
-            'charge_rate_kw': BATTERY_CHARGE_RATE_KW
-        }
-    }
-
-    with open('battery_daily_charging.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    # Save results (daily records and summary were already streamed above)
+    with stage('save_results'):
+        # Legacy single-document JSON for the HTML build scripts
+        write_json_from_stream('battery_daily_charging.ndjson', 'battery_daily_charging.json')
 
-    print("\nResults saved to battery_daily_charging.json")
+    print("\nResults saved to battery_daily_charging.ndjson (+ battery_daily_charging.json)")
     print("Analysis complete!")
 
 if __name__ == "__main__":
+    setup_from_argv()
     main()
+    print_report()
@@ -10,7 +10,11 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, time
 from pathlib import Path
-import json
+
+from battery_daily_analysis import SummaryStats
+from gap_filling import regularize
+from result_stream import ResultStreamWriter, write_json_from_stream
+from stage_profiler import print_report, profiled, setup_from_argv, stage
 
 # Battery specs
 BATTERY_USABLE_KWH = 27.36
@@ -37,7 +41,7 @@ def load_solar_data(csv_files):
                     df = pd.read_csv(csv_file, encoding=encoding, encoding_errors='ignore')
                     df['datetime'] = pd.to_datetime(df['RTCTime'], format='%Y/%m/%d %H:%M:%S')
                     df = df[['datetime', 'Power Now (W)']].copy()
-                    df['Power Now (W)'] = pd.to_numeric(df['Power Now (W)'], errors='coerce').fillna(0)
+                    df['Power Now (W)'] = pd.to_numeric(df['Power Now (W)'], errors='coerce')
                     all_data.append(df)
                     break
                 except:
@@ -47,8 +51,9 @@ def load_solar_data(csv_files):
 
     combined = pd.concat(all_data, ignore_index=True)
     combined = combined.sort_values('datetime').drop_duplicates(subset=['datetime']).set_index('datetime')
-    return combined
+    return regularize(combined)
 
+@profiled()
 def simulate_single_day(day_data, starting_soc_kwh, interval_hours=5/60.0):
     """
     Simulate battery charging for a single day from a given starting SOC
@@ -91,6 +96,10 @@ def analyze_continuous_simulation(solar_df):
     """
     Continuous simulation: carry SOC from day to day with realistic charging/discharging
     """
+    return list(iter_continuous_simulation(solar_df))
+
+def iter_continuous_simulation(solar_df):
+    """Continuous simulation, yielding each day's results as it completes"""
     solar_df = solar_df.copy()
     solar_df['date'] = solar_df.index.date
     solar_df['hour'] = solar_df.index.hour
@@ -102,8 +111,6 @@ def analyze_continuous_simulation(solar_df):
     # Start with battery at 50% (reasonable assumption)
     battery_soc_kwh = BATTERY_USABLE_KWH * 0.5
 
-    daily_results = []
-
     for date, day_data in solar_df.groupby('date'):
         if len(day_data) == 0:
             continue
@@ -163,7 +170,7 @@ def analyze_continuous_simulation(solar_df):
         total_solar = day_data['Power Now (W)'].sum() * interval_hours / 1000
         avg_hourly_soc = {hour: np.mean(soc_list) for hour, soc_list in hourly_soc.items()}
 
-        daily_results.append({
+        yield {
             'date': str(date),
             'day_of_week': pd.Timestamp(date).day_name(),
             'total_solar_kwh': round(total_solar, 2),
@@ -176,14 +183,16 @@ def analyze_continuous_simulation(solar_df):
             'daily_discharge_kwh': round(daily_discharge_kwh, 2),
             'time_to_full': time_to_full,
             'hourly_soc': {str(h): round(v, 2) for h, v in avg_hourly_soc.items()}
-        })
-
-    return daily_results
+        }
 
 def analyze_scenario_based(solar_df, starting_soc_pct):
     """
     Scenario-based analysis: each day starts at specified SOC (0%, 25%, 50%, 75%)
     """
+    return list(iter_scenario_based(solar_df, starting_soc_pct))
+
+def iter_scenario_based(solar_df, starting_soc_pct):
+    """Scenario-based analysis, yielding each day's results as it completes"""
     solar_df = solar_df.copy()
     solar_df['date'] = solar_df.index.date
     solar_df['hour'] = solar_df.index.hour
@@ -192,8 +201,6 @@ def analyze_scenario_based(solar_df, starting_soc_pct):
     starting_soc_kwh = BATTERY_USABLE_KWH * (starting_soc_pct / 100.0)
     interval_hours = 5 / 60.0
 
-    daily_results = []
-
     for date, day_data in solar_df.groupby('date'):
         if len(day_data) == 0:
             continue
@@ -204,7 +211,7 @@ def analyze_scenario_based(solar_df, starting_soc_pct):
 
         total_solar = day_data['Power Now (W)'].sum() * interval_hours / 1000
 
-        daily_results.append({
+        yield {
             'date': str(date),
             'day_of_week': pd.Timestamp(date).day_name(),
             'total_solar_kwh': round(total_solar, 2),
@@ -213,70 +220,70 @@ def analyze_scenario_based(solar_df, starting_soc_pct):
             'battery_filled_pct': round((max_soc / BATTERY_USABLE_KWH) * 100, 1),
             'time_to_full': time_to_full,
             'hourly_soc': {str(h): round(v, 2) for h, v in avg_hourly_soc.items()}
-        })
-
-    return daily_results
-
-def calculate_summary_stats(daily_results):
-    """Calculate summary statistics"""
-    days_full = [d for d in daily_results if d['time_to_full'] is not None]
-
-    times_to_full_minutes = []
-    for d in days_full:
-        try:
-            h, m = map(int, d['time_to_full'].split(':'))
-            times_to_full_minutes.append(h * 60 + m)
-        except:
-            continue
-
-    return {
-        'total_days_analyzed': len(daily_results),
-        'days_reached_full': len(days_full),
-        'pct_days_full': round((len(days_full) / len(daily_results) * 100), 1) if len(daily_results) > 0 else 0,
-        'avg_time_to_full': f"{int(np.mean(times_to_full_minutes) // 60):02d}:{int(np.mean(times_to_full_minutes) % 60):02d}" if times_to_full_minutes else None,
-        'earliest_full': min([d['time_to_full'] for d in days_full]) if days_full else None,
-        'latest_full': max([d['time_to_full'] for d in days_full]) if days_full else None,
-    }
+        }
 
-def main():
+def main(solar_df=None):
+    """Run the analysis; solar_df is a fresh copy of already-loaded readings (default: read the CSVs)"""
     print("=" * 80)
     print("Enhanced Daily Battery Charging Analysis")
     print("=" * 80)
     print()
 
     # Load solar data
-    data_dir = Path(__file__).parent
-    csv_files = sorted(data_dir.glob("C03AEC7B*.csv"))
+    if solar_df is None:
+        data_dir = Path(__file__).parent
+        csv_files = sorted(data_dir.glob("C03AEC7B*.csv"))
 
-    if not csv_files:
-        print("ERROR: No CSV files found!")
-        return
+        if not csv_files:
+            print("ERROR: No CSV files found!")
+            return
 
-    print(f"Loading {len(csv_files)} CSV files...")
-    solar_df = load_solar_data(csv_files)
+        print(f"Loading {len(csv_files)} CSV files...")
+        with stage('load_solar_data'):
+            solar_df = load_solar_data(csv_files)
     print(f"Loaded {len(solar_df)} records from {solar_df.index.min()} to {solar_df.index.max()}")
     print()
 
-    # OPTION 1: Continuous Simulation
-    print("Running continuous simulation (realistic day-to-day behavior)...")
-    continuous_results = analyze_continuous_simulation(solar_df)
-    continuous_summary = calculate_summary_stats(continuous_results)
-    print(f"Analyzed {len(continuous_results)} days with continuous SOC")
-    print()
-
-    # OPTION 2: Scenario-Based Analysis
-    print("Running scenario-based analysis (different starting SOCs)...")
-    scenarios = {}
-    for starting_pct in [0, 25, 50, 75]:
-        print(f"  - Scenario: Starting at {starting_pct}%...")
-        scenario_results = analyze_scenario_based(solar_df, starting_pct)
-        scenario_summary = calculate_summary_stats(scenario_results)
-        scenarios[f"{starting_pct}%"] = {
-            'starting_soc_pct': starting_pct,
-            'summary': scenario_summary,
-            'daily_results': scenario_results
-        }
-    print()
+    # Daily records stream to disk as each day completes; summary statistics
+    # accumulate alongside, so no day is kept in memory
+    with ResultStreamWriter('battery_daily_charging_enhanced.ndjson') as writer:
+        # OPTION 1: Continuous Simulation
+        print("Running continuous simulation (realistic day-to-day behavior)...")
+        stats = SummaryStats(max_soc_key='max_soc_kwh')
+        with stage('continuous_simulation'):
+            for day in iter_continuous_simulation(solar_df):
+                writer.write('continuous_simulation', day)
+                stats.add(day)
+            continuous_summary = stats.result()
+        writer.write_meta('continuous_simulation/summary', continuous_summary)
+        print(f"Analyzed {stats.total_days} days with continuous SOC")
+        print()
+
+        # OPTION 2: Scenario-Based Analysis
+        print("Running scenario-based analysis (different starting SOCs)...")
+        scenarios = {}
+        for starting_pct in [0, 25, 50, 75]:
+            print(f"  - Scenario: Starting at {starting_pct}%...")
+            section = f"scenario_based/{starting_pct}%"
+            writer.write_meta(f"{section}/starting_soc_pct", starting_pct)
+            stats = SummaryStats()
+            with stage(f"scenario_{starting_pct}pct"):
+                for day in iter_scenario_based(solar_df, starting_pct):
+                    writer.write(section, day)
+                    stats.add(day)
+                scenario_summary = stats.result()
+            writer.write_meta(f"{section}/summary", scenario_summary)
+            scenarios[f"{starting_pct}%"] = {
+                'starting_soc_pct': starting_pct,
+                'summary': scenario_summary
+            }
+        print()
+
+        writer.write_meta('battery_spec', {
+            'usable_kwh': BATTERY_USABLE_KWH,
+            'charge_rate_kw': BATTERY_CHARGE_RATE_KW,
+            'discharge_rate_kw': BATTERY_DISCHARGE_RATE_KW
+        })
 
     # Display summary
     print("=" * 80)
@@ -298,25 +305,15 @@ def main():
         print(f"  Avg time to full:   {summary['avg_time_to_full'] or 'N/A'}")
     print()
 
-    # Save results
-    results = {
-        'continuous_simulation': {
-            'summary': continuous_summary,
-            'daily_results': continuous_results
-        },
-        'scenario_based': scenarios,
-        'battery_spec': {
-            'usable_kwh': BATTERY_USABLE_KWH,
-            'charge_rate_kw': BATTERY_CHARGE_RATE_KW,
-            'discharge_rate_kw': BATTERY_DISCHARGE_RATE_KW
-        }
-    }
-
-    with open('battery_daily_charging_enhanced.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    # Save results (daily records and summaries were already streamed above)
+    with stage('save_results'):
+        # Legacy single-document JSON for the HTML build scripts
+        write_json_from_stream('battery_daily_charging_enhanced.ndjson', 'battery_daily_charging_enhanced.json')
 
-    print("Results saved to battery_daily_charging_enhanced.json")
+    print("Results saved to battery_daily_charging_enhanced.ndjson (+ battery_daily_charging_enhanced.json)")
     print("Analysis complete!")
 
 if __name__ == "__main__":
+    setup_from_argv()
     main()
+    print_report()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Battery Degradation Model
+Usable capacity that fades with use instead of a constant BATTERY_USABLE_KWH.
+
+- Cycle aging: the SOC trajectory from the dispatch simulation is
+  rainflow-counted into cycles; each cycle costs capacity by its depth
+  (Wohler curve fitted to the rated cycle life)
+- Calendar aging: grows with the square root of time, faster at high mean SOC
+
+Capacity is updated per simulated day. Day-level stress (cycle damage and
+mean SOC) is computed once per recorded day at a handful of capacity levels,
+so a multi-year projection interpolates between levels as the battery fades
+instead of re-running the 5-minute simulation for every year.
+
+Run standalone to project capacity over the cached history (default: the
+Monte Carlo horizon):
+    python3 battery_degradation.py [--years=N]
+"""
+
+import sys
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Alpha ESS LFP warranty: 6000 full cycles to 80% of capacity
+CYCLE_LIFE = 6000
+END_OF_LIFE_FADE = 0.20
+WOHLER_EXPONENT = 1.3          # Shallow cycles cost less than their share of a full one
+CALENDAR_FADE_FIRST_YEAR = 0.015  # At 50% mean SOC; grows with sqrt(years)
+CALENDAR_SOC_SENSITIVITY = 1.0    # exp(k * (mean SOC - 0.5)) multiplier
+MIN_CYCLE_DEPTH = 0.005        # Ignore measurement ripple
+
+# Capacity fractions the dispatch simulation is run at, highest first
+CAPACITY_LEVELS = [1.0, 0.9, 0.8, 0.7, 0.6]
+
+# ============================================================================
+# RAINFLOW COUNTING
+# ============================================================================
+
+def turning_points(values: Sequence[float]) -> np.ndarray:
+    """Local extremes of a series (flat runs collapsed), keeping both ends"""
+    v = np.asarray(values, dtype=float)
+    if len(v) < 3:
+        return v
+    diff = np.diff(v)
+    keep = diff != 0
+    v = np.concatenate([v[:1], v[1:][keep]])
+    diff = diff[keep]
+    if len(v) < 3:
+        return v
+    reversal = np.flatnonzero(np.sign(diff[1:]) != np.sign(diff[:-1])) + 1
+    return np.concatenate([v[:1], v[reversal], v[-1:]])
+
+
+def rainflow(values: Sequence[float]) -> List[Tuple[float, float, float]]:
+    """
+    Rainflow cycle counting (ASTM E1049 three-point method)
+
+    Returns:
+        List of (depth, mean, count) with count 1.0 for closed cycles and
+        0.5 for the half cycles left at the ends of the series
+    """
+    cycles = []
+    stack = []
+    for point in turning_points(values).tolist():
+        stack.append(point)
+        while len(stack) >= 3:
+            x = abs(stack[-1] - stack[-2])
+            y = abs(stack[-2] - stack[-3])
+            if x < y:
+                break
+            mean = (stack[-2] + stack[-3]) / 2
+            if len(stack) == 3:
+                cycles.append((y, mean, 0.5))
+                stack.pop(0)
+            else:
+                cycles.append((y, mean, 1.0))
+                last = stack.pop()
+                del stack[-2:]
+                stack.append(last)
+    cycles.extend((abs(b - a), (a + b) / 2, 0.5) for a, b in zip(stack, stack[1:]))
+    return cycles
+
+
+def cycle_damage(cycles: List[Tuple[float, float, float]]) -> float:
+    """Capacity fraction lost to the given cycles (Miner's rule)"""
+    return sum(count * END_OF_LIFE_FADE * depth ** WOHLER_EXPONENT / CYCLE_LIFE
+               for depth, _, count in cycles if depth >= MIN_CYCLE_DEPTH)
+
+
+def day_stress(soc_fraction: Sequence[float]) -> Tuple[float, float]:
+    """(cycle damage, mean SOC) of one day's SOC trajectory (fractions of usable capacity)"""
+    soc = np.asarray(soc_fraction, dtype=float)
+    if len(soc) == 0:
+        return 0.0, 0.5
+    return cycle_damage(rainflow(soc)), float(soc.mean())
+
+# ============================================================================
+# CAPACITY STATE
+# ============================================================================
+
+class DegradationState:
+    """
+    Fade accumulated so far, for one battery or an array of them
+
+    Args:
+        shape: Number of batteries (trials) tracked at once; () for one
+        rate_scale: Per-battery multiplier on aging rates (cell-to-cell spread)
+    """
+
+    def __init__(self, shape=(), rate_scale=1.0):
+        self.cycle_fade = np.zeros(shape)
+        self.calendar_fade = np.zeros(shape)
+        self.rate_scale = np.broadcast_to(np.asarray(rate_scale, dtype=float), shape)
+
+    @property
+    def capacity(self) -> np.ndarray:
+        """Usable capacity as a fraction of new"""
+        return np.clip(1 - self.cycle_fade - self.calendar_fade, 0, 1)
+
+    def step(self, damage, mean_soc, days: float = 1):
+        """Age by one day's (or `days`) stress"""
+        self.cycle_fade = self.cycle_fade + self.rate_scale * damage
+        # sqrt(t) aging at a changing rate: continue from the time that would have
+        # produced today's fade at today's rate
+        rate = self.rate_scale * CALENDAR_FADE_FIRST_YEAR * np.exp(CALENDAR_SOC_SENSITIVITY * (mean_soc - 0.5))
+        equivalent_years = (self.calendar_fade / rate) ** 2
+        self.calendar_fade = rate * np.sqrt(equivalent_years + days / 365)
+
+
+def level_weights(capacity, levels: Sequence[float] = CAPACITY_LEVELS):
+    """
+    Bracketing level indices and interpolation weight for capacities
+
+    Returns:
+        (i, w): value = (1 - w) * table[i] + w * table[i + 1]; capacities
+        outside the levels clamp to the nearest one
+    """
+    step = levels[0] - levels[1]
+    x = np.clip((levels[0] - np.asarray(capacity)) / step, 0, len(levels) - 1)
+    i = np.minimum(x.astype(np.intp), len(levels) - 2)
+    return i, x - i
+
+
+def project_capacity(cycle_damage_by_level: np.ndarray, mean_soc_by_level: np.ndarray,
+                     years: int, levels: Sequence[float] = CAPACITY_LEVELS) -> List[float]:
+    """
+    Replay recorded days in order, year after year, aging the battery daily
+
+    Args:
+        cycle_damage_by_level: (levels x days) cycle damage per recorded day
+        mean_soc_by_level: (levels x days) mean SOC per recorded day
+        years: Years to project
+
+    Returns:
+        Capacity fraction at the end of each year
+    """
+    state = DegradationState()
+    n_days = cycle_damage_by_level.shape[1]
+    by_year = []
+    for day in range(years * 365):
+        i, w = level_weights(state.capacity, levels)
+        d = day % n_days
+        state.step((1 - w) * cycle_damage_by_level[i, d] + w * cycle_damage_by_level[i + 1, d],
+                   (1 - w) * mean_soc_by_level[i, d] + w * mean_soc_by_level[i + 1, d])
+        if (day + 1) % 365 == 0:
+            by_year.append(float(state.capacity))
+    return by_year
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    from payback_monte_carlo import YEARS, load_daily_flows
+
+    years = next((int(a.split('=', 1)[1]) for a in sys.argv[1:] if a.startswith('--years=')), YEARS)
+    flows = load_daily_flows()
+    days = flows['days']
+    levels = flows['capacity_levels']
+    by_year = project_capacity(np.asarray(days['battery_cycle_damage']), np.asarray(days['battery_mean_soc']),
+                               years, levels=levels)
+
+    print("Projected usable capacity (no Solar Sharer)")
+    print("-" * 40)
+    for year, capacity in enumerate(by_year, start=1):
+        print(f"Year {year:>2}: {capacity:6.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -12,21 +12,18 @@ from pathlib import Path
 import json
 from typing import Dict, List, Tuple
 
+# Re-exported: other scripts read the battery constants from this module
+from battery_spec import (BATTERY_CAPACITY_KWH, BATTERY_CHARGE_RATE_KW, BATTERY_COST, BATTERY_DISCHARGE_RATE_KW,
+                          BATTERY_EFFICIENCY, BATTERY_USABLE_KWH, NET_COST, REPS_REBATE)
+from gap_filling import describe as describe_gaps, regularize
+from load_disaggregation import derive_consumption
+from stage_profiler import print_report, setup_from_argv, stage
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-# Battery specifications (Alpha ESS 28.8 kWh)
-BATTERY_CAPACITY_KWH = 28.8
-BATTERY_USABLE_KWH = BATTERY_CAPACITY_KWH * 0.95  # 95% DoD = 27.36 kWh
-BATTERY_CHARGE_RATE_KW = 4.3
-BATTERY_DISCHARGE_RATE_KW = 4.9
-BATTERY_EFFICIENCY = 0.96  # 96% round-trip efficiency
-
-# Battery costs
-BATTERY_COST = 10700
-REPS_REBATE = 1500
-NET_COST = BATTERY_COST - REPS_REBATE
+# Battery specifications and costs (Alpha ESS 28.8 kWh) live in battery_spec
 
 # Solar Sharer program (from July 1, 2026)
 SOLAR_SHARER_START = datetime(2026, 7, 1)
@@ -34,6 +31,23 @@ SOLAR_SHARER_HOURS = 3  # 11am-2pm typically
 SOLAR_SHARER_START_HOUR = 11
 SOLAR_SHARER_END_HOUR = 14
 
+# Monthly billing data (kWh by rate period) - simplified test data
+# TODO: Load actual billing data from HTML file or export
+MONTHLY_BILLS = {
+    '2024-10': {'sponge': 6.77, 'peak': 194.67, 'off_peak': 55.93, 'feed_in': 601.14},
+    '2024-11': {'sponge': 15.61, 'peak': 239.23, 'off_peak': 44.44, 'feed_in': 585.95},
+    '2024-12': {'sponge': 20.08, 'peak': 276.29, 'off_peak': 57.89, 'feed_in': 595.11},
+    '2025-1': {'sponge': 9.34, 'peak': 368.69, 'off_peak': 57.70, 'feed_in': 455.95},
+    '2025-2': {'sponge': 15.72, 'peak': 319.99, 'off_peak': 45.69, 'feed_in': 385.60},
+    '2025-3': {'sponge': 16.04, 'peak': 329.14, 'off_peak': 63.56, 'feed_in': 389.52},
+    '2025-4': {'sponge': 22.34, 'peak': 301.30, 'off_peak': 82.25, 'feed_in': 245.71},
+    '2025-5': {'sponge': 37.88, 'peak': 564.18, 'off_peak': 236.40, 'feed_in': 204.65},
+    '2025-6': {'sponge': 21.37, 'peak': 622.82, 'off_peak': 250.64, 'feed_in': 161.51},
+    '2025-7': {'sponge': 28.75, 'peak': 657.57, 'off_peak': 269.27, 'feed_in': 218.55},
+    '2025-8': {'sponge': 18.20, 'peak': 529.54, 'off_peak': 241.35, 'feed_in': 314.35},
+    '2025-9': {'sponge': 5.30, 'peak': 375.96, 'off_peak': 182.94, 'feed_in': 476.62},
+}
+
 # Adelaide TOU rate periods (24-hour time ranges)
 # Sponge: 10am-3pm (10:00-15:00)
 # Peak: 6am-10am & 6pm-12am (06:00-10:00, 18:00-00:00)
@@ -76,7 +90,8 @@ def load_solar_data(csv_files: List[Path]) -> pd.DataFrame:
         csv_files: List of paths to C03AEC7B*.csv files
 
     Returns:
-        DataFrame with datetime index and power generation columns
+        DataFrame on a regular 5-minute grid with power generation columns
+        (gaps filled, see gap_filling.regularize)
     """
     all_data = []
 
@@ -109,9 +124,6 @@ def load_solar_data(csv_files: List[Path]) -> pd.DataFrame:
                 if col != 'datetime':
                     df[col] = pd.to_numeric(df[col], errors='coerce')
 
-            # Fill NaN with 0
-            df = df.fillna(0)
-
             all_data.append(df)
 
         except Exception as e:
@@ -131,7 +143,11 @@ def load_solar_data(csv_files: List[Path]) -> pd.DataFrame:
     # Set datetime as index
     combined = combined.set_index('datetime')
 
+    # Regular grid: missing or unparseable readings are filled, not counted as zero
+    combined = regularize(combined)
+
     print(f"\nLoaded {len(combined)} records from {combined.index.min()} to {combined.index.max()}")
+    print(f"Gaps: {describe_gaps(combined.attrs['gaps'])}")
 
     return combined
 
@@ -158,13 +174,14 @@ def categorize_by_rate_period(df: pd.DataFrame) -> pd.DataFrame:
 
 def estimate_consumption(solar_df: pd.DataFrame, monthly_bills: Dict) -> pd.DataFrame:
     """
-    Estimate household consumption patterns based on solar generation and billing data
+    Estimate household consumption per interval
 
-    Strategy:
-    1. Use billing data to get total monthly consumption by rate period
-    2. Distribute consumption across hours using typical household patterns
-    3. Where solar > 0 and feed_in > 0, consumption = solar - feed_in
-    4. Where solar = 0, consumption = grid import (estimated from billing data)
+    Strategy (see load_disaggregation):
+    1. Where the grid meter was recorded, consumption = generation - feed-in
+    2. Otherwise use the collector database's readings for that interval
+    3. Otherwise the household's typical load for that month and hour
+    4. Months with no meter data at all spread the billing data over a
+       typical daily profile within each rate period
 
     Args:
         solar_df: DataFrame with solar generation data
@@ -174,69 +191,9 @@ def estimate_consumption(solar_df: pd.DataFrame, monthly_bills: Dict) -> pd.Data
         DataFrame with estimated consumption added
     """
     df = solar_df.copy()
-
-    # Typical household consumption profile (fraction of daily consumption by hour)
-    # Higher in morning (6-9am) and evening (6-10pm), lower overnight and midday
-    hourly_profile = {
-        0: 0.02, 1: 0.015, 2: 0.015, 3: 0.015, 4: 0.02, 5: 0.03,
-        6: 0.05, 7: 0.07, 8: 0.06, 9: 0.04, 10: 0.03, 11: 0.03,
-        12: 0.035, 13: 0.04, 14: 0.04, 15: 0.045, 16: 0.05, 17: 0.055,
-        18: 0.08, 19: 0.09, 20: 0.08, 21: 0.06, 22: 0.04, 23: 0.03
-    }
-
-    # Initialize consumption column
-    df['consumption_w'] = 0.0
-
-    # For each month in billing data, estimate consumption
-    for month_key, bill_data in monthly_bills.items():
-        # Get total consumption by rate period (kWh)
-        total_sponge = bill_data.get('sponge', 0)
-        total_peak = bill_data.get('peak', 0)
-        total_off_peak = bill_data.get('off_peak', 0)
-
-        # Filter dataframe for this month
-        year, month = map(int, month_key.split('-'))
-        month_mask = (df.index.year == year) & (df.index.month == month)
-        month_df = df[month_mask]
-
-        if len(month_df) == 0:
-            continue
-
-        # Count records by rate period
-        period_counts = month_df['rate_period'].value_counts()
-
-        # Distribute consumption across time periods
-        for period in ['sponge', 'peak', 'off_peak']:
-            if period not in period_counts or period_counts[period] == 0:
-                continue
-
-            # Get total kWh for this period
-            if period == 'sponge':
-                total_kwh = total_sponge
-            elif period == 'peak':
-                total_kwh = total_peak
-            else:
-                total_kwh = total_off_peak
-
-            # Convert to Wh
-            total_wh = total_kwh * 1000
-
-            # Get mask for this period
-            period_mask = month_mask & (df['rate_period'] == period)
-            period_records = period_mask.sum()
-
-            if period_records == 0:
-                continue
-
-            # Distribute based on hourly profile
-            for hour in range(24):
-                hour_mask = period_mask & (df['hour'] == hour)
-                hour_records = hour_mask.sum()
-
-                if hour_records > 0:
-                    # Consumption for this hour = (hourly_fraction * total_wh) / num_records_in_hour
-                    hourly_consumption = (hourly_profile[hour] * total_wh) / hour_records
-                    df.loc[hour_mask, 'consumption_w'] = hourly_consumption
+    consumption = derive_consumption(df, monthly_bills)
+    df['consumption_w'] = consumption
+    print(f"Consumption sources (intervals): {consumption.attrs['sources']}")
 
     return df
 
@@ -244,7 +201,9 @@ def estimate_consumption(solar_df: pd.DataFrame, monthly_bills: Dict) -> pd.Data
 # BATTERY SIMULATION
 # ============================================================================
 
-def simulate_battery(df: pd.DataFrame, enable_solar_sharer: bool = False) -> pd.DataFrame:
+def simulate_battery(df: pd.DataFrame, enable_solar_sharer: bool = False,
+                     solar_sharer_start: datetime = SOLAR_SHARER_START,
+                     usable_kwh: float = BATTERY_USABLE_KWH) -> pd.DataFrame:
     """
     Simulate battery charge/discharge behavior
 
@@ -257,6 +216,8 @@ def simulate_battery(df: pd.DataFrame, enable_solar_sharer: bool = False) -> pd.
     Args:
         df: DataFrame with solar and consumption data
         enable_solar_sharer: Whether to enable Solar Sharer free charging
+        solar_sharer_start: First day Solar Sharer applies (earlier to model it over past data)
+        usable_kwh: Usable capacity (less than new for a degraded battery)
 
     Returns:
         DataFrame with battery simulation columns added
@@ -264,7 +225,7 @@ def simulate_battery(df: pd.DataFrame, enable_solar_sharer: bool = False) -> pd.
     df = df.copy()
 
     # Initialize battery state
-    battery_soc_kwh = BATTERY_USABLE_KWH / 2  # Start at 50% charge
+    battery_soc_kwh = usable_kwh / 2  # Start at 50% charge
 
     # Initialize columns
     df['battery_soc_kwh'] = 0.0
@@ -291,7 +252,7 @@ def simulate_battery(df: pd.DataFrame, enable_solar_sharer: bool = False) -> pd.
 
         # Solar Sharer: Can charge from free grid during 11am-2pm
         solar_sharer_available = False
-        if enable_solar_sharer and idx >= SOLAR_SHARER_START:
+        if enable_solar_sharer and idx >= solar_sharer_start:
             if SOLAR_SHARER_START_HOUR <= hour < SOLAR_SHARER_END_HOUR:
                 solar_sharer_available = True
 
@@ -311,7 +272,7 @@ def simulate_battery(df: pd.DataFrame, enable_solar_sharer: bool = False) -> pd.
             charge_limit_kwh = (charge_limit_w * interval_hours) / 1000
 
             # Available battery capacity
-            available_capacity_kwh = BATTERY_USABLE_KWH - battery_soc_kwh
+            available_capacity_kwh = usable_kwh - battery_soc_kwh
 
             # Actual charge (limited by rate and capacity)
             actual_charge_kwh = min(
@@ -351,7 +312,7 @@ def simulate_battery(df: pd.DataFrame, enable_solar_sharer: bool = False) -> pd.
             remaining_deficit_w = deficit_w - discharge_w
 
             if remaining_deficit_w > 0:
-                if solar_sharer_available and battery_soc_kwh < BATTERY_USABLE_KWH:
+                if solar_sharer_available and battery_soc_kwh < usable_kwh:
                     # Can charge battery from free Solar Sharer power AND cover consumption
                     # Priority: cover consumption first, then charge battery if capacity available
                     grid_import_w = remaining_deficit_w  # Cover immediate consumption
@@ -359,7 +320,7 @@ def simulate_battery(df: pd.DataFrame, enable_solar_sharer: bool = False) -> pd.
                     # Also charge battery from Solar Sharer if space available
                     charge_limit_w = BATTERY_CHARGE_RATE_KW * 1000
                     charge_limit_kwh = (charge_limit_w * interval_hours) / 1000
-                    available_capacity_kwh = BATTERY_USABLE_KWH - battery_soc_kwh
+                    available_capacity_kwh = usable_kwh - battery_soc_kwh
 
                     solar_sharer_charge_kwh = min(charge_limit_kwh, available_capacity_kwh)
                     solar_sharer_charge_w = (solar_sharer_charge_kwh * 1000) / (interval_hours * BATTERY_EFFICIENCY)
@@ -491,6 +452,29 @@ def calculate_costs(df: pd.DataFrame, rates: Dict = None) -> Dict:
 # MAIN ANALYSIS
 # ============================================================================
 
+def build_results(solar_df: pd.DataFrame, costs_no_sharer: Dict, costs_with_sharer: Dict) -> Dict:
+    """Contents of battery_roi_results.json"""
+    return {
+        'battery_spec': {
+            'capacity_kwh': BATTERY_CAPACITY_KWH,
+            'usable_kwh': BATTERY_USABLE_KWH,
+            'charge_rate_kw': BATTERY_CHARGE_RATE_KW,
+            'discharge_rate_kw': BATTERY_DISCHARGE_RATE_KW,
+            'efficiency': BATTERY_EFFICIENCY,
+            'cost': BATTERY_COST,
+            'rebate': REPS_REBATE,
+            'net_cost': NET_COST
+        },
+        'scenario_no_sharer': costs_no_sharer,
+        'scenario_with_sharer': costs_with_sharer,
+        'analysis_date': datetime.now().isoformat(),
+        'data_range': {
+            'start': solar_df.index.min().isoformat(),
+            'end': solar_df.index.max().isoformat(),
+            'records': len(solar_df)
+        }
+    }
+
 def main():
     """Main analysis workflow"""
 
@@ -512,47 +496,38 @@ def main():
 
     # Load solar generation data
     print("Step 1: Loading solar generation data...")
-    solar_df = load_solar_data(csv_files)
+    with stage('load_solar_data'):
+        solar_df = load_solar_data(csv_files)
 
     # Categorize by rate period
     print("\nStep 2: Categorizing by rate period...")
-    solar_df = categorize_by_rate_period(solar_df)
+    with stage('categorize_by_rate_period'):
+        solar_df = categorize_by_rate_period(solar_df)
 
     # Load monthly billing data from HTML localStorage
-    # For now, use simplified test data
-    # TODO: Load actual billing data from HTML file or export
     print("\nStep 3: Loading monthly billing data...")
-    monthly_bills = {
-        '2024-10': {'sponge': 6.77, 'peak': 194.67, 'off_peak': 55.93, 'feed_in': 601.14},
-        '2024-11': {'sponge': 15.61, 'peak': 239.23, 'off_peak': 44.44, 'feed_in': 585.95},
-        '2024-12': {'sponge': 20.08, 'peak': 276.29, 'off_peak': 57.89, 'feed_in': 595.11},
-        '2025-1': {'sponge': 9.34, 'peak': 368.69, 'off_peak': 57.70, 'feed_in': 455.95},
-        '2025-2': {'sponge': 15.72, 'peak': 319.99, 'off_peak': 45.69, 'feed_in': 385.60},
-        '2025-3': {'sponge': 16.04, 'peak': 329.14, 'off_peak': 63.56, 'feed_in': 389.52},
-        '2025-4': {'sponge': 22.34, 'peak': 301.30, 'off_peak': 82.25, 'feed_in': 245.71},
-        '2025-5': {'sponge': 37.88, 'peak': 564.18, 'off_peak': 236.40, 'feed_in': 204.65},
-        '2025-6': {'sponge': 21.37, 'peak': 622.82, 'off_peak': 250.64, 'feed_in': 161.51},
-        '2025-7': {'sponge': 28.75, 'peak': 657.57, 'off_peak': 269.27, 'feed_in': 218.55},
-        '2025-8': {'sponge': 18.20, 'peak': 529.54, 'off_peak': 241.35, 'feed_in': 314.35},
-        '2025-9': {'sponge': 5.30, 'peak': 375.96, 'off_peak': 182.94, 'feed_in': 476.62},
-    }
+    monthly_bills = MONTHLY_BILLS
 
     # Estimate consumption patterns
     print("\nStep 4: Estimating household consumption patterns...")
-    solar_df = estimate_consumption(solar_df, monthly_bills)
+    with stage('estimate_consumption'):
+        solar_df = estimate_consumption(solar_df, monthly_bills)
 
     # Simulate battery WITHOUT Solar Sharer
     print("\nStep 5: Simulating battery performance (without Solar Sharer)...")
-    df_no_sharer = simulate_battery(solar_df.copy(), enable_solar_sharer=False)
+    with stage('simulate_battery_no_sharer'):
+        df_no_sharer = simulate_battery(solar_df.copy(), enable_solar_sharer=False)
 
     # Simulate battery WITH Solar Sharer
     print("\nStep 6: Simulating battery performance (with Solar Sharer from July 2026)...")
-    df_with_sharer = simulate_battery(solar_df.copy(), enable_solar_sharer=True)
+    with stage('simulate_battery_with_sharer'):
+        df_with_sharer = simulate_battery(solar_df.copy(), enable_solar_sharer=True)
 
     # Calculate costs
     print("\nStep 7: Calculating costs and savings...")
-    costs_no_sharer = calculate_costs(df_no_sharer)
-    costs_with_sharer = calculate_costs(df_with_sharer)
+    with stage('calculate_costs'):
+        costs_no_sharer = calculate_costs(df_no_sharer)
+        costs_with_sharer = calculate_costs(df_with_sharer)
 
     # Display results
     print("\n" + "=" * 80)
@@ -593,33 +568,17 @@ def main():
     # Save detailed results
     print("\nSaving detailed results...")
 
-    results = {
-        'battery_spec': {
-            'capacity_kwh': BATTERY_CAPACITY_KWH,
-            'usable_kwh': BATTERY_USABLE_KWH,
-            'charge_rate_kw': BATTERY_CHARGE_RATE_KW,
-            'discharge_rate_kw': BATTERY_DISCHARGE_RATE_KW,
-            'efficiency': BATTERY_EFFICIENCY,
-            'cost': BATTERY_COST,
-            'rebate': REPS_REBATE,
-            'net_cost': NET_COST
-        },
-        'scenario_no_sharer': costs_no_sharer,
-        'scenario_with_sharer': costs_with_sharer,
-        'analysis_date': datetime.now().isoformat(),
-        'data_range': {
-            'start': solar_df.index.min().isoformat(),
-            'end': solar_df.index.max().isoformat(),
-            'records': len(solar_df)
-        }
-    }
+    results = build_results(solar_df, costs_no_sharer, costs_with_sharer)
 
-    with open('battery_roi_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    with stage('save_results'):
+        with open('battery_roi_results.json', 'w') as f:
+            json.dump(results, f, indent=2)
 
     print("Results saved to battery_roi_results.json")
     print()
     print("Analysis complete!")
 
 if __name__ == "__main__":
+    setup_from_argv()
     main()
+    print_report()
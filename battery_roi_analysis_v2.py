@@ -11,6 +11,10 @@ from pathlib import Path
 import json
 from typing import Dict
 
+from gap_filling import regularize
+from load_disaggregation import derive_load
+from stage_profiler import print_report, setup_from_argv, stage
+
 # Battery specs
 BATTERY_CAPACITY_KWH = 28.8
 BATTERY_USABLE_KWH = 27.36
@@ -25,6 +29,10 @@ NET_COST = BATTERY_COST - REPS_REBATE
 # Solar Sharer
 SOLAR_SHARER_START = datetime(2026, 7, 1)
 
+# Consumption split by rate period when a month has too little meter data to measure it
+DEFAULT_CONSUMPTION_SPLIT = {'peak': 0.45, 'sponge': 0.15, 'off_peak': 0.40}
+MIN_METER_COVERAGE = 0.5  # Fraction of a month's intervals with meter data needed to measure the split
+
 # Rate structure
 RATES = {
     'sponge': 0.2701,
@@ -51,8 +59,10 @@ def load_solar_data(csv_files) -> pd.DataFrame:
             try:
                 df = pd.read_csv(csv_file, encoding=encoding, encoding_errors='ignore')
                 df['datetime'] = pd.to_datetime(df['RTCTime'], format='%Y/%m/%d %H:%M:%S')
-                df = df[['datetime', 'Power Now (W)']].copy()
-                df['Power Now (W)'] = pd.to_numeric(df['Power Now (W)'], errors='coerce').fillna(0)
+                columns = [c for c in ['Power Now (W)', 'Feed In Power (W)'] if c in df]
+                df = df[['datetime'] + columns].copy()
+                for col in columns:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
                 all_data.append(df)
                 break
             except:
@@ -60,7 +70,7 @@ def load_solar_data(csv_files) -> pd.DataFrame:
 
     combined = pd.concat(all_data, ignore_index=True)
     combined = combined.sort_values('datetime').drop_duplicates(subset=['datetime']).set_index('datetime')
-    return combined
+    return regularize(combined)
 
 # Billing data from HTML file
 BILLING_DATA = {
@@ -78,25 +88,30 @@ BILLING_DATA = {
     '2025-9': {'sponge': 5.30, 'peak': 375.96, 'off_peak': 182.94, 'feed_in': 476.62, 'days': 30},
 }
 
-def main():
+def main(solar_df: pd.DataFrame = None):
+    """Monthly analysis; solar_df is a fresh copy of already-loaded readings (default: read the CSVs)"""
     print("=" * 80)
     print("Battery ROI Analysis V2 - Alpha ESS 28.8 kWh")
     print("=" * 80)
     print()
 
     # Load solar data
-    data_dir = Path(__file__).parent
-    csv_files = sorted(data_dir.glob("C03AEC7B*.csv"))
-    print(f"Loading {len(csv_files)} CSV files...")
-    solar_df = load_solar_data(csv_files)
+    if solar_df is None:
+        data_dir = Path(__file__).parent
+        csv_files = sorted(data_dir.glob("C03AEC7B*.csv"))
+        print(f"Loading {len(csv_files)} CSV files...")
+        with stage('load_solar_data'):
+            solar_df = load_solar_data(csv_files)
 
     # Add rate period
-    solar_df['hour'] = solar_df.index.hour
-    solar_df['date'] = solar_df.index.date
-    solar_df['rate_period'] = solar_df['hour'].apply(get_rate_period)
-    solar_df['year'] = solar_df.index.year
-    solar_df['month'] = solar_df.index.month
-    solar_df['year_month'] = solar_df['year'].astype(str) + '-' + solar_df['month'].astype(str)
+    with stage('categorize_by_rate_period'):
+        solar_df['hour'] = solar_df.index.hour
+        solar_df['date'] = solar_df.index.date
+        solar_df['rate_period'] = solar_df['hour'].apply(get_rate_period)
+        solar_df['year'] = solar_df.index.year
+        solar_df['month'] = solar_df.index.month
+        solar_df['year_month'] = solar_df['year'].astype(str) + '-' + solar_df['month'].astype(str)
+        solar_df['load_w'] = derive_load(solar_df)
 
     interval_hours = 5 / 60.0  # 5-minute intervals
 
@@ -106,14 +121,22 @@ def main():
     # Calculate monthly solar generation by rate period
     print("Calculating solar generation by month and rate period...")
     solar_monthly = {}
-    for year_month in solar_df['year_month'].unique():
-        month_data = solar_df[solar_df['year_month'] == year_month]
-        solar_monthly[year_month] = {}
-        for period in ['sponge', 'peak', 'off_peak']:
-            period_data = month_data[month_data['rate_period'] == period]
-            solar_kwh = (period_data['Power Now (W)'].sum() * interval_hours) / 1000
-            solar_monthly[year_month][period] = solar_kwh
-        solar_monthly[year_month]['total'] = (month_data['Power Now (W)'].sum() * interval_hours) / 1000
+    with stage('monthly_solar'):
+        for year_month in solar_df['year_month'].unique():
+            month_data = solar_df[solar_df['year_month'] == year_month]
+            solar_monthly[year_month] = {}
+            for period in ['sponge', 'peak', 'off_peak']:
+                period_data = month_data[month_data['rate_period'] == period]
+                solar_kwh = (period_data['Power Now (W)'].sum() * interval_hours) / 1000
+                solar_monthly[year_month][period] = solar_kwh
+            solar_monthly[year_month]['total'] = (month_data['Power Now (W)'].sum() * interval_hours) / 1000
+
+            # Measured consumption split by rate period (from generation - feed-in)
+            load = month_data['load_w']
+            if load.notna().mean() >= MIN_METER_COVERAGE and load.sum() > 0:
+                by_period = load.groupby(month_data['rate_period']).sum() / load.sum()
+                solar_monthly[year_month]['consumption_split'] = {
+                    p: float(by_period.get(p, 0.0)) for p in DEFAULT_CONSUMPTION_SPLIT}
 
     print()
     print("=" * 80)
@@ -129,146 +152,147 @@ def main():
 
     results_by_month = []
 
-    for year_month, bill in BILLING_DATA.items():
-        if year_month not in solar_monthly:
-            continue
-
-        print(f"\n{year_month}:")
-        print("-" * 80)
-
-        solar_gen = solar_monthly[year_month]
-
-        # Grid imports by rate period (from bill)
-        grid_import = {
-            'sponge': bill['sponge'],
-            'peak': bill['peak'],
-            'off_peak': bill['off_peak']
-        }
-
-        # Total grid import and export
-        total_grid_import = sum(grid_import.values())
-        total_feed_in = bill['feed_in']
-        total_solar = solar_gen['total']
-
-        # Solar self-consumed = Total solar - Feed-in
-        solar_self_consumed = total_solar - total_feed_in
-
-        # Total consumption = Grid import + Solar self-consumed
-        total_consumption = total_grid_import + solar_self_consumed
-
-        print(f"  Total solar generation:    {total_solar:8.1f} kWh")
-        print(f"  Feed-in exported:          {total_feed_in:8.1f} kWh")
-        print(f"  Solar self-consumed:       {solar_self_consumed:8.1f} kWh")
-        print(f"  Grid imports:              {total_grid_import:8.1f} kWh")
-        print(f"  Total consumption:         {total_consumption:8.1f} kWh")
-        print(f"  Average daily consumption: {total_consumption/bill['days']:8.1f} kWh/day")
-
-        # Current cost (no battery)
-        cost_no_battery = (
-            grid_import['sponge'] * RATES['sponge'] +
-            grid_import['peak'] * RATES['peak'] +
-            grid_import['off_peak'] * RATES['off_peak'] -
-            total_feed_in * RATES['feed_in']
-        )
-
-        # Simulate with battery
-        # Strategy: Use excess solar to charge battery, discharge during peak/sponge
-        # Simplification: Assume we can perfectly time charge/discharge
-
-        # Solar available by period (after self-consumption for immediate needs)
-        # Excess solar = Solar generated in that period - immediate consumption in that period
-        # For simplification, estimate consumption distribution:
-        # Peak: 45%, Sponge: 15%, Off-peak: 40% of total consumption
-
-        consumption_dist = {'peak': 0.45, 'sponge': 0.15, 'off_peak': 0.40}
-        consumption_by_period = {p: total_consumption * consumption_dist[p] for p in ['peak', 'sponge', 'off_peak']}
-
-        # Excess solar by period = Solar generated - Consumption in that period
-        excess_solar = {}
-        deficit_by_period = {}
-        for period in ['peak', 'sponge', 'off_peak']:
-            net = solar_gen[period] - consumption_by_period[period]
-            if net > 0:
-                excess_solar[period] = net
-                deficit_by_period[period] = 0
-            else:
-                excess_solar[period] = 0
-                deficit_by_period[period] = -net
-
-        # Battery strategy:
-        # 1. Charge from excess sponge/off-peak solar (up to battery capacity)
-        # 2. Discharge to cover peak/sponge deficits
-
-        # Available to charge: excess from sponge + off-peak
-        available_to_charge = excess_solar['sponge'] + excess_solar['off_peak']
-        battery_charged = min(available_to_charge * BATTERY_EFFICIENCY, BATTERY_USABLE_KWH * bill['days'])
-
-        # Available to discharge: battery charged
-        battery_discharged = battery_charged * BATTERY_EFFICIENCY
-
-        # Use battery to cover expensive peak deficit first, then sponge
-        battery_used_peak = min(deficit_by_period['peak'], battery_discharged)
-        battery_remaining = battery_discharged - battery_used_peak
-        battery_used_sponge = min(deficit_by_period['sponge'], battery_remaining)
-
-        # New grid imports with battery
-        new_grid_import = {
-            'peak': max(0, deficit_by_period['peak'] - battery_used_peak),
-            'sponge': max(0, deficit_by_period['sponge'] - battery_used_sponge),
-            'off_peak': deficit_by_period['off_peak']  # No battery help for off-peak
-        }
-
-        # New feed-in with battery
-        # Less excess sponge/off-peak goes to grid (used for battery)
-        battery_charged_actual = (battery_used_peak + battery_used_sponge) / (BATTERY_EFFICIENCY ** 2)
-        new_feed_in = total_feed_in - battery_charged_actual
-
-        cost_with_battery = (
-            new_grid_import['sponge'] * RATES['sponge'] +
-            new_grid_import['peak'] * RATES['peak'] +
-            new_grid_import['off_peak'] * RATES['off_peak'] -
-            new_feed_in * RATES['feed_in']
-        )
-
-        savings = cost_no_battery - cost_with_battery
-
-        print(f"\n  Scenario A: Without battery")
-        print(f"    Cost: ${cost_no_battery:7.2f}")
-        print(f"\n  Scenario B: With battery (no Solar Sharer)")
-        print(f"    Grid import peak:   {new_grid_import['peak']:8.1f} kWh (was {grid_import['peak']:.1f})")
-        print(f"    Grid import sponge: {new_grid_import['sponge']:8.1f} kWh (was {grid_import['sponge']:.1f})")
-        print(f"    Battery used:       {battery_used_peak + battery_used_sponge:8.1f} kWh")
-        print(f"    Cost: ${cost_with_battery:7.2f}")
-        print(f"    Savings: ${savings:7.2f}")
-
-        total_cost_no_battery += cost_no_battery
-        total_cost_with_battery_no_sharer += cost_with_battery
-        total_savings_no_sharer += savings
-
-        # Add Solar Sharer benefit (from July 2026 onwards)
-        solar_sharer_benefit = 0
-        if year_month >= '2026-7':
-            # 3 hours/day free charging at 4.3 kW = 12.9 kWh/day
-            # Can charge battery on low-solar days
-            # Assume 50% of days benefit from Solar Sharer top-up
-            solar_sharer_charge_kwh = 12.9 * bill['days'] * 0.5
-            solar_sharer_benefit = solar_sharer_charge_kwh * RATES['peak']
-
-        cost_with_battery_and_sharer = cost_with_battery - solar_sharer_benefit
-        savings_with_sharer = cost_no_battery - cost_with_battery_and_sharer
-
-        total_cost_with_battery_with_sharer += cost_with_battery_and_sharer
-        total_savings_with_sharer += savings_with_sharer
-
-        results_by_month.append({
-            'month': year_month,
-            'solar_total': total_solar,
-            'consumption': total_consumption,
-            'cost_no_battery': cost_no_battery,
-            'cost_with_battery': cost_with_battery,
-            'savings': savings,
-            'savings_with_sharer': savings_with_sharer
-        })
+    with stage('monthly_model'):
+        for year_month, bill in BILLING_DATA.items():
+            if year_month not in solar_monthly:
+                continue
+
+            print(f"\n{year_month}:")
+            print("-" * 80)
+
+            solar_gen = solar_monthly[year_month]
+
+            # Grid imports by rate period (from bill)
+            grid_import = {
+                'sponge': bill['sponge'],
+                'peak': bill['peak'],
+                'off_peak': bill['off_peak']
+            }
+
+            # Total grid import and export
+            total_grid_import = sum(grid_import.values())
+            total_feed_in = bill['feed_in']
+            total_solar = solar_gen['total']
+
+            # Solar self-consumed = Total solar - Feed-in
+            solar_self_consumed = total_solar - total_feed_in
+
+            # Total consumption = Grid import + Solar self-consumed
+            total_consumption = total_grid_import + solar_self_consumed
+
+            print(f"  Total solar generation:    {total_solar:8.1f} kWh")
+            print(f"  Feed-in exported:          {total_feed_in:8.1f} kWh")
+            print(f"  Solar self-consumed:       {solar_self_consumed:8.1f} kWh")
+            print(f"  Grid imports:              {total_grid_import:8.1f} kWh")
+            print(f"  Total consumption:         {total_consumption:8.1f} kWh")
+            print(f"  Average daily consumption: {total_consumption/bill['days']:8.1f} kWh/day")
+
+            # Current cost (no battery)
+            cost_no_battery = (
+                grid_import['sponge'] * RATES['sponge'] +
+                grid_import['peak'] * RATES['peak'] +
+                grid_import['off_peak'] * RATES['off_peak'] -
+                total_feed_in * RATES['feed_in']
+            )
+
+            # Simulate with battery
+            # Strategy: Use excess solar to charge battery, discharge during peak/sponge
+            # Simplification: Assume we can perfectly time charge/discharge
+
+            # Solar available by period (after self-consumption for immediate needs)
+            # Excess solar = Solar generated in that period - immediate consumption in that period
+            # Consumption split by period is measured from the meter readings where
+            # available, else Peak: 45%, Sponge: 15%, Off-peak: 40% of total consumption
+
+            consumption_dist = solar_gen.get('consumption_split', DEFAULT_CONSUMPTION_SPLIT)
+            consumption_by_period = {p: total_consumption * consumption_dist[p] for p in ['peak', 'sponge', 'off_peak']}
+
+            # Excess solar by period = Solar generated - Consumption in that period
+            excess_solar = {}
+            deficit_by_period = {}
+            for period in ['peak', 'sponge', 'off_peak']:
+                net = solar_gen[period] - consumption_by_period[period]
+                if net > 0:
+                    excess_solar[period] = net
+                    deficit_by_period[period] = 0
+                else:
+                    excess_solar[period] = 0
+                    deficit_by_period[period] = -net
+
+            # Battery strategy:
+            # 1. Charge from excess sponge/off-peak solar (up to battery capacity)
+            # 2. Discharge to cover peak/sponge deficits
+
+            # Available to charge: excess from sponge + off-peak
+            available_to_charge = excess_solar['sponge'] + excess_solar['off_peak']
+            battery_charged = min(available_to_charge * BATTERY_EFFICIENCY, BATTERY_USABLE_KWH * bill['days'])
+
+            # Available to discharge: battery charged
+            battery_discharged = battery_charged * BATTERY_EFFICIENCY
+
+            # Use battery to cover expensive peak deficit first, then sponge
+            battery_used_peak = min(deficit_by_period['peak'], battery_discharged)
+            battery_remaining = battery_discharged - battery_used_peak
+            battery_used_sponge = min(deficit_by_period['sponge'], battery_remaining)
+
+            # New grid imports with battery
+            new_grid_import = {
+                'peak': max(0, deficit_by_period['peak'] - battery_used_peak),
+                'sponge': max(0, deficit_by_period['sponge'] - battery_used_sponge),
+                'off_peak': deficit_by_period['off_peak']  # No battery help for off-peak
+            }
+
+            # New feed-in with battery
+            # Less excess sponge/off-peak goes to grid (used for battery)
+            battery_charged_actual = (battery_used_peak + battery_used_sponge) / (BATTERY_EFFICIENCY ** 2)
+            new_feed_in = total_feed_in - battery_charged_actual
+
+            cost_with_battery = (
+                new_grid_import['sponge'] * RATES['sponge'] +
+                new_grid_import['peak'] * RATES['peak'] +
+                new_grid_import['off_peak'] * RATES['off_peak'] -
+                new_feed_in * RATES['feed_in']
+            )
+
+            savings = cost_no_battery - cost_with_battery
+
+            print(f"\n  Scenario A: Without battery")
+            print(f"    Cost: ${cost_no_battery:7.2f}")
+            print(f"\n  Scenario B: With battery (no Solar Sharer)")
+            print(f"    Grid import peak:   {new_grid_import['peak']:8.1f} kWh (was {grid_import['peak']:.1f})")
+            print(f"    Grid import sponge: {new_grid_import['sponge']:8.1f} kWh (was {grid_import['sponge']:.1f})")
+            print(f"    Battery used:       {battery_used_peak + battery_used_sponge:8.1f} kWh")
+            print(f"    Cost: ${cost_with_battery:7.2f}")
+            print(f"    Savings: ${savings:7.2f}")
+
+            total_cost_no_battery += cost_no_battery
+            total_cost_with_battery_no_sharer += cost_with_battery
+            total_savings_no_sharer += savings
+
+            # Add Solar Sharer benefit (from July 2026 onwards)
+            solar_sharer_benefit = 0
+            if year_month >= '2026-7':
+                # 3 hours/day free charging at 4.3 kW = 12.9 kWh/day
+                # Can charge battery on low-solar days
+                # Assume 50% of days benefit from Solar Sharer top-up
+                solar_sharer_charge_kwh = 12.9 * bill['days'] * 0.5
+                solar_sharer_benefit = solar_sharer_charge_kwh * RATES['peak']
+
+            cost_with_battery_and_sharer = cost_with_battery - solar_sharer_benefit
+            savings_with_sharer = cost_no_battery - cost_with_battery_and_sharer
+
+            total_cost_with_battery_with_sharer += cost_with_battery_and_sharer
+            total_savings_with_sharer += savings_with_sharer
+
+            results_by_month.append({
+                'month': year_month,
+                'solar_total': total_solar,
+                'consumption': total_consumption,
+                'cost_no_battery': cost_no_battery,
+                'cost_with_battery': cost_with_battery,
+                'savings': savings,
+                'savings_with_sharer': savings_with_sharer
+            })
 
     # Annual summary
     print()
@@ -333,11 +357,14 @@ def main():
         'monthly_results': results_by_month
     }
 
-    with open('battery_roi_results_v2.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    with stage('save_results'):
+        with open('battery_roi_results_v2.json', 'w') as f:
+            json.dump(results, f, indent=2)
 
     print("\nResults saved to battery_roi_results_v2.json")
     print("Analysis complete!")
 
 if __name__ == "__main__":
+    setup_from_argv()
     main()
+    print_report()
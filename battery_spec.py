@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Battery Specification
+Size, rates and cost of the modelled battery, shared by the analysis scripts
+and the always-on collector. Deliberately dependency-free so importing it
+doesn't pull the analysis stack (pandas, numpy) into the collector.
+"""
+
+# Battery specifications (Alpha ESS 28.8 kWh)
+BATTERY_CAPACITY_KWH = 28.8
+BATTERY_USABLE_KWH = BATTERY_CAPACITY_KWH * 0.95  # 95% DoD = 27.36 kWh
+BATTERY_CHARGE_RATE_KW = 4.3
+BATTERY_DISCHARGE_RATE_KW = 4.9
+BATTERY_EFFICIENCY = 0.96  # 96% round-trip efficiency
+
+# Battery costs
+BATTERY_COST = 10700
+REPS_REBATE = 1500
+NET_COST = BATTERY_COST - REPS_REBATE
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Times the ingestion and simulation hot paths on synthetic SolaX exports,
+records each stage's peak memory, and compares both against stored
+baselines. Runs offline: all input is generated locally.
+
+Stages: load_solar_data, categorize_by_rate_period, estimate_consumption,
+simulate_battery, calculate_costs (battery_roi_analysis) and
+analyze_continuous_simulation (battery_daily_analysis_enhanced).
+
+Run:
+    python3 benchmark_suite.py                   # compare with benchmark_baselines.json
+    python3 benchmark_suite.py --save-baseline   # record baselines for this config
+    python3 benchmark_suite.py --json=out.json   # results file (default benchmark_results.json)
+
+The exit code is 1 when a stage regresses beyond BENCH_TOLERANCE.
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BENCH_YEARS = float(os.getenv('BENCH_YEARS', '0.1'))      # 0.1 years = 36 days of 5-minute data
+BENCH_GAP_PCT = float(os.getenv('BENCH_GAP_PCT', '1.0'))  # Rows dropped, in outage-sized blocks
+BENCH_DUPLICATE_PCT = float(os.getenv('BENCH_DUPLICATE_PCT', '0.5'))
+BENCH_ENCODING = os.getenv('BENCH_ENCODING', 'utf-8')     # utf-8, latin-1, cp1252, gbk
+BENCH_REPEAT = int(os.getenv('BENCH_REPEAT', '3'))
+BENCH_TOLERANCE = float(os.getenv('BENCH_TOLERANCE', '0.25'))  # Allowed slowdown / memory growth
+BENCH_SEED = int(os.getenv('BENCH_SEED', '7'))
+BENCH_NOISE_FLOOR_S = float(os.getenv('BENCH_NOISE_FLOOR_S', '0.05'))  # Smaller slowdowns are timer noise
+
+BASELINE_FILE = Path(__file__).parent / "benchmark_baselines.json"
+RESULTS_FILE = Path(__file__).parent / "benchmark_results.json"
+
+START = datetime(2025, 1, 1)
+INTERVAL = timedelta(minutes=5)
+GAP_BLOCK_ROWS = 36  # Three-hour outages
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+
+def generate_solax_csvs(out_dir: Path, years: float = BENCH_YEARS, gap_pct: float = BENCH_GAP_PCT,
+                        duplicate_pct: float = BENCH_DUPLICATE_PCT, encoding: str = BENCH_ENCODING,
+                        seed: int = BENCH_SEED) -> List[Path]:
+    """
+    Write 5-minute inverter exports shaped like the SolaX C03AEC7B*.csv files
+
+    One file per month. Solar follows a seasonal clear-sky curve with daily
+    cloud cover; feed-in is solar minus a morning/evening-peaked load. Gaps
+    drop whole blocks of rows and duplicates repeat rows, as the real
+    exports do.
+    """
+    rng = np.random.default_rng(seed)
+    days = max(1, round(years * 365))
+    times = pd.date_range(START, periods=days * 288, freq=INTERVAL)
+    hour = times.hour + times.minute / 60
+    doy = times.dayofyear.values
+
+    # Southern hemisphere: longest days around day 355
+    day_length = 12 + 2.2 * np.cos(2 * np.pi * (doy - 355) / 365)
+    sun = np.clip(np.sin(np.pi * (hour - (12 - day_length / 2)) / day_length), 0, None)
+    cloud = np.repeat(rng.uniform(0.3, 1.0, days), 288) * rng.uniform(0.85, 1.0, len(times))
+    solar = np.round(sun * cloud * 9000)
+    load = 400 + 900 * np.exp(-((hour - 7.5) / 1.5) ** 2) + 1500 * np.exp(-((hour - 19) / 2) ** 2)
+    load = np.round(load * rng.uniform(0.7, 1.3, len(times)))
+
+    df = pd.DataFrame({
+        'RTCTime': times.strftime('%Y/%m/%d %H:%M:%S'),
+        'Power Now (W)': solar,
+        'Feed In Power (W)': solar - load,
+        'PV1 Input Power (W)': np.round(solar * 0.52),
+        'PV2 Input Power (W)': np.round(solar * 0.48),
+        'Inverter Temperature (°C)': np.round(25 + 20 * sun, 1),
+    })
+
+    # Outages: drop whole blocks until gap_pct of rows are gone
+    n_blocks = int(len(df) * gap_pct / 100 / GAP_BLOCK_ROWS)
+    if n_blocks:
+        starts = rng.choice(len(df) - GAP_BLOCK_ROWS, n_blocks, replace=False)
+        dropped = np.unique((starts[:, None] + np.arange(GAP_BLOCK_ROWS)).ravel())
+        df = df.drop(df.index[dropped])
+    # Re-sent readings: repeated rows with the same RTCTime
+    n_dupes = int(len(df) * duplicate_pct / 100)
+    if n_dupes:
+        df = pd.concat([df, df.iloc[rng.choice(len(df), n_dupes, replace=False)]]).sort_index(kind='stable')
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+    month = pd.to_datetime(df['RTCTime'], format='%Y/%m/%d %H:%M:%S').dt.strftime('%Y%m')
+    for key, part in df.groupby(month):
+        path = out_dir / f"C03AEC7B_{key}.csv"
+        part.to_csv(path, index=False, encoding=encoding)
+        files.append(path)
+    return files
+
+
+def synthetic_bills(solar_df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """Monthly bills (kWh by rate period) in battery_roi_analysis's 'YYYY-M' format"""
+    bills = {}
+    for year, month in sorted({(d.year, d.month) for d in solar_df.index}):
+        bills[f"{year}-{month}"] = {'sponge': 20.0, 'peak': 400.0, 'off_peak': 150.0, 'feed_in': 400.0}
+    return bills
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+def build_stages(csv_files: List[Path]) -> List[tuple]:
+    """(name, fn(context) -> (output key, value)) in pipeline order"""
+    import battery_roi_analysis as roi
+    import battery_daily_analysis_enhanced as enhanced
+
+    return [
+        ('load_solar_data', lambda c: ('raw', roi.load_solar_data(csv_files))),
+        ('categorize_by_rate_period', lambda c: ('categorized', roi.categorize_by_rate_period(c['raw']))),
+        ('estimate_consumption', lambda c: ('consumption', roi.estimate_consumption(
+            c['categorized'], synthetic_bills(c['categorized'])))),
+        ('simulate_battery', lambda c: ('simulated', roi.simulate_battery(c['consumption']))),
+        ('calculate_costs', lambda c: ('costs', roi.calculate_costs(c['simulated']))),
+        ('analyze_continuous_simulation', lambda c: ('daily', enhanced.analyze_continuous_simulation(
+            c['raw'][['Power Now (W)']]))),
+    ]
+
+
+def _quietly(fn: Callable, context: Dict):
+    # The analysis scripts print progress; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(context)
+
+
+def run_stages(stages: List[tuple], repeat: int = BENCH_REPEAT) -> Dict[str, Dict]:
+    """
+    Time every stage `repeat` times, then run once more under tracemalloc
+
+    Timed runs don't trace allocations (tracing slows numpy/pandas code
+    several-fold); the traced run only measures peak memory.
+    """
+    results = {name: {'runs_s': []} for name, _ in stages}
+    context = {}
+    for _ in range(repeat):
+        for name, fn in stages:
+            start = time.perf_counter()
+            key, value = _quietly(fn, context)
+            results[name]['runs_s'].append(round(time.perf_counter() - start, 4))
+            context[key] = value
+
+    for name, fn in stages:
+        tracemalloc.start()
+        try:
+            _quietly(fn, context)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        runs = results[name]['runs_s']
+        results[name].update({
+            'median_s': round(statistics.median(runs), 4),
+            'min_s': round(min(runs), 4),
+            'peak_mb': round(peak / 1e6, 2),
+        })
+
+    results['simulate_battery']['rows'] = len(context['simulated'])
+    results['load_solar_data']['rows'] = len(context['raw'])
+    return results
+
+# ============================================================================
+# BASELINES
+# ============================================================================
+
+def config_key(days: int) -> str:
+    """Baselines only compare like with like"""
+    return f"days={days},gaps={BENCH_GAP_PCT},dupes={BENCH_DUPLICATE_PCT},encoding={BENCH_ENCODING}"
+
+
+def load_baselines(path: Path = BASELINE_FILE) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def compare(stages: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = BENCH_TOLERANCE) -> List[Dict]:
+    """Stages slower or hungrier than baseline * (1 + tolerance), ignoring sub-noise-floor slowdowns"""
+    regressions = []
+    for name, result in stages.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ('median_s', 'peak_mb'):
+            if not base.get(metric) or result[metric] <= base[metric] * (1 + tolerance):
+                continue
+            if metric == 'median_s' and result[metric] - base[metric] < BENCH_NOISE_FLOOR_S:
+                continue
+            regressions.append({'stage': name, 'metric': metric, 'baseline': base[metric],
+                                'value': result[metric], 'ratio': round(result[metric] / base[metric], 2)})
+    return regressions
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> int:
+    save_baseline = '--save-baseline' in sys.argv
+    results_path = next((Path(a.split('=', 1)[1]) for a in sys.argv[1:] if a.startswith('--json=')), RESULTS_FILE)
+    days = max(1, round(BENCH_YEARS * 365))
+
+    print("=" * 80)
+    print(f"Benchmark Suite - {days} days, {BENCH_GAP_PCT}% gaps, {BENCH_DUPLICATE_PCT}% duplicates, "
+          f"{BENCH_ENCODING}, {BENCH_REPEAT} runs")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory(prefix='solax_bench_') as tmp:
+        start = time.perf_counter()
+        csv_files = generate_solax_csvs(Path(tmp))
+        print(f"Generated {len(csv_files)} CSV files in {time.perf_counter() - start:.2f}s")
+        stages = run_stages(build_stages(csv_files))
+
+    key = config_key(days)
+    baselines = load_baselines()
+    baseline = baselines.get(key, {})
+    regressions = compare(stages, baseline)
+
+    print()
+    print(f"{'Stage':<32}{'median s':>10}{'min s':>10}{'peak MB':>10}{'baseline s':>12}")
+    print("-" * 74)
+    for name, r in stages.items():
+        base = baseline.get(name, {}).get('median_s')
+        print(f"{name:<32}{r['median_s']:>10.3f}{r['min_s']:>10.3f}{r['peak_mb']:>10.1f}"
+              f"{(f'{base:.3f}' if base else '-'):>12}")
+    print()
+
+    report = {
+        'run_at': datetime.now().isoformat(),
+        'config': {'days': days, 'gap_pct': BENCH_GAP_PCT, 'duplicate_pct': BENCH_DUPLICATE_PCT,
+                   'encoding': BENCH_ENCODING, 'repeat': BENCH_REPEAT, 'seed': BENCH_SEED,
+                   'tolerance': BENCH_TOLERANCE},
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'processor': platform.processor(), 'cpus': os.cpu_count()},
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stages': stages,
+        'baseline_found': bool(baseline),
+        'regressions': regressions,
+    }
+    with open(results_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {results_path}")
+
+    if save_baseline:
+        baselines[key] = {name: {'median_s': r['median_s'], 'peak_mb': r['peak_mb']} for name, r in stages.items()}
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline saved to {BASELINE_FILE.name} ({key})")
+    elif not baseline:
+        print("No baseline for this configuration yet - run with --save-baseline")
+
+    for r in regressions:
+        print(f"REGRESSION: {r['stage']} {r['metric']} {r['value']} vs baseline {r['baseline']} ({r['ratio']}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
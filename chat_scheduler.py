@@ -0,0 +1,265 @@
+"""
+Enhanced Jarvis AI - Chat Scheduler
+Runs chat requests from many sessions on a bounded worker pool in front of
+the shared handler, with per-provider concurrency limits, a bounded queue
+that rejects work when full (backpressure), and cancellation of requests a
+session no longer waits for.
+
+Provider limits apply to each provider attempt, not to the request: a
+handler wraps every call it makes in provider_slot(name), so a request that
+fails over from Ollama to another provider moves to that provider's slot.
+
+Streamed requests check for cancellation between chunks; closing the stream
+closes the HTTP response, which stops Ollama generating. A blocking provider
+call can't be interrupted, so a cancelled one finishes and is discarded.
+"""
+
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+import contextlib
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHAT_WORKERS = int(os.getenv('CHAT_WORKERS', '8'))
+CHAT_MAX_QUEUE = int(os.getenv('CHAT_MAX_QUEUE', '32'))
+# Ollama serves OLLAMA_NUM_PARALLEL requests per model at once and queues the rest itself
+PROVIDER_LIMITS = {
+    'ollama': int(os.getenv('OLLAMA_NUM_PARALLEL', '2')),
+    'local_hf': 8,  # The model registry batches these into one pipeline call
+    'huggingface_api': 4,
+    'openai': 8,
+}
+DEFAULT_LIMIT = 16
+STREAM_POLL_S = 0.5
+
+BUSY_MESSAGE = "Enhanced Jarvis is busy with other conversations right now. Please try again in a moment."
+
+_DONE = object()
+_worker = threading.local()  # .scheduler is set on the pool's worker threads
+
+
+def provider_slot(provider: str):
+    """
+    Context manager holding one of a provider's concurrency slots for the
+    duration of a call; a no-op when not running on a scheduler worker
+    """
+    scheduler = getattr(_worker, 'scheduler', None)
+    if scheduler is None:
+        return contextlib.nullcontext()
+    return scheduler._attempt(provider)
+
+
+class ChatRequest:
+    """One queued chat: a future for the full reply plus a queue of streamed chunks"""
+
+    def __init__(self, message: str, chat_history: Optional[List[Dict]], session_id: Optional[str]):
+        self.message = message
+        # Snapshot: the caller appends to its own list while we work
+        self.chat_history = list(chat_history) if chat_history is not None else None
+        self.session_id = session_id
+        self.future = Future()
+        self.chunks = queue.Queue()
+        self.cancelled = threading.Event()
+        self.metrics = None
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+
+    def cancel(self):
+        self.cancelled.set()
+        self.future.cancel()  # Only succeeds while still queued
+        self.chunks.put(_DONE)
+
+
+class ChatScheduler:
+    """
+    Bounded worker pool for a shared chat handler
+
+    Args:
+        handler: Handler with chat() (and optionally chat_stream())
+        workers: Worker threads
+        max_queue: Requests waiting beyond this are rejected with BUSY_MESSAGE
+        provider_limits: Max concurrent calls per provider (see provider_slot)
+    """
+
+    def __init__(self, handler, workers: int = CHAT_WORKERS, max_queue: int = CHAT_MAX_QUEUE,
+                 provider_limits: Optional[Dict[str, int]] = None):
+        self.handler = handler
+        self.limits = {**PROVIDER_LIMITS, **(provider_limits or {})}
+        self._slots = {}  # provider -> semaphore
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._sessions = {}  # session_id -> its latest request
+        self._lock = threading.Lock()
+        self._active = {}
+        self.stats = {'submitted': 0, 'completed': 0, 'rejected': 0, 'cancelled': 0,
+                      'wait_s': 0.0, 'service_s': 0.0}
+
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f'chat-worker-{i}', daemon=True).start()
+
+    # -- Public API ----------------------------------------------------------
+
+    def submit(self, message: str, chat_history: List[Dict] = None,
+               session_id: Optional[str] = None) -> ChatRequest:
+        """
+        Queue a chat. A session's unfinished earlier request is cancelled
+        (it re-asked or navigated away); a full queue resolves the request
+        at once with BUSY_MESSAGE.
+        """
+        request = ChatRequest(message, chat_history, session_id)
+        with self._lock:
+            self.stats['submitted'] += 1
+            if session_id is not None:
+                previous = self._sessions.get(session_id)
+                if previous is not None and not previous.future.done():
+                    previous.cancel()
+                    self.stats['cancelled'] += 1
+                self._sessions[session_id] = request
+
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._lock:
+                self.stats['rejected'] += 1
+            logger.warning(f"Chat queue full ({self._queue.maxsize}) - rejecting request")
+            request.chunks.put(BUSY_MESSAGE)
+            request.chunks.put(_DONE)
+            request.future.set_result(BUSY_MESSAGE)
+        return request
+
+    def chat(self, message: str, chat_history: List[Dict] = None,
+             session_id: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        """Blocking chat through the pool"""
+        return self.submit(message, chat_history, session_id).future.result(timeout=timeout)
+
+    async def chat_async(self, message: str, chat_history: List[Dict] = None,
+                         session_id: Optional[str] = None) -> str:
+        """Awaitable chat; cancelling the awaiting task cancels the request"""
+        request = self.submit(message, chat_history, session_id)
+        try:
+            return await asyncio.wrap_future(request.future)
+        except asyncio.CancelledError:
+            request.cancel()
+            raise
+
+    def stream(self, request: ChatRequest) -> Iterator[str]:
+        """Chunks of a submitted request as they're generated; closing the iterator cancels it"""
+        try:
+            while True:
+                try:
+                    chunk = request.chunks.get(timeout=STREAM_POLL_S)
+                except queue.Empty:
+                    continue
+                if chunk is _DONE:
+                    return
+                yield chunk
+        finally:
+            if not request.future.done():
+                request.cancel()
+                with self._lock:
+                    self.stats['cancelled'] += 1
+
+    def cancel_session(self, session_id: str):
+        with self._lock:
+            request = self._sessions.pop(session_id, None)
+            if request is not None and not request.future.done():
+                request.cancel()
+                self.stats['cancelled'] += 1
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            active = dict(self._active)
+        done = stats['completed'] or 1
+        return {
+            'queued': self._queue.qsize(),
+            'max_queue': self._queue.maxsize,
+            'active': active,
+            'limits': self.limits,
+            'avg_wait_s': round(stats.pop('wait_s') / done, 3),
+            'avg_service_s': round(stats.pop('service_s') / done, 3),
+            **stats,
+        }
+
+    # -- Workers -------------------------------------------------------------
+
+    def _slot(self, provider: str) -> threading.Semaphore:
+        with self._lock:
+            if provider not in self._slots:
+                self._slots[provider] = threading.Semaphore(self.limits.get(provider, DEFAULT_LIMIT))
+            return self._slots[provider]
+
+    @contextlib.contextmanager
+    def _attempt(self, provider: str):
+        """One provider call: hold its slot and count it as active"""
+        with self._slot(provider):
+            with self._lock:
+                self._active[provider] = self._active.get(provider, 0) + 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._active[provider] -= 1
+
+    def _run(self):
+        _worker.scheduler = self
+        while True:
+            request = self._queue.get()
+            if request.cancelled.is_set() or not request.future.set_running_or_notify_cancel():
+                continue
+
+            request.started_at = time.perf_counter()
+            try:
+                reply = self._generate(request)
+                request.future.set_result(reply)
+            except Exception as e:
+                logger.error(f"Chat worker error: {e}")
+                request.chunks.put(f"Chat error: {str(e)}")
+                request.future.set_exception(e)
+            finally:
+                request.chunks.put(_DONE)
+                finished = time.perf_counter()
+                with self._lock:
+                    self.stats['completed'] += 1
+                    self.stats['wait_s'] += request.started_at - request.queued_at
+                    self.stats['service_s'] += finished - request.started_at
+                    if self._sessions.get(request.session_id) is request:
+                        del self._sessions[request.session_id]
+
+    def _generate(self, request: ChatRequest) -> str:
+        """Run the handler, forwarding chunks and stopping early once cancelled"""
+        if not hasattr(self.handler, 'chat_stream'):
+            reply = self.handler.chat(request.message, request.chat_history)
+            request.chunks.put(reply)
+            return reply
+
+        parts = []
+        stream = self.handler.chat_stream(request.message, request.chat_history)
+        try:
+            for chunk in stream:
+                if request.cancelled.is_set():
+                    break
+                parts.append(chunk)
+                request.chunks.put(chunk)
+        finally:
+            stream.close()  # Closes the HTTP response of an abandoned Ollama stream
+            request.metrics = getattr(self.handler, 'last_stream_metrics', None)
+        return "".join(parts).strip()
+
+
+# Global instance
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_chat_scheduler(handler) -> ChatScheduler:
+    """Get or create the shared scheduler for a handler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler.handler is not handler:
+            _scheduler = ChatScheduler(handler)
+    return _scheduler
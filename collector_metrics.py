@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Collector Metrics
+Counters, gauges and histograms for the inverter collector, exposed as
+Prometheus text on /metrics, as JSON on /metrics.json, and as a JSON
+snapshot file rewritten after every poll.
+
+Histograms also keep a window of recent observations so the JSON view can
+show p50/p95 trends (e.g. inverter latency creeping up on a failing Wi-Fi
+link) without a Prometheus server.
+
+Usage:
+    registry = MetricsRegistry()
+    poll_latency = registry.histogram('solax_poll_latency_seconds', 'Inverter HTTP round trip')
+    poll_latency.observe(0.42)
+    serve_in_background(registry)
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Sequence, Tuple
+from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+METRICS_PORT = int(os.getenv('COLLECTOR_METRICS_PORT', '9105'))
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT_WINDOW = 288  # One day of 5-minute polls
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def _labels_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: Tuple, extra: Dict[str, str] = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic count, optionally split by labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()] or [(self.name, (), 0)]
+
+    def snapshot(self):
+        with self._lock:
+            if not self._values:
+                return 0
+            if list(self._values) == [()]:
+                return self._values[()]
+            return {','.join(f'{k}={v}' for k, v in key): value for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    """Value that goes up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_labels_key(labels)] = value
+
+
+class Histogram:
+    """Bucketed observations plus a window of recent values for percentiles"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 window: int = RECENT_WINDOW):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            self._counts[i] += 1
+            self._sum += value
+            self._recent.append(value)
+
+    def time(self):
+        """Context manager observing the elapsed wall time of a block"""
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        rows, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            rows.append((f'{self.name}_bucket', (), cumulative, {'le': _format_value(bound)}))
+        rows.append((f'{self.name}_sum', (), total))
+        rows.append((f'{self.name}_count', (), cumulative))
+        return rows
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total = sum(self._counts), self._sum
+        summary = {'count': count, 'sum': round(total, 6)}
+        if recent:
+            pick = lambda q: recent[min(len(recent) - 1, int(q * len(recent)))]
+            summary['recent'] = {'n': len(recent), 'p50': round(pick(0.5), 6),
+                                 'p95': round(pick(0.95), 6), 'max': round(recent[-1], 6)}
+        return summary
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """Named metrics in registration order"""
+
+    def __init__(self):
+        self._metrics = {}
+        self.started_at = time.time()
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample in metric.samples():
+                name, key, value = sample[:3]
+                extra = sample[3] if len(sample) > 3 else None
+                lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'metrics': {name: metric.snapshot() for name, metric in self._metrics.items()},
+        }
+
+    def write_snapshot(self, path: Path):
+        """Write the JSON snapshot atomically (readers never see a partial file)"""
+        path = Path(path)
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+# ============================================================================
+# HTTP SERVICE
+# ============================================================================
+
+def make_handler(registry: MetricsRegistry):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/metrics':
+                return self._send(200, registry.render_prometheus().encode(),
+                                  'text/plain; version=0.0.4; charset=utf-8')
+            if path == '/metrics.json':
+                return self._send(200, json.dumps(registry.snapshot()).encode(), 'application/json')
+            self._send(404, json.dumps({'error': f'Unknown endpoint {path}'}).encode(), 'application/json')
+
+        def log_message(self, format, *args):
+            log.debug(format % args)
+
+    return MetricsHandler
+
+
+def serve_in_background(registry: MetricsRegistry, port: int = METRICS_PORT,
+                        host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Start the metrics endpoint on a daemon thread (call shutdown() on the result to stop it)"""
+    server = ThreadingHTTPServer((host, port), make_handler(registry))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='collector-metrics', daemon=True).start()
+    return server
@@ -0,0 +1,194 @@
+"""
+Enhanced Jarvis AI - Conversation Context Manager
+Tracks token counts per message, folds older turns into a rolling summary and
+assembles prompts within a token budget. Each turn is tokenized and rendered
+once when it is added, so building a prompt never re-tokenizes the history.
+"""
+
+import os
+import re
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKENS', '2048'))
+SUMMARY_SHARE = 0.25  # Fraction of the budget the rolling summary may use
+SUMMARY_LINE_CHARS = 160
+SUMMARY_HEADER = "Summary of earlier conversation:\n"
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap BPE-like token estimate: one per word/punctuation, plus one per 5 chars of long words"""
+    return sum(1 + len(piece) // 5 for piece in _TOKEN_PIECES.findall(text))
+
+
+class _Turn:
+    __slots__ = ('role', 'content', 'line', 'tokens')
+
+    def __init__(self, role: str, content: str, count_tokens: Callable[[str], int]):
+        self.role = role
+        self.content = content
+        speaker = "Human" if role == "user" else "Assistant"
+        self.line = f"{speaker}: {content}\n"
+        self.tokens = count_tokens(self.line)
+
+
+class ConversationContext:
+    """
+    Bounded conversation state for prompt assembly
+
+    Args:
+        system_prompt: Prepended to every prompt
+        token_budget: Max prompt tokens (system + summary + history + message)
+        count_tokens: Token counter (default: estimate_tokens; pass a real
+            tokenizer's length function for exact counts)
+    """
+
+    def __init__(self, system_prompt: str, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self._system_line = f"System: {system_prompt}\n"
+        self._system_tokens = count_tokens(self._system_line)
+        self._header_tokens = count_tokens(SUMMARY_HEADER)
+        self.reset()
+
+    def reset(self):
+        self._turns = deque()      # Verbatim recent turns
+        self._turn_tokens = 0      # Running total of self._turns
+        self._summary = deque()    # (line, tokens) for folded-in older turns
+        self._summary_tokens = 0
+        self._synced = 0           # Caller's history entries already added
+        self._synced_last = None   # ...and the last of them (identity)
+        self.summarized_turns = 0
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        """Retained verbatim turns, oldest first"""
+        return [{"role": t.role, "content": t.content} for t in self._turns]
+
+    @property
+    def total_turns(self) -> int:
+        """Turns added since the last reset, including those summarized away"""
+        return len(self._turns) + self.summarized_turns
+
+    @property
+    def summary(self) -> str:
+        return "".join(line for line, _ in self._summary)
+
+    # -- Updates -------------------------------------------------------------
+
+    def add(self, role: str, content: str):
+        """Add one turn (O(1) tokenization), compressing older turns if over budget"""
+        turn = _Turn(role, content, self.count_tokens)
+        self._turns.append(turn)
+        self._turn_tokens += turn.tokens
+        self._compress(self.token_budget - self._system_tokens)
+
+    def sync(self, chat_history: List[Dict], current_message: Optional[str] = None):
+        """
+        Follow a caller-owned history list (e.g. Streamlit session state)
+
+        Only entries not seen before are added. A history that no longer
+        extends the one already synced (cleared chat), or turns recorded via
+        add(), reset the context first. A
+        trailing user entry equal to current_message is left for the prompt.
+        """
+        entries = [c for c in chat_history if c.get("role") in ("user", "assistant")]
+        if (entries and entries[-1]["role"] == "user" and current_message is not None
+                and entries[-1]["content"] == current_message):
+            entries = entries[:-1]
+
+        n = self._synced
+        unsynced_turns = not n and (self._turns or self._summary)  # Added via add(), not this caller
+        if len(entries) < n or (n and entries[n - 1] is not self._synced_last) or unsynced_turns:
+            self.reset()
+            n = 0
+
+        for entry in entries[n:]:
+            self.add(entry["role"], entry["content"])
+        self._synced = len(entries)
+        self._synced_last = entries[-1] if entries else None
+
+    def _compress(self, available: int):
+        """Fold the oldest turns into the summary until the history fits its share"""
+        summary_budget = int(self.token_budget * SUMMARY_SHARE) - self._header_tokens
+        history_budget = available - summary_budget
+
+        while self._turns and self._turn_tokens > history_budget:
+            turn = self._turns.popleft()
+            self._turn_tokens -= turn.tokens
+            self.summarized_turns += 1
+
+            # Extractive summary: first sentence of the turn, trimmed
+            first = re.split(r"(?<=[.!?])\s|\n", turn.content.strip(), maxsplit=1)[0]
+            if len(first) > SUMMARY_LINE_CHARS:
+                first = first[:SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+            line = f"- {'User' if turn.role == 'user' else 'Assistant'}: {first}\n"
+            tokens = self.count_tokens(line)
+            self._summary.append((line, tokens))
+            self._summary_tokens += tokens
+
+        # Rolling: the oldest summary lines go first
+        while self._summary and self._summary_tokens > summary_budget:
+            _, tokens = self._summary.popleft()
+            self._summary_tokens -= tokens
+
+    # -- Prompt assembly -----------------------------------------------------
+
+    def _window(self, message_tokens: int) -> List[_Turn]:
+        """Most recent turns that fit next to the system prompt, summary and message"""
+        available = self.token_budget - self._system_tokens - message_tokens
+        if self._summary:
+            available -= self._header_tokens + self._summary_tokens
+        if self._turn_tokens <= available:
+            return list(self._turns)
+
+        kept, used = [], 0
+        for turn in reversed(self._turns):
+            if used + turn.tokens > available:
+                break
+            kept.append(turn)
+            used += turn.tokens
+        return kept[::-1]
+
+    def build_prompt(self, message: str, reference: str = '') -> str:
+        """Completion-style prompt (System/Human/Assistant lines) within the budget
+
+        reference (e.g. retrieved document excerpts) goes just before the
+        current message and counts against the budget.
+        """
+        current = f"{reference}Human: {message}\nAssistant: "
+        parts = [self._system_line]
+        if self._summary:
+            parts.append(SUMMARY_HEADER + self.summary)
+        parts.extend(turn.line for turn in self._window(self.count_tokens(current)))
+        parts.append(current)
+        return "".join(parts)
+
+    def build_messages(self, message: str, system_prompt: Optional[str] = None,
+                       reference: str = '') -> List[Dict[str, str]]:
+        """Chat-API message list within the budget (reference is prefixed to the user message)"""
+        system = system_prompt or self.system_prompt
+        if self._summary:
+            system += "\n\n" + SUMMARY_HEADER + self.summary
+        content = f"{reference}\n{message}" if reference else message
+        messages = [{"role": "system", "content": system}]
+        messages += [{"role": t.role, "content": t.content}
+                     for t in self._window(self.count_tokens(content))]
+        messages.append({"role": "user", "content": content})
+        return messages
+
+    def get_status(self) -> Dict[str, int]:
+        return {
+            "token_budget": self.token_budget,
+            "history_turns": len(self._turns),
+            "history_tokens": self._turn_tokens,
+            "summary_tokens": self._summary_tokens,
+            "summarized_turns": self.summarized_turns,
+        }
@@ -55,6 +55,31 @@ const {{ BarChart, Bar, AreaChart, Area, LineChart, Line, XAxis, YAxis, Cartesia
 // Embedded enhanced data
 const ENHANCED_DATA = {enhanced_data_js};
 
+// Scenarios are delta-encoded against the continuous run (see scenario_compaction.py)
+const centi = v => Math.round(v * 100);
+function expandScenario(scenario) {{
+  if (scenario.encoding !== 'delta_v1') return scenario.daily_results || scenario.sample_days || [];
+  const usable = ENHANCED_DATA.battery_spec.usable_kwh;
+  return ENHANCED_DATA.continuous_simulation.daily_results.map((base, i) => {{
+    const maxSoc = (centi(base.max_soc_kwh) + scenario.max_soc_delta[i]) / 100;
+    const ttf = scenario.time_to_full_min[i];
+    const hourly = {{}};
+    Object.keys(base.hourly_soc).forEach((h, j) => {{
+      hourly[h] = (centi(base.hourly_soc[h]) + scenario.hourly_soc_delta[i][j]) / 100;
+    }});
+    return {{
+      date: base.date,
+      day_of_week: base.day_of_week,
+      total_solar_kwh: base.total_solar_kwh,
+      starting_soc_kwh: scenario.starting_soc_kwh,
+      max_battery_soc_kwh: maxSoc,
+      battery_filled_pct: scenario.filled_pct_fix[String(i)] ?? Math.round(maxSoc / usable * 1000) / 10,
+      time_to_full: ttf === null ? null : `${{String(Math.floor(ttf / 60)).padStart(2, '0')}}:${{String(ttf % 60).padStart(2, '0')}}`,
+      hourly_soc: hourly
+    }};
+  }});
+}}
+
 function BatteryAnalysis() {{
   const [simulationMode, setSimulationMode] = useState('realistic'); // 'realistic' or 'scenario'
   const [startingSOC, setStartingSOC] = useState('0%');
@@ -67,11 +92,12 @@ function BatteryAnalysis() {{
     if (simulationMode === 'realistic') {{
       return ENHANCED_DATA.continuous_simulation;
     }} else {{
-      return ENHANCED_DATA.scenario_based[startingSOC];
+      const scenario = ENHANCED_DATA.scenario_based[startingSOC];
+      return {{ ...scenario, daily_results: expandScenario(scenario) }};
     }}
   }}, [simulationMode, startingSOC]);
 
-  const dailyResults = currentData.daily_results || currentData.sample_days || [];
+  const dailyResults = currentData.daily_results || [];
   const summary = currentData.summary;
 
   // Find selected day
@@ -10,65 +10,54 @@ FINANCE_CALCULATOR_COMPONENT = '''
    FINANCE CALCULATOR - Flexible Lender Comparison
    ═══════════════════════════════════════════════════════════════════════ */
 
-function calculateEffectiveAPR(principal, termYears, interestRate, feeAmount, feeFrequency, establishmentFee) {
-  // Convert fee frequency to annual payments
-  const frequencyMap = {
-    'weekly': 52,
-    'fortnightly': 26,
-    'monthly': 12,
-    'quarterly': 4,
-    'annually': 1
+// Effective APR comes from finance_engine.py, which solves every offer in one
+// vectorized call; the totals below are closed-form and shown while it loads.
+// The engine runs on its own port (FINANCE_ENGINE_PORT) next to the dashboard.
+const FINANCE_ENGINE_PORT = 5002;
+const FINANCE_ENGINE_HOST = window.location.protocol === 'file:' ? 'http://192.168.68.60' : `${window.location.protocol}//${window.location.hostname}`;
+const FINANCE_API_URL = `${FINANCE_ENGINE_HOST}:${FINANCE_ENGINE_PORT}/api/solar/finance`;
+
+function financeOffer(s) {
+  return {
+    principal: s.principal,
+    termYears: s.termYears,
+    interestRate: s.interestRate,
+    feeAmount: s.feeAmount,
+    feeFrequency: s.feeFrequency,
+    establishmentFee: s.establishmentFee
   };
+}
 
-  const paymentsPerYear = frequencyMap[feeFrequency] || 12;
-  const totalPayments = termYears * paymentsPerYear;
-
-  // Calculate payment per period
-  let paymentPerPeriod;
-
-  if (interestRate === 0 && feeAmount > 0) {
-    // Fee-based loan (like Brighte): principal/periods + flat fee
-    paymentPerPeriod = (principal / totalPayments) + feeAmount;
-  } else if (interestRate > 0 && feeAmount === 0) {
-    // Traditional interest-only loan: calculate using amortization formula
-    const r = (interestRate / 100) / paymentsPerYear;
-    paymentPerPeriod = principal * (r * Math.pow(1 + r, totalPayments)) / (Math.pow(1 + r, totalPayments) - 1);
-  } else if (interestRate > 0 && feeAmount > 0) {
-    // Hybrid: interest calculation + flat fee
-    const r = (interestRate / 100) / paymentsPerYear;
-    const interestPayment = principal * (r * Math.pow(1 + r, totalPayments)) / (Math.pow(1 + r, totalPayments) - 1);
-    paymentPerPeriod = interestPayment + feeAmount;
-  } else {
-    // No interest, no fees: just principal repayment
-    return 0;
-  }
-
-  // Use Newton's method to find the effective rate (IRR)
-  let r = 0.001 / paymentsPerYear; // initial guess
-
-  for (let iter = 0; iter < 200; iter++) {
-    let npv = 0;
-    let dnpv = 0;
-
-    for (let i = 1; i <= totalPayments; i++) {
-      const payment = i === 1 ? paymentPerPeriod + establishmentFee : paymentPerPeriod;
-      const discount = Math.pow(1 + r, i);
-      npv += payment / discount;
-      dnpv -= i * payment / (discount * (1 + r));
-    }
+function fetchFinanceComparison(offers, signal) {
+  const query = encodeURIComponent(JSON.stringify(offers));
+  return fetch(`${FINANCE_API_URL}/compare?offers=${query}`, { signal })
+    .then(res => {
+      if (!res.ok) throw new Error(`Finance engine returned ${res.status}`);
+      return res.json();
+    })
+    .then(data => data.offers);
+}
 
-    npv -= principal;
-    const newR = r - npv / dnpv;
+// Fallback when the engine can't be reached: the same closed-form annuity NPV,
+// bisected in the browser (slower per offer, but the tab still works)
+function calculateEffectiveAPR(principal, termYears, interestRate, feeAmount, feeFrequency, establishmentFee) {
+  const frequencyMap = { 'weekly': 52, 'fortnightly': 26, 'monthly': 12, 'quarterly': 4, 'annually': 1 };
+  const paymentsPerYear = frequencyMap[feeFrequency] || 12;
+  const n = Math.round(termYears * paymentsPerYear);
+  const { paymentPerPeriod } = calculateTotalCost(principal, termYears, interestRate, feeAmount, feeFrequency, establishmentFee);
+  if (!(n > 0) || !(principal > 0)) return 0;
 
-    if (Math.abs(newR - r) < 1e-12) {
-      r = newR;
-      break;
-    }
-    r = newR;
+  const npv = r => {
+    const annuity = Math.abs(r) < 1e-12 ? n : (1 - Math.pow(1 + r, -n)) / r;
+    return paymentPerPeriod * annuity + establishmentFee / (1 + r) - principal;
+  };
+  let lo = -0.99, hi = 1;
+  while (npv(hi) > 0 && hi < 1e6) { lo = hi; hi *= 2; }
+  for (let iter = 0; iter < 100 && hi - lo > 1e-12; iter++) {
+    const mid = (lo + hi) / 2;
+    if (npv(mid) > 0) lo = mid; else hi = mid;
   }
-
-  const annualRate = Math.pow(1 + r, paymentsPerYear) - 1;
-  return annualRate * 100;
+  return (Math.pow(1 + (lo + hi) / 2, paymentsPerYear) - 1) * 100;
 }
 
 function calculateTotalCost(principal, termYears, interestRate, feeAmount, feeFrequency, establishmentFee) {
@@ -162,28 +151,58 @@ function FinanceCalculator({ batteryNetCost }) {
     setScenarios(newScenarios);
   };
 
+  // Precomputed comparison for the enabled scenarios, refetched (debounced) when they change
+  const offers = useMemo(() => scenarios.filter(s => s.enabled).map(financeOffer), [scenarios]);
+  const offersKey = JSON.stringify(offers);
+  const [comparison, setComparison] = useState({ key: null, offers: [] });
+  // Last fetch failed: APRs are computed locally until the engine answers again
+  const [engineError, setEngineError] = useState(null);
+
+  useEffect(() => {
+    if (offers.length === 0) return;
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      fetchFinanceComparison(offers, controller.signal)
+        .then(rows => {
+          setComparison({ key: offersKey, offers: rows });
+          setEngineError(null);
+        })
+        .catch(err => {
+          if (err.name === 'AbortError') return;
+          console.warn('Finance engine unavailable:', err.message);
+          setEngineError(err.message);
+        });
+    }, 250);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [offersKey]);
+
   // Calculate results for all scenarios
   const results = useMemo(() => {
-    return scenarios.map(s => {
-      if (!s.enabled) return null;
-
-      const effectiveAPR = calculateEffectiveAPR(
-        s.principal, s.termYears, s.interestRate,
-        s.feeAmount, s.feeFrequency, s.establishmentFee
-      );
-
+    const solved = comparison.key === offersKey ? comparison.offers : [];
+    return scenarios.filter(s => s.enabled).map((s, i) => {
       const costs = calculateTotalCost(
         s.principal, s.termYears, s.interestRate,
         s.feeAmount, s.feeFrequency, s.establishmentFee
       );
 
+      let effectiveAPR = solved[i] ? solved[i].effective_apr : null;
+      if (effectiveAPR === null && engineError !== null) {
+        effectiveAPR = calculateEffectiveAPR(
+          s.principal, s.termYears, s.interestRate,
+          s.feeAmount, s.feeFrequency, s.establishmentFee
+        );
+      }
+
       return {
         ...s,
         effectiveAPR,
         ...costs
       };
-    }).filter(r => r !== null);
-  }, [scenarios]);
+    });
+  }, [scenarios, comparison, offersKey, engineError]);
 
   const offsetCost = useMemo(() => {
     if (!compareOffset || results.length === 0) return null;
@@ -472,6 +491,21 @@ function FinanceCalculator({ batteryNetCost }) {
         <div style={{ padding: '0 32px' }}>
           <h3 style={{ fontSize: 18, fontWeight: 600, marginBottom: 16 }}>Comparison Results</h3>
 
+          {engineError !== null && (
+            <div style={{
+              background: '#422006',
+              border: '1px solid #f59e0b',
+              borderRadius: 8,
+              padding: '10px 14px',
+              marginBottom: 16,
+              fontSize: 13,
+              color: '#fcd34d'
+            }}>
+              ⚠️ Finance engine unavailable ({engineError}) - effective APRs are being calculated in the browser.
+              Start it with <code>python3 finance_engine.py</code> (port {FINANCE_ENGINE_PORT}).
+            </div>
+          )}
+
           {/* Winner Banner */}
           {bestOption && (
             <div style={{
@@ -525,9 +559,9 @@ function FinanceCalculator({ batteryNetCost }) {
                       <td style={{
                         padding: '12px 8px',
                         textAlign: 'right',
-                        color: r.effectiveAPR > mortgageRate ? '#ef4444' : '#10b981'
+                        color: r.effectiveAPR === null ? '#64748b' : r.effectiveAPR > mortgageRate ? '#ef4444' : '#10b981'
                       }}>
-                        {r.effectiveAPR.toFixed(2)}%
+                        {r.effectiveAPR === null ? '…' : `${r.effectiveAPR.toFixed(2)}%`}
                       </td>
                       <td style={{ padding: '12px 8px', textAlign: 'right' }}>
                         {fmt2(r.paymentPerPeriod)}/{frequencyLabels[r.feeFrequency].toLowerCase()}
@@ -693,7 +727,7 @@ def add_finance_tab():
     print("  - Support for interest rates, fees, or hybrid")
     print("  - Multiple payment frequencies (weekly, fortnightly, monthly, etc.)")
     print("  - Mortgage offset comparison")
-    print("  - Effective APR calculation using Newton's method")
+    print("  - Effective APR from finance_engine.py (run: python3 finance_engine.py)")
     print("  - Visual comparison with best option highlighted")
     print()
     print("Open BatteryROI_7.html in your browser to test!")
@@ -0,0 +1,434 @@
+"""
+Enhanced Jarvis AI - Document Index
+Chunked document ingestion and top-k retrieval for chat (RAG)
+
+- Streaming chunker over text/PDF/DOCX, cutting at content-defined paragraph
+  boundaries so an edit only changes the chunks around it
+- Chunks are stored in SQLite with their hash; re-uploading a document only
+  embeds chunks that changed
+- Embedding runs in batches on a background worker so large manuals don't
+  block the UI
+- Retrieval is cosine similarity over an in-memory matrix that grows
+  incrementally as chunks are embedded
+"""
+
+import io
+import os
+import re
+import zlib
+import queue
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = Path(os.getenv('DOCUMENT_INDEX_PATH', Path(__file__).parent / 'document_index.db'))
+MIN_CHUNK_CHARS = 400
+MAX_CHUNK_CHARS = 1200
+CHUNK_OVERLAP_CHARS = 150
+ANCHOR_MODULUS = 4      # ~1 in 4 paragraphs ends a chunk once MIN_CHUNK_CHARS is reached
+EMBED_BATCH_SIZE = 32
+TOP_K = 4
+HASHING_DIM = 512
+
+# ============================================================================
+# TEXT EXTRACTION AND CHUNKING
+# ============================================================================
+
+def iter_document_text(data: Union[str, bytes], filename: str) -> Iterator[str]:
+    """Yield a document's text piece by piece (PDF page by page)"""
+    suffix = Path(filename).suffix.lower()
+    if suffix == '.pdf':
+        from pypdf import PdfReader
+        for page in PdfReader(io.BytesIO(data)).pages:
+            yield (page.extract_text() or '') + '\n\n'
+    elif suffix == '.docx':
+        import docx2txt
+        yield docx2txt.process(io.BytesIO(data))
+    else:
+        yield data.decode('utf-8', errors='replace') if isinstance(data, bytes) else data
+
+
+def _paragraphs(segments: Iterator[str]) -> Iterator[str]:
+    """Paragraphs across segment boundaries, long ones split at sentences"""
+    pending = ''
+    for segment in segments:
+        pending += segment
+        *complete, pending = re.split(r'\n\s*\n', pending)
+        for paragraph in complete:
+            yield from _split_long(paragraph.strip())
+    yield from _split_long(pending.strip())
+
+
+def _split_long(paragraph: str) -> Iterator[str]:
+    if not paragraph:
+        return
+    if len(paragraph) <= MAX_CHUNK_CHARS:
+        yield paragraph
+        return
+    piece = ''
+    for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+        while len(sentence) > MAX_CHUNK_CHARS:  # No sentence breaks at all
+            yield sentence[:MAX_CHUNK_CHARS]
+            sentence = sentence[MAX_CHUNK_CHARS:]
+        if piece and len(piece) + len(sentence) + 1 > MAX_CHUNK_CHARS:
+            yield piece
+            piece = ''
+        piece = f"{piece} {sentence}" if piece else sentence
+    if piece:
+        yield piece
+
+
+def _is_anchor(paragraph: str) -> bool:
+    return zlib.crc32(paragraph.encode('utf-8')) % ANCHOR_MODULUS == 0
+
+
+def iter_chunks(segments: Iterator[str]) -> Iterator[str]:
+    """
+    Chunk streamed text at content-defined paragraph boundaries
+
+    A chunk ends at an "anchor" paragraph (chosen by hash) once it has
+    MIN_CHUNK_CHARS, or when the next paragraph would exceed MAX_CHUNK_CHARS.
+    Each chunk starts with the tail of the previous one for context.
+    """
+    current, size, carry = [], 0, ''
+    for paragraph in _paragraphs(segments):
+        if current and size + len(paragraph) > MAX_CHUNK_CHARS:
+            chunk = '\n\n'.join(current)
+            yield chunk
+            carry = _tail(chunk)
+            current, size = [], 0
+
+        if not current and carry:
+            current, size = [carry], len(carry)
+        current.append(paragraph)
+        size += len(paragraph)
+
+        if size >= MIN_CHUNK_CHARS and _is_anchor(paragraph):
+            chunk = '\n\n'.join(current)
+            yield chunk
+            carry = _tail(chunk)
+            current, size = [], 0
+
+    if current and (len(current) > 1 or not carry):
+        yield '\n\n'.join(current)
+
+
+def _tail(chunk: str) -> str:
+    """Last CHUNK_OVERLAP_CHARS of a chunk, starting at a word boundary"""
+    if len(chunk) <= CHUNK_OVERLAP_CHARS:
+        return chunk
+    tail = chunk[-CHUNK_OVERLAP_CHARS:]
+    space = tail.find(' ')
+    return '...' + (tail[space + 1:] if space >= 0 else tail)
+
+# ============================================================================
+# EMBEDDERS
+# ============================================================================
+
+_STOPWORDS = set("""
+a an and are as at be by can do for from has have how i if in is it its my no not of on or our
+should so that the their there this to was we what when where which who why will with you your
+""".split())
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping so 'washers', 'washing' and 'wash' share features"""
+    for suffix in ('ings', 'ing', 'ers', 'er', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+class HashingEmbedder:
+    """Dependency-free fallback: signed feature hashing of stemmed words and word pairs"""
+
+    name = f'hashing-{HASHING_DIM}'
+    min_score = 0.1  # Lexical overlap scores run low
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), HASHING_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = [_stem(w) for w in re.findall(r'\w+', text.lower()) if w not in _STOPWORDS]
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % HASHING_DIM] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class SentenceTransformerEmbedder:
+    """Batched sentence-transformers embeddings (normalized)"""
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.name = f'st-{model_name}'
+        self.min_score = 0.3
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=EMBED_BATCH_SIZE,
+                                 normalize_embeddings=True).astype(np.float32)
+
+
+def default_embedder():
+    try:
+        return SentenceTransformerEmbedder()
+    except Exception as e:
+        logger.info(f"sentence-transformers unavailable ({e}) - using hashing embeddings")
+        return HashingEmbedder()
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+class DocumentIndex:
+    """On-disk chunk store with incremental embedding and top-k retrieval"""
+
+    def __init__(self, path: Path = INDEX_PATH, embedder=None):
+        self.embedder = embedder or default_embedder()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                name TEXT PRIMARY KEY,
+                content_hash TEXT,
+                chunks INTEGER,
+                words INTEGER,
+                chars INTEGER,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                document TEXT NOT NULL,
+                position INTEGER,
+                chunk_hash TEXT,
+                text TEXT,
+                embedding BLOB
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks(document, chunk_hash);
+            CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+        # A different embedder invalidates every stored vector
+        row = self._db.execute("SELECT value FROM index_meta WHERE key = 'embedder'").fetchone()
+        if row is None or row[0] != self.embedder.name:
+            self._db.execute("UPDATE chunks SET embedding = NULL")
+            self._db.execute("INSERT OR REPLACE INTO index_meta VALUES ('embedder', ?)", (self.embedder.name,))
+        self._db.commit()
+
+        self._ids = None     # Chunk ids, aligned with self._matrix rows
+        self._matrix = None
+        self.status = {}     # Document name -> ingestion progress
+        self._jobs = queue.Queue()
+        threading.Thread(target=self._run, name='document-index', daemon=True).start()
+        if self.pending_chunks():
+            self._jobs.put(None)  # Finish embedding left over from a previous run
+
+    # -- Ingestion -----------------------------------------------------------
+
+    def add_document(self, name: str, data: Union[str, bytes]) -> Dict[str, Any]:
+        """
+        Chunk a document and reconcile it with the stored chunks; new chunks
+        are queued for background embedding
+
+        Returns:
+            Dict with chunk counts (total/new/reused/removed) and a preview
+        """
+        raw = data.encode('utf-8') if isinstance(data, str) else data
+        content_hash = hashlib.sha256(raw).hexdigest()
+
+        with self._lock:
+            row = self._db.execute("SELECT content_hash, chunks, words, chars FROM documents WHERE name = ?",
+                                   (name,)).fetchone()
+            if row and row[0] == content_hash:
+                return {'chunks': row[1], 'new': 0, 'reused': row[1], 'removed': 0, 'unchanged': True,
+                        'preview': self._preview(name), 'words': row[2], 'chars': row[3]}
+
+            existing = {}
+            for chunk_id, chunk_hash in self._db.execute(
+                    "SELECT id, chunk_hash FROM chunks WHERE document = ?", (name,)):
+                existing.setdefault(chunk_hash, []).append(chunk_id)
+
+            counts = {'words': 0, 'chars': 0}
+
+            def counted(segments):
+                for segment in segments:
+                    counts['words'] += len(segment.split())
+                    counts['chars'] += len(segment)
+                    yield segment
+
+            new = reused = 0
+            for position, text in enumerate(iter_chunks(counted(iter_document_text(data, name)))):
+                chunk_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+                if existing.get(chunk_hash):
+                    chunk_id = existing[chunk_hash].pop()
+                    self._db.execute("UPDATE chunks SET position = ? WHERE id = ?", (position, chunk_id))
+                    reused += 1
+                else:
+                    self._db.execute("""
+                        INSERT INTO chunks (document, position, chunk_hash, text) VALUES (?, ?, ?, ?)
+                    """, (name, position, chunk_hash, text))
+                    new += 1
+
+            stale = [chunk_id for ids in existing.values() for chunk_id in ids]
+            self._db.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in stale])
+            self._db.execute("""
+                INSERT OR REPLACE INTO documents (name, content_hash, chunks, words, chars, updated_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (name, content_hash, new + reused, counts['words'], counts['chars']))
+            self._db.commit()
+
+            if stale:
+                self._ids = self._matrix = None  # Rebuilt lazily without the removed rows
+            self.status[name] = {'state': 'embedding' if new else 'ready', 'pending': new}
+
+        if new:
+            self._jobs.put(name)
+        return {'chunks': new + reused, 'new': new, 'reused': reused, 'removed': len(stale),
+                'unchanged': False, 'preview': self._preview(name), **counts}
+
+    def _preview(self, name: str) -> str:
+        row = self._db.execute("SELECT text FROM chunks WHERE document = ? ORDER BY position LIMIT 1",
+                               (name,)).fetchone()
+        return row[0] if row else ''
+
+    def pending_chunks(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks WHERE embedding IS NULL").fetchone()[0]
+
+    def _run(self):
+        """Background worker: embed pending chunks in batches"""
+        while True:
+            self._jobs.get()
+            try:
+                self._embed_pending()
+            except Exception as e:
+                logger.error(f"Document embedding failed: {e}")
+
+    def _embed_pending(self):
+        while True:
+            with self._lock:
+                rows = self._db.execute("""
+                    SELECT id, document, text FROM chunks WHERE embedding IS NULL LIMIT ?
+                """, (EMBED_BATCH_SIZE,)).fetchall()
+            if not rows:
+                for state in self.status.values():
+                    state.update(state='ready', pending=0)
+                return
+
+            # Embed outside the lock so retrieval keeps working meanwhile
+            vectors = self.embedder.embed([text for _, _, text in rows])
+
+            with self._lock:
+                self._db.executemany("UPDATE chunks SET embedding = ? WHERE id = ?",
+                                     [(v.tobytes(), chunk_id) for (chunk_id, _, _), v in zip(rows, vectors)])
+                self._db.commit()
+                live = {r[0] for r in self._db.execute(
+                    f"SELECT id FROM chunks WHERE id IN ({','.join('?' * len(rows))})",
+                    [r[0] for r in rows])}
+                if self._matrix is not None:
+                    keep = [i for i, (chunk_id, _, _) in enumerate(rows) if chunk_id in live]
+                    self._ids = np.concatenate([self._ids, np.array([rows[i][0] for i in keep])])
+                    self._matrix = np.vstack([self._matrix, vectors[keep]])
+                for _, document, _ in rows:
+                    if document in self.status:
+                        self.status[document]['pending'] = max(0, self.status[document]['pending'] - 1)
+
+    # -- Retrieval -----------------------------------------------------------
+
+    def _load_matrix(self):
+        rows = self._db.execute("SELECT id, embedding FROM chunks WHERE embedding IS NOT NULL").fetchall()
+        if rows:
+            self._ids = np.array([r[0] for r in rows])
+            self._matrix = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+        else:
+            self._ids = self._matrix = None
+
+    def search(self, query: str, k: int = TOP_K, min_score: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Top-k chunks by cosine similarity to the query (at least the embedder's min_score)"""
+        if min_score is None:
+            min_score = self.embedder.min_score
+        with self._lock:
+            if self._matrix is None:
+                self._load_matrix()
+            if self._matrix is None:
+                return []
+            ids, matrix = self._ids, self._matrix
+
+        scores = matrix @ self.embedder.embed([query])[0]
+        top = np.argsort(-scores)[:k]
+        hits = [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+        if not hits:
+            return []
+
+        with self._lock:
+            rows = {r[0]: r[1:] for r in self._db.execute(
+                f"SELECT id, document, position, text FROM chunks WHERE id IN ({','.join('?' * len(hits))})",
+                [chunk_id for chunk_id, _ in hits])}
+        return [{'document': rows[chunk_id][0], 'position': rows[chunk_id][1],
+                 'text': rows[chunk_id][2], 'score': round(score, 3)}
+                for chunk_id, score in hits if chunk_id in rows]
+
+    def documents(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{'name': name, 'chunks': chunks, 'updated_at': updated_at,
+                     **self.status.get(name, {'state': 'ready', 'pending': 0})}
+                    for name, chunks, updated_at in self._db.execute(
+                        "SELECT name, chunks, updated_at FROM documents ORDER BY updated_at DESC")]
+
+    def get_status(self) -> Dict[str, Any]:
+        docs = self.documents()
+        return {
+            'documents': len(docs),
+            'chunks': sum(d['chunks'] for d in docs),
+            'pending_embeddings': self.pending_chunks(),
+            'embedder': self.embedder.name,
+        }
+
+
+def format_excerpts(hits: List[Dict[str, Any]]) -> str:
+    """Retrieved chunks as a prompt section"""
+    if not hits:
+        return ''
+    lines = ["Relevant excerpts from uploaded documents:"]
+    for i, hit in enumerate(hits, 1):
+        lines.append(f"[{i}] ({hit['document']}) {hit['text']}")
+    return '\n'.join(lines) + '\n'
+
+
+def reference_for(query: str, k: int = TOP_K) -> str:
+    """Excerpts from indexed documents relevant to a chat message ('' if none)"""
+    if _index is None and not INDEX_PATH.exists():
+        return ''  # Nothing was ever uploaded: don't load an embedding model to find that out
+    try:
+        return format_excerpts(get_document_index().search(query, k=k))
+    except Exception as e:
+        logger.warning(f"Document retrieval failed: {e}")
+        return ''
+
+
+# Global instance, built (embedding model and all) on the first upload or retrieval
+_index = None
+_index_lock = threading.Lock()
+
+def get_document_index() -> DocumentIndex:
+    """Get or create the shared document index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DocumentIndex()
+    return _index
+
+
+def document_index_status() -> Dict[str, Any]:
+    """Status of the shared index without building it (status reports must stay cheap)"""
+    index = _index
+    if index is None:
+        return {'state': 'not loaded'}
+    return {'state': 'loaded', **index.get_status()}
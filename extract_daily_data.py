@@ -4,12 +4,10 @@ Extract daily_results from battery_daily_charging.json and format for HTML embed
 """
 import json
 
-# Load the full data
-with open('battery_daily_charging.json', 'r') as f:
-    data = json.load(f)
+from result_stream import load_daily_results
 
-# Extract just the daily_results
-daily_results = data['daily_results']
+# Extract just the daily_results (streamed from the .ndjson output when present)
+daily_results = load_daily_results('battery_daily_charging.ndjson', 'battery_daily_charging.json', '')
 
 print(f"Loaded {len(daily_results)} days")
 print(f"First day: {daily_results[0]['date']}")
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Finance Engine
+Loan offer evaluation for the dashboard's Finance tab: payment per period,
+total interest/fees/cost and effective APR for every offer, computed
+server-side so the browser only renders a table.
+
+- Effective APR is the IRR of the repayments against the principal. NPV uses
+  the closed-form annuity factor, so each solver step is O(1) however many
+  periods the loan has
+- The root is kept inside a sign-change bracket: Newton steps that leave it
+  fall back to bisection, so the solver can't diverge
+- Whole grids of (term, rate, fee, frequency, establishment fee) offers are
+  solved in one vectorized call
+- Results are cached by parameter tuple
+
+Run standalone to serve /api/solar/finance/compare and /api/solar/finance/grid:
+    python3 finance_engine.py
+"""
+
+import json
+import logging
+import os
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SERVER_PORT = int(os.getenv('FINANCE_ENGINE_PORT', '5002'))
+
+FREQUENCIES = {
+    'weekly': 52,
+    'fortnightly': 26,
+    'monthly': 12,
+    'quarterly': 4,
+    'annually': 1,
+}
+DEFAULT_FREQUENCY = 'monthly'
+
+SOLVER_TOL = 1e-12      # Per-period rate
+SOLVER_MAX_ITER = 100
+CACHE_SIZE = 1024
+
+# Offer = (principal, term_years, interest_rate %, fee_amount, fee_frequency, establishment_fee)
+Offer = Tuple[float, float, float, float, str, float]
+
+# ============================================================================
+# CLOSED FORMS
+# ============================================================================
+
+def _annuity_factor(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Present value of 1 paid at the end of each of n periods at rate r"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = -np.expm1(-n * np.log1p(r)) / r
+    return np.where(np.abs(r) < 1e-12, n, factor)
+
+
+def _annuity_factor_slope(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """d/dr of the annuity factor"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * (1 + r) ** (-n - 1) - _annuity_factor(r, n)) / r
+    return np.where(np.abs(r) < 1e-12, -n * (n + 1) / 2, slope)
+
+
+def _npv(r, payment, n, establishment_fee, principal):
+    """NPV of the repayments (establishment fee paid with the first) less the principal"""
+    return payment * _annuity_factor(r, n) + establishment_fee / (1 + r) - principal
+
+
+def _npv_slope(r, payment, n, establishment_fee):
+    return payment * _annuity_factor_slope(r, n) - establishment_fee / (1 + r) ** 2
+
+# ============================================================================
+# SOLVER
+# ============================================================================
+
+def solve_periodic_rate(payment, n, establishment_fee, principal) -> np.ndarray:
+    """
+    Per-period IRR for arrays of offers
+
+    NPV falls monotonically in r, so a bracket [lo, hi] with NPV(lo) > 0 >
+    NPV(hi) always holds the root. Newton steps are taken while they stay
+    inside it, otherwise the bracket is bisected.
+    """
+    payment, n, establishment_fee, principal = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (payment, n, establishment_fee, principal)))
+
+    def npv(r):
+        return _npv(r, payment, n, establishment_fee, principal)
+
+    lo = np.full(payment.shape, -0.99)
+    hi = np.ones(payment.shape)
+    for _ in range(60):  # Widen until every bracket changes sign
+        short = npv(hi) > 0
+        if not short.any():
+            break
+        lo = np.where(short, hi, lo)
+        hi = np.where(short, hi * 2, hi)
+
+    r = np.clip(np.zeros(payment.shape), lo, hi)
+    for _ in range(SOLVER_MAX_ITER):
+        f = npv(r)
+        lo = np.where(f > 0, r, lo)
+        hi = np.where(f < 0, r, hi)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = r - f / _npv_slope(r, payment, n, establishment_fee)
+        inside = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        step = np.where(inside, newton, (lo + hi) / 2)
+        done = (np.abs(step - r) < SOLVER_TOL) | (f == 0)
+        r = np.where(f == 0, r, step)
+        if done.all():
+            break
+    return r
+
+# ============================================================================
+# OFFER EVALUATION
+# ============================================================================
+
+def periods_per_year(fee_frequency) -> np.ndarray:
+    names = np.asarray(fee_frequency, dtype=object)
+    return np.vectorize(lambda f: FREQUENCIES.get(f, FREQUENCIES[DEFAULT_FREQUENCY]), otypes=[float])(names)
+
+
+def evaluate_offers(principal, term_years, interest_rate, fee_amount, fee_frequency,
+                    establishment_fee) -> Dict[str, np.ndarray]:
+    """
+    Evaluate offers in one vectorized call; arguments broadcast against each other
+
+    Returns arrays of payment_per_period, total_payments, total_interest,
+    total_fees, total_cost, total_repaid and effective_apr (% p.a.).
+    """
+    ppy = periods_per_year(fee_frequency)
+    principal, term_years, interest_rate, fee_amount, ppy, establishment_fee = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (principal, term_years, interest_rate, fee_amount, ppy,
+                                               establishment_fee)))
+
+    n = np.round(term_years * ppy)
+    rate = interest_rate / 100 / ppy
+    # Amortized repayment, or straight principal/n on an interest-free loan
+    amortized = principal / _annuity_factor(np.where(interest_rate > 0, rate, 0.0), n)
+    payment = amortized + fee_amount
+
+    periodic = solve_periodic_rate(payment, n, establishment_fee, principal)
+    total_interest = amortized * n - principal
+    total_fees = fee_amount * n + establishment_fee
+    return {
+        'payment_per_period': payment,
+        'total_payments': n,
+        'total_interest': total_interest,
+        'total_fees': total_fees,
+        'total_cost': total_interest + total_fees,
+        'total_repaid': principal + total_interest + total_fees,
+        'effective_apr': np.expm1(ppy * np.log1p(periodic)) * 100,
+    }
+
+
+def _rows(offers: Sequence[Offer], results: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    fields = ('principal', 'term_years', 'interest_rate', 'fee_amount', 'fee_frequency', 'establishment_fee')
+    return [
+        {**dict(zip(fields, offer)), **{k: round(float(v[i]), 6) for k, v in results.items()}}
+        for i, offer in enumerate(offers)
+    ]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compare_offers(offers: Tuple[Offer, ...]) -> Tuple[Dict[str, Any], ...]:
+    """Evaluate a fixed list of offers, in order (cached by the offers tuple)"""
+    if not offers:
+        return ()
+    results = evaluate_offers(*zip(*offers))
+    return tuple(_rows(offers, results))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def offer_grid(principal: float, terms: Tuple[float, ...], rates: Tuple[float, ...], fees: Tuple[float, ...],
+               frequencies: Tuple[str, ...], establishment_fees: Tuple[float, ...] = (0.0,)) -> Tuple[Dict[str, Any], ...]:
+    """Every combination of the given terms/rates/fees/frequencies/establishment fees, cheapest first"""
+    grid = [g.ravel() for g in np.meshgrid(np.arange(len(terms)), np.arange(len(rates)), np.arange(len(fees)),
+                                            np.arange(len(frequencies)), np.arange(len(establishment_fees)),
+                                            indexing='ij')]
+    offers = [(principal, terms[t], rates[r], fees[f], frequencies[q], establishment_fees[e])
+              for t, r, f, q, e in zip(*grid)]
+    results = evaluate_offers(principal, np.take(terms, grid[0]), np.take(rates, grid[1]), np.take(fees, grid[2]),
+                              np.take(np.array(frequencies, dtype=object), grid[3]),
+                              np.take(establishment_fees, grid[4]))
+    return tuple(sorted(_rows(offers, results), key=lambda row: row['total_cost']))
+
+
+def offset_cost(principal: float, term_years: float, mortgage_rate: float) -> float:
+    """Interest forgone drawing the principal from a mortgage offset, repaid linearly"""
+    return principal / 2 * mortgage_rate / 100 * term_years
+
+# ============================================================================
+# HTTP SERVICE
+# ============================================================================
+
+def _check_loan(principal: float, term_years: float):
+    """Reject loans the repayment formulas can't price (they'd give Infinity/NaN)"""
+    if not principal > 0:
+        raise ValueError(f'principal must be positive, got {principal}')
+    if not term_years > 0:
+        raise ValueError(f'termYears must be positive, got {term_years}')
+
+
+def _offer_from_json(item: Dict) -> Offer:
+    offer = (
+        float(item['principal']),
+        float(item['termYears']),
+        float(item.get('interestRate', 0)),
+        float(item.get('feeAmount', 0)),
+        str(item.get('feeFrequency', DEFAULT_FREQUENCY)),
+        float(item.get('establishmentFee', 0)),
+    )
+    _check_loan(offer[0], offer[1])
+    return offer
+
+
+def _floats(params: Dict[str, List[str]], name: str, default: str = '') -> Tuple[float, ...]:
+    return tuple(float(v) for v in params.get(name, [default])[0].split(',') if v.strip())
+
+
+def _compare(params: Dict[str, List[str]]) -> Dict:
+    offers = tuple(_offer_from_json(item) for item in json.loads(params['offers'][0]))
+    return {'offers': list(compare_offers(offers))}
+
+
+def _grid(params: Dict[str, List[str]]) -> Dict:
+    frequencies = tuple(f for f in params.get('frequencies', [DEFAULT_FREQUENCY])[0].split(',') if f)
+    principal, terms = float(params['principal'][0]), _floats(params, 'terms')
+    for term_years in terms:
+        _check_loan(principal, term_years)
+    rows = offer_grid(principal, terms, _floats(params, 'rates', '0'),
+                      _floats(params, 'fees', '0'), frequencies, _floats(params, 'establishment', '0'))
+    return {'offers': list(rows)}
+
+
+def _status(params: Dict[str, List[str]]) -> Dict:
+    return {name: fn.cache_info()._asdict() for name, fn in
+            (('compare', compare_offers), ('grid', offer_grid))}
+
+
+ROUTES = {
+    '/api/solar/finance/compare': _compare,
+    '/api/solar/finance/grid': _grid,
+    '/api/solar/finance/status': _status,
+}
+
+
+class FinanceHandler(BaseHTTPRequestHandler):
+    def _send(self, status: int, body: Dict):
+        payload = json.dumps(body, allow_nan=False).encode()  # Never emit invalid JSON
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        route = ROUTES.get(parsed.path)
+        if route is None:
+            return self._send(404, {'error': f'Unknown endpoint {parsed.path}'})
+        try:
+            self._send(200, route(parse_qs(parsed.query)))
+        except (KeyError, ValueError, TypeError) as e:
+            self._send(400, {'error': f'Bad request: {e}'})
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+def serve(port: int = SERVER_PORT, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Create the HTTP server (call serve_forever() on the result)"""
+    return ThreadingHTTPServer((host, port), FinanceHandler)
+
+
+def main():
+    server = serve()
+    log.info(f"Finance engine serving on port {SERVER_PORT}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        log.info("Finance engine stopped")
+
+
+if __name__ == '__main__':
+    main()
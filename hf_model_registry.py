@@ -0,0 +1,222 @@
+"""
+Enhanced Jarvis AI - Local HuggingFace Model Registry
+Loads each local text-generation pipeline once and keeps it warm, with an
+LRU cap on resident models by memory footprint. All generation goes through
+a single worker thread, which micro-batches queued requests for the same
+model into one pipeline call.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_RESIDENT_MB = float(os.getenv('HF_MAX_RESIDENT_MB', '2048'))
+BATCH_WINDOW_S = 0.02  # How long the worker waits for more requests to batch
+MAX_BATCH_SIZE = 8
+
+
+def load_text_generation_pipeline(model_name: str):
+    """Default loader: a batched-ready text-generation pipeline from the local cache"""
+    from transformers import pipeline
+
+    generator = pipeline('text-generation', model=model_name, tokenizer=model_name)
+    tokenizer = generator.tokenizer
+    # Causal LMs need left padding and a pad token to generate in batches
+    tokenizer.padding_side = 'left'
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+        generator.model.config.pad_token_id = tokenizer.eos_token_id
+    return generator
+
+
+def pipeline_footprint_bytes(generator) -> int:
+    """Resident size of a pipeline's weights and buffers"""
+    model = getattr(generator, 'model', None)
+    if model is None:
+        return 0
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class _Request:
+    __slots__ = ('model_name', 'prompt', 'kwargs', 'future')
+
+    def __init__(self, model_name: str, prompt: str, kwargs: Dict[str, Any]):
+        self.model_name = model_name
+        self.prompt = prompt
+        self.kwargs = kwargs
+        self.future = Future()
+
+    def batch_key(self):
+        return self.model_name, tuple(sorted(self.kwargs.items()))
+
+
+class HFModelRegistry:
+    """Warm, memory-capped pool of local pipelines served by one worker thread"""
+
+    def __init__(self, max_resident_mb: float = MAX_RESIDENT_MB,
+                 loader: Callable[[str], Any] = load_text_generation_pipeline,
+                 footprint: Callable[[Any], int] = pipeline_footprint_bytes,
+                 batch_window_s: float = BATCH_WINDOW_S, max_batch_size: int = MAX_BATCH_SIZE):
+        self.max_resident_bytes = int(max_resident_mb * 1024 * 1024)
+        self.loader = loader
+        self.footprint = footprint
+        self.batch_window_s = batch_window_s
+        self.max_batch_size = max_batch_size
+
+        self._models = OrderedDict()  # model_name -> (pipeline, bytes), least recently used first
+        self._queue = queue.Queue()
+        self._pending = []  # Requests pulled while batching that didn't fit the batch
+        self._stats = {'loads': 0, 'evictions': 0, 'batches': 0, 'requests': 0, 'load_s': 0.0}
+        self._worker = threading.Thread(target=self._run, name='hf-model-registry', daemon=True)
+        self._worker.start()
+
+    # -- Public API ----------------------------------------------------------
+
+    def submit(self, model_name: str, prompt: str, **gen_kwargs) -> Future:
+        """Queue a generation; the future resolves to the generated text"""
+        request = _Request(model_name, prompt, gen_kwargs)
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None, **gen_kwargs) -> str:
+        """Generate text for one prompt (blocking)"""
+        return self.submit(model_name, prompt, **gen_kwargs).result(timeout=timeout)
+
+    def warm(self, model_name: str) -> Future:
+        """Load a model ahead of its first request"""
+        return self.submit(model_name, None)
+
+    def get_status(self) -> Dict[str, Any]:
+        resident = [(name, size) for name, (_, size) in list(self._models.items())]
+        stats = dict(self._stats)
+        return {
+            'resident_models': [name for name, _ in resident],
+            'resident_mb': round(sum(size for _, size in resident) / 1024 / 1024, 1),
+            'max_resident_mb': round(self.max_resident_bytes / 1024 / 1024, 1),
+            'queue_depth': self._queue.qsize() + len(self._pending),
+            'avg_batch_size': round(stats['requests'] / stats['batches'], 2) if stats['batches'] else None,
+            **stats,
+        }
+
+    # -- Model residency (worker thread only) --------------------------------
+
+    def _get_pipeline(self, model_name: str):
+        if model_name in self._models:
+            self._models.move_to_end(model_name)
+            return self._models[model_name][0]
+
+        started = time.perf_counter()
+        generator = self.loader(model_name)
+        size = self.footprint(generator)
+        self._stats['loads'] += 1
+        self._stats['load_s'] += time.perf_counter() - started
+        logger.info(f"Loaded local model {model_name} ({size / 1024 / 1024:.0f} MB) "
+                    f"in {time.perf_counter() - started:.1f}s")
+
+        # Evict least recently used models until the new one fits (always keep it)
+        resident = sum(s for _, s in self._models.values())
+        evicted_any = False
+        while self._models and resident + size > self.max_resident_bytes:
+            evicted, (_, evicted_size) = self._models.popitem(last=False)
+            resident -= evicted_size
+            evicted_any = True
+            self._stats['evictions'] += 1
+            logger.info(f"Evicted local model {evicted} ({evicted_size / 1024 / 1024:.0f} MB)")
+        if evicted_any:
+            self._release_memory()
+
+        self._models[model_name] = (generator, size)
+        return generator
+
+    @staticmethod
+    def _release_memory():
+        try:
+            import gc
+            gc.collect()
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    # -- Worker --------------------------------------------------------------
+
+    def _next_request(self, timeout: Optional[float] = None) -> Optional[_Request]:
+        if self._pending:
+            return self._pending.pop(0)
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _collect_batch(self, first: _Request) -> List[_Request]:
+        """Gather queued requests compatible with the first, within the batch window"""
+        batch = [first]
+        deadline = time.perf_counter() + self.batch_window_s
+        skipped = []
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            request = self._next_request(timeout=remaining)
+            if request is None:
+                break
+            if request.prompt is not None and request.batch_key() == first.batch_key():
+                batch.append(request)
+            else:
+                skipped.append(request)
+
+        # Keep arrival order for requests that belong to another batch
+        self._pending = skipped + self._pending
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._next_request()
+            if first.prompt is None:
+                # Warm-up request
+                try:
+                    self._get_pipeline(first.model_name)
+                    first.future.set_result(None)
+                except Exception as e:
+                    first.future.set_exception(e)
+                continue
+
+            batch = self._collect_batch(first)
+            try:
+                generator = self._get_pipeline(first.model_name)
+                prompts = [r.prompt for r in batch]
+                outputs = generator(prompts, batch_size=len(prompts), **first.kwargs)
+                self._stats['batches'] += 1
+                self._stats['requests'] += len(batch)
+
+                for request, output in zip(batch, outputs):
+                    # Pipelines return one list of candidates per prompt
+                    candidate = output[0] if isinstance(output, list) else output
+                    request.future.set_result(candidate['generated_text'])
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+
+# Global instance
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_model_registry() -> HFModelRegistry:
+    """Get or create the shared model registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = HFModelRegistry()
+    return _registry
@@ -5,7 +5,17 @@ Provides AI chat functionality, RAG, and document processing
 
 import os
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
+
+try:
+    from .document_index import get_document_index, reference_for
+except ImportError:
+    from document_index import get_document_index, reference_for
+
+try:
+    from .solar_query_tools import solar_data_for
+except ImportError:
+    from solar_query_tools import solar_data_for
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -78,8 +88,9 @@ class LangChainHandler:
                     if chat["role"] in ["user", "assistant"]:
                         messages.append({"role": chat["role"], "content": chat["content"]})
             
-            # Add current message
-            messages.append({"role": "user", "content": message})
+            # Add current message, with our solar data and excerpts from uploaded documents
+            reference = solar_data_for(message) + reference_for(message)
+            messages.append({"role": "user", "content": f"{reference}\n{message}" if reference else message})
             
             # Get OpenAI response
             response = client.chat.completions.create(
@@ -204,22 +215,22 @@ Type 'help' for available commands!"""
             "chat_history_length": len(self.chat_history)
         }
 
-    def process_document(self, document_content: str, filename: str) -> Dict[str, Any]:
-        """Process uploaded documents"""
+    def process_document(self, document_content: Union[str, bytes], filename: str) -> Dict[str, Any]:
+        """Chunk and index uploaded documents for retrieval in chat"""
         try:
-            # Basic document processing
-            word_count = len(document_content.split())
-            char_count = len(document_content)
-            lines = len(document_content.split('\n'))
+            result = get_document_index().add_document(filename, document_content)
+            preview = result["preview"]
             
             return {
                 "success": True,
                 "filename": filename,
-                "word_count": word_count,
-                "char_count": char_count,
-                "lines": lines,
-                "message": f"Document '{filename}' processed successfully!\n\n**Analysis:**\n- Words: {word_count}\n- Characters: {char_count}\n- Lines: {lines}",
-                "content_preview": document_content[:200] + "..." if len(document_content) > 200 else document_content
+                "word_count": result["words"],
+                "char_count": result["chars"],
+                "chunks": result["chunks"],
+                "message": (f"Document '{filename}' indexed for chat!\n\n**Analysis:**\n"
+                            f"- Words: {result['words']}\n- Characters: {result['chars']}\n"
+                            f"- Chunks: {result['chunks']} ({result['new']} new, {result['reused']} reused)"),
+                "content_preview": preview[:200] + "..." if len(preview) > 200 else preview
             }
         except Exception as e:
             return {
@@ -5,7 +5,8 @@ for accurate Adelaide/Ferryden Park weather forecasts
 """
 
 import json
-import urllib.request
+
+from weather_cache import get_weather_cache
 
 # BOM Forecast URLs
 # Adelaide Metro forecast: IDS60901
@@ -22,8 +23,9 @@ print(f"URL: {BOM_ADELAIDE_FORECAST}")
 print()
 
 try:
-    with urllib.request.urlopen(BOM_ADELAIDE_FORECAST) as response:
-        data = json.loads(response.read().decode())
+    # Fetch through the shared weather cache (proper headers, TTL, disk fallback)
+    data, cache_meta = get_weather_cache().get('bom')
+    print(f"Cache: {cache_meta['state']} (age {cache_meta['age_s']:.0f}s)")
 
     print("[OK] Successfully fetched BOM data!")
     print()
@@ -5,7 +5,8 @@ Using proper headers to avoid 403 errors
 """
 
 import json
-import urllib.request
+
+from weather_cache import get_weather_cache
 
 # BOM Forecast URLs for Adelaide
 BOM_ADELAIDE_FORECAST = "http://www.bom.gov.au/fwo/IDS60901/IDS60901.94675.json"
@@ -20,16 +21,9 @@ print(f"URL: {BOM_ADELAIDE_FORECAST}")
 print()
 
 try:
-    # Create request with proper headers
-    req = urllib.request.Request(
-        BOM_ADELAIDE_FORECAST,
-        headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-    )
-
-    with urllib.request.urlopen(req) as response:
-        data = json.loads(response.read().decode())
+    # Fetch through the shared weather cache (proper headers, TTL, disk fallback)
+    data, cache_meta = get_weather_cache().get('bom')
+    print(f"Cache: {cache_meta['state']} (age {cache_meta['age_s']:.0f}s)")
 
     print("[OK] Successfully fetched BOM data!")
     print()
@@ -5,9 +5,19 @@ Provides AI chat functionality, RAG, and document processing
 
 import os
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
 import streamlit as st
 
+try:
+    from .document_index import get_document_index, reference_for
+except ImportError:
+    from document_index import get_document_index, reference_for
+
+try:
+    from .solar_query_tools import solar_data_for
+except ImportError:
+    from solar_query_tools import solar_data_for
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -78,8 +88,9 @@ class LangChainHandler:
                 for chat in chat_history[-10:]:  # Last 10 messages
                     messages.append({"role": chat["role"], "content": chat["content"]})
             
-            # Add current message
-            messages.append({"role": "user", "content": message})
+            # Add current message, with our solar data and excerpts from uploaded documents
+            reference = solar_data_for(message) + reference_for(message)
+            messages.append({"role": "user", "content": f"{reference}\n{message}" if reference else message})
             
             # Get OpenAI response
             response = openai.ChatCompletion.create(
@@ -142,18 +153,19 @@ Type 'help' for available commands!"""
             "chat_history_length": len(self.chat_history)
         }
 
-    def process_document(self, document_content: str, filename: str) -> Dict[str, Any]:
-        """Process uploaded documents"""
+    def process_document(self, document_content: Union[str, bytes], filename: str) -> Dict[str, Any]:
+        """Chunk and index uploaded documents for retrieval in chat"""
         try:
-            # Basic document processing
-            word_count = len(document_content.split())
+            result = get_document_index().add_document(filename, document_content)
+            preview = result["preview"]
             
             return {
                 "success": True,
                 "filename": filename,
-                "word_count": word_count,
-                "message": f"Document '{filename}' processed successfully. Contains {word_count} words.",
-                "content_preview": document_content[:200] + "..." if len(document_content) > 200 else document_content
+                "word_count": result["words"],
+                "chunks": result["chunks"],
+                "message": f"Document '{filename}' indexed for chat. Contains {result['chunks']} chunks ({result['new']} new).",
+                "content_preview": preview[:200] + "..." if len(preview) > 200 else preview
             }
         except Exception as e:
             return {
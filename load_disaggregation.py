@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Load Disaggregation
+Household consumption per interval from the inverter and grid-meter
+readings (load = AC generation - export + import), instead of spreading
+monthly bill totals over a typical daily profile.
+
+Fallback order for intervals without usable meter data:
+1. Collector readings (solar_readings in solar_data.db) for the same slot
+2. The household's own typical load for that month and hour, learned
+   from the intervals that do have meter data
+3. The monthly bills spread over HOURLY_PROFILE within each rate period
+
+Usage:
+    df['consumption_w'] = derive_consumption(df, monthly_bills)
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from gap_filling import SLOT_HOURS, snap_to_grid
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+COLLECTOR_DB = Path(os.getenv('COLLECTOR_DB', Path(__file__).parent / 'solar_data.db'))
+
+# Per data source: the inverter's AC output column, the grid meter column(s)
+# in priority order, and the sign the meter reports export with
+METER_CONVENTIONS = {
+    # SolaX Cloud CSV export: Feed In Power is positive when exporting
+    'solax_export': {'generation': 'Power Now (W)', 'meter': ['Feed In Power (W)'], 'export_sign': 1},
+    # SolaX X1 Boost local API (solax_collector, type AL_SI4): same convention
+    'AL_SI4': {'generation': 'grid_power', 'meter': ['feed_in_power', 'exported_power'], 'export_sign': 1},
+    # Meters that report import as positive
+    'import_positive': {'generation': 'Power Now (W)', 'meter': ['Feed In Power (W)'], 'export_sign': -1},
+}
+METER_CONVENTION = os.getenv('METER_CONVENTION', 'solax_export')
+
+# Inverter and meter are sampled a moment apart; small negative loads are
+# timing noise, larger ones mean the readings don't belong together
+NEGATIVE_TOLERANCE_W = 300
+
+# Typical household consumption profile (fraction of daily consumption by hour)
+# Higher in morning (6-9am) and evening (6-10pm), lower overnight and midday
+HOURLY_PROFILE = np.array([
+    0.02, 0.015, 0.015, 0.015, 0.02, 0.03,
+    0.05, 0.07, 0.06, 0.04, 0.03, 0.03,
+    0.035, 0.04, 0.04, 0.045, 0.05, 0.055,
+    0.08, 0.09, 0.08, 0.06, 0.04, 0.03,
+])
+
+# ============================================================================
+# DERIVATION
+# ============================================================================
+
+def derive_load(df: pd.DataFrame, convention: str = METER_CONVENTION) -> pd.Series:
+    """
+    Load (W) per row from generation and grid-meter columns; NaN where unknown
+
+    Days on which the meter column never moves from zero are treated as
+    having no meter (a missing meter would otherwise make load = generation).
+    """
+    spec = METER_CONVENTIONS[convention]
+    meter = None
+    for column in spec['meter']:
+        if column in df:
+            values = pd.to_numeric(df[column], errors='coerce')
+            meter = values if meter is None else meter.fillna(values)
+    if meter is None or spec['generation'] not in df:
+        return pd.Series(np.nan, index=df.index, name='load_w')
+
+    generation = pd.to_numeric(df[spec['generation']], errors='coerce')
+    load = generation - spec['export_sign'] * meter
+    load = load.where(load >= -NEGATIVE_TOLERANCE_W).clip(lower=0)
+
+    days = df.index.normalize()
+    dead_meter = meter.abs().groupby(days).transform('max').to_numpy() == 0
+    return load.mask(dead_meter).rename('load_w')
+
+
+def collector_load(index: pd.DatetimeIndex, db_path: Path = COLLECTOR_DB) -> Optional[pd.Series]:
+    """Load derived from the collector's readings, on the given grid (None without a database)"""
+    if not Path(db_path).exists() or len(index) == 0:
+        return None
+    db = sqlite3.connect(db_path)
+    try:
+        rows = pd.read_sql_query(
+            "SELECT timestamp, grid_power, feed_in_power, exported_power FROM solar_readings "
+            "WHERE timestamp BETWEEN ? AND ?", db,
+            params=(index[0].strftime('%Y-%m-%d %H:%M:%S'), index[-1].strftime('%Y-%m-%d %H:%M:%S')))
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return None
+    finally:
+        db.close()
+    if rows.empty:
+        return None
+    rows.index = pd.to_datetime(rows.pop('timestamp'))
+    load = derive_load(snap_to_grid(rows.astype(float)), 'AL_SI4')
+    return load.reindex(index)
+
+
+def bill_profile_load(df: pd.DataFrame, monthly_bills: Dict) -> pd.Series:
+    """
+    Load (W) from monthly bills: each rate period's kWh spread over that
+    period's rows in proportion to HOURLY_PROFILE
+    """
+    year_month = df.index.year.astype(str) + '-' + df.index.month.astype(str)
+    weight = pd.Series(HOURLY_PROFILE[df.index.hour], index=df.index)
+    period = df['rate_period'].to_numpy()
+    bills = pd.DataFrame.from_dict(monthly_bills, orient='index')
+
+    bill_kwh = np.zeros(len(df))
+    for name in ('sponge', 'peak', 'off_peak'):
+        if name in bills:
+            month_kwh = bills[name].reindex(year_month).fillna(0).to_numpy()
+            bill_kwh = np.where(period == name, month_kwh, bill_kwh)
+    group_weight = weight.groupby([year_month, period]).transform('sum').to_numpy()
+    energy_wh = bill_kwh * 1000 * weight.to_numpy() / group_weight
+    return pd.Series(energy_wh / SLOT_HOURS, index=df.index, name='load_w')
+
+
+def derive_consumption(df: pd.DataFrame, monthly_bills: Dict, convention: str = METER_CONVENTION,
+                       db_path: Path = COLLECTOR_DB) -> pd.Series:
+    """
+    Household load (W) for every row of a regular-grid DataFrame
+
+    Args:
+        df: Readings with generation/meter columns and 'rate_period'
+        monthly_bills: Bills by 'YYYY-M' (used only where nothing better exists)
+
+    Returns:
+        Series of load in W; .attrs['sources'] counts rows per source
+    """
+    load = derive_load(df, convention)
+    sources = {'meter': int(load.notna().sum())}
+
+    missing = load.isna()
+    if missing.any():
+        from_collector = collector_load(df.index[missing], db_path)
+        if from_collector is not None:
+            load[missing] = from_collector.to_numpy()
+        sources['collector'] = int(missing.sum() - load.isna().sum())
+
+    missing = load.isna()
+    if missing.any() and not missing.all():
+        keys = [df.index.month, df.index.hour]
+        typical = load.groupby(keys).median()
+        learned = typical.reindex(pd.MultiIndex.from_arrays([k[missing] for k in keys])).to_numpy()
+        load[missing] = learned
+        sources['typical'] = int(missing.sum() - load.isna().sum())
+
+    missing = load.isna()
+    if missing.any():
+        load[missing] = bill_profile_load(df, monthly_bills)[missing].to_numpy()
+        sources['bills'] = int(missing.sum())
+
+    load = load.fillna(0)
+    load.attrs['sources'] = sources
+    return load
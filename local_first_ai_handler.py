@@ -4,87 +4,125 @@ Prioritizes local models, falls back to APIs only when needed
 """
 
 import os
+import json
+import time
 import logging
+import threading
 import requests
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Union
+
+try:
+    from .provider_discovery import first_success, probe_ollama_url
+except ImportError:
+    from provider_discovery import first_success, probe_ollama_url
+
+try:
+    from .hf_model_registry import get_model_registry
+except ImportError:
+    from hf_model_registry import get_model_registry
+
+try:
+    from .conversation_context import ConversationContext
+except ImportError:
+    from conversation_context import ConversationContext
+
+try:
+    from .response_cache import get_response_cache
+except ImportError:
+    from response_cache import get_response_cache
+
+try:
+    from .document_index import document_index_status, get_document_index, reference_for
+except ImportError:
+    from document_index import document_index_status, get_document_index, reference_for
+
+try:
+    from .solar_query_tools import solar_data_for
+except ImportError:
+    from solar_query_tools import solar_data_for
+
+try:
+    from .provider_router import ProviderRouter
+except ImportError:
+    from provider_router import ProviderRouter
+
+try:
+    from .provider_routing import ProviderRoutingMixin
+except ImportError:
+    from provider_routing import ProviderRoutingMixin
+
+try:
+    from .chat_scheduler import provider_slot
+except ImportError:
+    from chat_scheduler import provider_slot
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class LangChainHandler:
+OLLAMA_URLS = [
+    "http://localhost:11434",  # Standard Ollama port
+    "http://host.docker.internal:11434",  # Docker host access
+    "http://ollama:11434",  # If Ollama running as Docker service
+]
+OLLAMA_CONNECT_TIMEOUT = 5
+OLLAMA_READ_TIMEOUT = 60  # Max wait between streamed chunks
+
+SYSTEM_PROMPT = ("You are Enhanced Jarvis, a helpful AI assistant. Be concise and helpful. "
+                 "When data from our solar database is given, answer from those figures only.")
+
+class LangChainHandler(ProviderRoutingMixin):
     """Local-first AI handler with API fallbacks"""
     
     def __init__(self):
         self.openai_api_key = os.getenv('OPENAI_API_KEY', '')
         self.huggingface_token = os.getenv('HUGGINGFACE_TOKEN', '')
         self.initialized = False
-        self.chat_history = []
+        self.response_cache = get_response_cache()
+        self.context = ConversationContext(SYSTEM_PROMPT)
+        self.context_lock = threading.RLock()  # Sessions chat concurrently through one handler
         self.available_models = {}
+        self._thread_state = threading.local()
+        self.router = ProviderRouter(self._provider_probes())
         
         try:
             self._initialize_ai()
+            self.router.start()
             self.initialized = True
             logger.info(f"AI handler initialized successfully - Provider: {self.ai_provider}")
         except Exception as e:
             logger.error(f"Failed to initialize AI handler: {e}")
             self.initialized = False
     
-    def _initialize_ai(self):
-        """Initialize AI components with local-first priority"""
-        
-        # Priority 1: Check for local Ollama models
-        if self._check_ollama_available():
-            self.ai_provider = "ollama"
-            logger.info("Using local Ollama models")
-            return
-        
-        # Priority 2: Check for local HuggingFace models
-        if self._check_local_huggingface():
-            self.ai_provider = "local_hf"
-            logger.info("Using local HuggingFace models")
-            return
-            
-        # Priority 3: HuggingFace API (free tier available)
-        if self._check_huggingface_api():
-            self.ai_provider = "huggingface_api"
-            logger.info("Using HuggingFace API")
-            return
-            
-        # Priority 4: OpenAI API (paid service)
-        if self.openai_api_key:
-            self.ai_provider = "openai"
-            logger.info("Using OpenAI API")
-            return
-            
-        # Fallback: Local mock responses
-        self.ai_provider = "local_mock"
-        logger.info("Using local mock responses - no AI models available")
-    
+    @property
+    def chat_history(self) -> List[Dict]:
+        """Retained verbatim turns (older ones are folded into the context summary)"""
+        return self.context.messages
+
+    @property
+    def last_stream_metrics(self) -> Optional[Dict[str, Any]]:
+        """Metrics of the last stream run on the calling thread"""
+        return getattr(self._thread_state, 'stream_metrics', None)
+
+    @last_stream_metrics.setter
+    def last_stream_metrics(self, metrics: Optional[Dict[str, Any]]):
+        self._thread_state.stream_metrics = metrics
+
     def _check_ollama_available(self) -> bool:
         """Check if Ollama is running and has models"""
         try:
             # Check if Ollama is running (could be on host or in container)
-            ollama_urls = [
-                "http://localhost:11434",  # Standard Ollama port
-                "http://host.docker.internal:11434",  # Docker host access
-                "http://ollama:11434",  # If Ollama running as Docker service
-            ]
-            
-            for url in ollama_urls:
-                try:
-                    response = requests.get(f"{url}/api/tags", timeout=3)
-                    if response.status_code == 200:
-                        models = response.json()
-                        if models.get('models'):
-                            self.ollama_url = url
-                            self.available_models['ollama'] = [m['name'] for m in models['models']]
-                            logger.info(f"Found Ollama models: {self.available_models['ollama']}")
-                            return True
-                except requests.RequestException:
-                    continue
-            
-            return False
+            ollama_urls = list(OLLAMA_URLS)
+            if os.getenv('OLLAMA_URL'):
+                ollama_urls.insert(0, os.getenv('OLLAMA_URL').rstrip('/'))
+
+            found = first_success(ollama_urls, probe_ollama_url)
+            if not found:
+                return False
+
+            self.ollama_url, self.available_models['ollama'] = found
+            logger.info(f"Found Ollama models: {self.available_models['ollama']}")
+            return True
         except Exception as e:
             logger.warning(f"Error checking Ollama: {e}")
             return False
@@ -139,113 +177,208 @@ class LangChainHandler:
             logger.warning(f"HuggingFace API not available: {e}")
             return False
     
-    def chat(self, message: str, chat_history: List[Dict] = None) -> str:
-        """Handle chat conversation with local-first approach"""
-        try:
-            if not self.initialized:
-                return "AI system not fully initialized. Please check your configuration."
-            
-            # Route to appropriate chat handler based on priority
-            if self.ai_provider == "ollama":
-                return self._ollama_chat(message, chat_history)
-            elif self.ai_provider == "local_hf":
-                return self._local_hf_chat(message, chat_history)
-            elif self.ai_provider == "huggingface_api":
-                return self._huggingface_api_chat(message, chat_history)
-            elif self.ai_provider == "openai":
-                return self._openai_chat(message, chat_history)
-            else:
-                return self._local_mock_chat(message, chat_history)
-                
-        except Exception as e:
-            logger.error(f"Chat error: {e}")
-            return f"Chat error: {str(e)}"
-    
-    def _ollama_chat(self, message: str, chat_history: List[Dict] = None) -> str:
+    def _is_cacheable(self, provider: str, response: str) -> bool:
+        """A complete model answer - not an error or a partial stream (also what counts as success for routing)"""
+        if not super()._is_cacheable(provider, response):
+            return False
+        if provider == "ollama":
+            return bool(self.last_stream_metrics and self.last_stream_metrics.get("complete"))
+        return True
+
+    def chat_stream(self, message: str, chat_history: List[Dict] = None) -> Iterator[str]:
+        """
+        Stream a chat response as it is generated
+
+        Ollama yields tokens as they arrive; other providers, and answers
+        from the response cache, yield the complete response as a single
+        chunk. Timing for the last stream is kept in self.last_stream_metrics.
+        """
+        self.last_stream_metrics = None
+        if not self.initialized:
+            yield "AI system not fully initialized. Please check your configuration."
+            return
+
+        if self.ai_provider == "ollama":
+            reference = solar_data_for(message) + reference_for(message)
+            cache_model = None if reference else self._response_cache_model(message, chat_history)
+            cached = self.response_cache.get(cache_model, message) if cache_model else None
+            if cached is not None:
+                if chat_history is None:
+                    with self.context_lock:
+                        self.context.add("user", message)
+                        self.context.add("assistant", cached)
+                yield cached
+                return
+
+            chunks = []
+            failed = None
+            with provider_slot("ollama"):
+                started = time.perf_counter()
+                for chunk in self._ollama_chat_stream(message, chat_history, reference):
+                    if not chunks and not chunk.startswith("**Enhanced Jarvis ("):
+                        failed = chunk
+                        break
+                    chunks.append(chunk)
+                    yield chunk
+            if failed is not None:
+                # Failed before answering: the rest of the chain answers instead (in its own slots)
+                self.router.record("ollama", False, time.perf_counter() - started)
+                logger.warning(f"ollama failed, failing over: {failed[:120]}")
+                yield self._route_chat(message, chat_history, reference, exclude=("ollama",))[1]
+                return
+
+            response = "".join(chunks).strip()
+            answered = self._is_cacheable("ollama", response)
+            self.router.record("ollama", answered, time.perf_counter() - started)
+            if cache_model and answered:
+                self.response_cache.put(cache_model, message, response)
+        else:
+            yield self.chat(message, chat_history)
+
+    def _select_ollama_model(self) -> Optional[str]:
+        """Use the first available model or prefer qwen if available"""
+        models = self.available_models.get('ollama', [])
+        preferred_models = ['qwen2.5-coder', 'qwen', 'llama3', 'mistral', 'codellama']
+
+        for preferred in preferred_models:
+            for available in models:
+                if preferred in available.lower():
+                    return available
+
+        return models[0] if models else None  # Use first available model
+
+    def _ollama_model(self) -> Optional[str]:
+        return self._select_ollama_model()
+
+    def _build_ollama_prompt(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
+        """Prepare the prompt with context and document excerpts, within the context token budget"""
+        with self.context_lock:
+            if chat_history is not None:
+                self.context.sync(chat_history, message)
+            return self.context.build_prompt(message, reference)
+
+    def _ollama_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
         """Chat using local Ollama models"""
+        return "".join(self._ollama_chat_stream(message, chat_history, reference)).strip()
+
+    def _ollama_chat_stream(self, message: str, chat_history: List[Dict] = None,
+                            reference: str = '') -> Iterator[str]:
+        """Stream tokens from Ollama's /api/generate as they are produced"""
+        model_to_use = self._select_ollama_model()
+        if not model_to_use:
+            yield "No Ollama models available. Please install a model using 'ollama pull <model_name>'"
+            return
+
+        # Call Ollama API
+        payload = {
+            "model": model_to_use,
+            "prompt": self._build_ollama_prompt(message, chat_history, reference),
+            "stream": True,
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "max_tokens": 1000
+            }
+        }
+
+        started = time.perf_counter()
+        first_token_at = None
+        token_count = 0
+        reply = []
+        final = {}
+
         try:
-            # Use the first available model or prefer qwen if available
-            models = self.available_models.get('ollama', [])
-            preferred_models = ['qwen2.5-coder', 'qwen', 'llama3', 'mistral', 'codellama']
-            
-            model_to_use = None
-            for preferred in preferred_models:
-                for available in models:
-                    if preferred in available.lower():
-                        model_to_use = available
+            # Read timeout applies between chunks, so long answers no longer time out
+            with requests.post(
+                f"{self.ollama_url}/api/generate",
+                json=payload,
+                stream=True,
+                timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
+            ) as response:
+                if response.status_code != 200:
+                    yield f"Ollama API error: {response.status_code} - {response.text}"
+                    return
+
+                yield f"**Enhanced Jarvis (Ollama - {model_to_use})**\n\n"
+
+                for line in response.iter_lines(chunk_size=None):  # Unbuffered: one token per chunk
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        yield f"\n\nOllama error: {chunk['error']}"
+                        return
+
+                    token = chunk.get('response', '')
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            token = token.lstrip()
+                        token_count += 1
+                        reply.append(token)
+                        yield token
+
+                    if chunk.get('done'):
+                        final = chunk
                         break
-                if model_to_use:
-                    break
-            
-            if not model_to_use and models:
-                model_to_use = models[0]  # Use first available model
-            
-            if not model_to_use:
-                return "No Ollama models available. Please install a model using 'ollama pull <model_name>'"
-            
-            # Prepare the prompt with context
-            system_prompt = "You are Enhanced Jarvis, a helpful AI assistant. Be concise and helpful."
-            
-            # Build conversation context
-            conversation = f"System: {system_prompt}\n"
-            if chat_history:
-                for chat in chat_history[-5:]:  # Last 5 messages for context
-                    role = "Human" if chat["role"] == "user" else "Assistant"
-                    conversation += f"{role}: {chat['content']}\n"
-            
-            conversation += f"Human: {message}\nAssistant: "
-            
-            # Call Ollama API
-            payload = {
-                "model": model_to_use,
-                "prompt": conversation,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": 1000
-                }
-            }
-            
-            response = requests.post(
-                f"{self.ollama_url}/api/generate", 
-                json=payload, 
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                ai_response = result.get('response', '').strip()
-                return f"**Enhanced Jarvis (Ollama - {model_to_use})**\n\n{ai_response}"
-            else:
-                return f"Ollama API error: {response.status_code} - {response.text}"
-                
+
+            # Callers without their own history rely on ours for the next turn
+            if chat_history is None:
+                with self.context_lock:
+                    self.context.add("user", message)
+                    self.context.add("assistant", "".join(reply).strip())
+
         except Exception as e:
             logger.error(f"Ollama chat error: {e}")
-            return f"Ollama error: {str(e)}. Falling back to next available provider."
-    
-    def _local_hf_chat(self, message: str, chat_history: List[Dict] = None) -> str:
+            yield f"Ollama error: {str(e)}. Falling back to next available provider."
+            return
+
+        finally:
+            self.last_stream_metrics = self._stream_metrics(
+                model_to_use, started, first_token_at, token_count, final)
+
+    @staticmethod
+    def _stream_metrics(model: str, started: float, first_token_at: Optional[float],
+                        token_count: int, final: Dict) -> Dict[str, Any]:
+        """Time-to-first-token and tokens/s for one streamed response"""
+        total_s = time.perf_counter() - started
+        ttft_s = first_token_at - started if first_token_at is not None else None
+
+        # Prefer Ollama's own counters (nanoseconds) from the final chunk
+        eval_count = final.get('eval_count') or token_count
+        eval_s = final.get('eval_duration', 0) / 1e9
+        if not eval_s and ttft_s is not None:
+            eval_s = total_s - ttft_s
+        tokens_per_s = eval_count / eval_s if eval_s > 0 else None
+
+        metrics = {
+            "model": model,
+            "ttft_s": round(ttft_s, 3) if ttft_s is not None else None,
+            "tokens": eval_count,
+            "tokens_per_s": round(tokens_per_s, 1) if tokens_per_s else None,
+            "total_s": round(total_s, 3),
+            "complete": bool(final.get('done')),
+        }
+        logger.info(f"Ollama stream metrics: {metrics}")
+        return metrics
+
+    def _local_hf_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
         """Chat using local HuggingFace models"""
         try:
-            from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-            
             model_name = self.available_models['local_hf'][0]  # Use first available
-            
-            # Create a text generation pipeline
-            generator = pipeline('text-generation', model=model_name, tokenizer=model_name)
-            
-            # Generate response
-            response = generator(
-                message, 
-                max_length=200, 
-                num_return_sequences=1, 
-                temperature=0.7,
-                pad_token_id=generator.tokenizer.eos_token_id
+            prompt = f"{reference}\n{message}" if reference else message
+            
+            # Generate with the shared, already-loaded pipeline (batched with concurrent chats)
+            generated_text = get_model_registry().generate(
+                model_name,
+                prompt,
+                max_length=200,
+                num_return_sequences=1,
+                temperature=0.7
             )
             
-            generated_text = response[0]['generated_text']
             # Remove the input prompt from the response
-            ai_response = generated_text.replace(message, '').strip()
+            ai_response = generated_text.replace(prompt, '').strip()
             
             return f"**Enhanced Jarvis (Local HF - {model_name})**\n\n{ai_response}"
             
@@ -253,9 +386,10 @@ class LangChainHandler:
             logger.error(f"Local HF chat error: {e}")
             return f"Local HuggingFace error: {str(e)}"
     
-    def _huggingface_api_chat(self, message: str, chat_history: List[Dict] = None) -> str:
+    def _huggingface_api_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
         """Chat using HuggingFace Inference API"""
         try:
+            prompt = f"{reference}\n{message}" if reference else message
             # Use free HuggingFace models
             model_endpoint = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium"
             
@@ -263,14 +397,14 @@ class LangChainHandler:
             if self.huggingface_token:
                 headers["Authorization"] = f"Bearer {self.huggingface_token}"
             
-            payload = {"inputs": message}
+            payload = {"inputs": prompt}
             
             response = requests.post(model_endpoint, headers=headers, json=payload, timeout=15)
             
             if response.status_code == 200:
                 result = response.json()
                 if isinstance(result, list) and result:
-                    ai_response = result[0].get('generated_text', message).replace(message, '').strip()
+                    ai_response = result[0].get('generated_text', prompt).replace(prompt, '').strip()
                 else:
                     ai_response = str(result)
                 return f"**Enhanced Jarvis (HuggingFace API)**\n\n{ai_response}"
@@ -281,23 +415,21 @@ class LangChainHandler:
             logger.error(f"HuggingFace API error: {e}")
             return f"HuggingFace API error: {str(e)}"
     
-    def _openai_chat(self, message: str, chat_history: List[Dict] = None) -> str:
+    def _openai_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
         """OpenAI chat (fallback option)"""
         try:
             import openai
             
             client = openai.OpenAI(api_key=self.openai_api_key)
             
-            messages = [
-                {"role": "system", "content": "You are Enhanced Jarvis, a helpful AI assistant. Mention that you're using OpenAI as a fallback since local models weren't available."}
-            ]
-            
-            if chat_history:
-                for chat in chat_history[-10:]:
-                    if chat["role"] in ["user", "assistant"]:
-                        messages.append({"role": chat["role"], "content": chat["content"]})
-            
-            messages.append({"role": "user", "content": message})
+            with self.context_lock:
+                if chat_history is not None:
+                    self.context.sync(chat_history, message)
+                messages = self.context.build_messages(
+                    message,
+                    "You are Enhanced Jarvis, a helpful AI assistant. Mention that you're using OpenAI as a fallback since local models weren't available.",
+                    reference
+                )
             
             response = client.chat.completions.create(
                 model="gpt-3.5-turbo",
@@ -381,28 +513,42 @@ Would you like help setting up local models?"""
         return {
             "initialized": self.initialized,
             "ai_provider": getattr(self, 'ai_provider', 'unknown'),
+            "routing": self.router.get_status(),
             "available_models": self.available_models,
             "has_openai_key": bool(self.openai_api_key),
             "has_hf_token": bool(self.huggingface_token),
-            "chat_history_length": len(self.chat_history),
-            "ollama_url": getattr(self, 'ollama_url', None)
+            "chat_history_length": len(self.context),
+            "response_cache": self.response_cache.get_status(),
+            "context": self.context.get_status(),
+            "documents": document_index_status(),
+            "ollama_url": getattr(self, 'ollama_url', None),
+            "last_stream_metrics": self.last_stream_metrics,
+            "local_model_registry": (get_model_registry().get_status()
+                                     if getattr(self, 'ai_provider', None) == "local_hf" else None)
         }
 
-    def process_document(self, document_content: str, filename: str) -> Dict[str, Any]:
-        """Process uploaded documents"""
+    def process_document(self, document_content: Union[str, bytes], filename: str) -> Dict[str, Any]:
+        """Chunk and index an uploaded document (text, or raw PDF/DOCX bytes) for retrieval in chat"""
         try:
-            word_count = len(document_content.split())
-            char_count = len(document_content)
-            lines = len(document_content.split('\n'))
+            result = get_document_index().add_document(filename, document_content)
+            if result["unchanged"]:
+                summary = f"Document '{filename}' is already indexed ({result['chunks']} chunks, unchanged)."
+            else:
+                summary = (f"Document '{filename}' indexed for chat!\n\nAnalysis:\n"
+                           f"- Words: {result['words']}\n- Characters: {result['chars']}\n"
+                           f"- Chunks: {result['chunks']} ({result['new']} new, {result['reused']} reused, "
+                           f"{result['removed']} removed)")
+            preview = result["preview"]
             
             return {
                 "success": True,
                 "filename": filename,
-                "word_count": word_count,
-                "char_count": char_count,
-                "lines": lines,
-                "message": f"Document '{filename}' processed successfully!\n\nAnalysis:\n- Words: {word_count}\n- Characters: {char_count}\n- Lines: {lines}",
-                "content_preview": document_content[:200] + "..." if len(document_content) > 200 else document_content
+                "word_count": result["words"],
+                "char_count": result["chars"],
+                "chunks": result["chunks"],
+                "new_chunks": result["new"],
+                "message": summary,
+                "content_preview": preview[:200] + "..." if len(preview) > 200 else preview
             }
         except Exception as e:
             return {
@@ -0,0 +1,147 @@
+"""
+Enhanced Jarvis AI - Ollama Model Lifecycle
+Keeps the preferred model resident with Ollama's keep_alive, reports whether
+it is warm (loaded) or cold, and reuses the `context` tokens Ollama returns
+so follow-up turns only send the new message instead of the whole
+conversation prefix.
+"""
+
+import os
+import time
+import logging
+import threading
+import requests
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ollama duration string ("30m") or seconds; -1 keeps the model loaded indefinitely
+KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '-1')
+LOAD_TIMEOUT = 300  # First load of a large model from disk
+PS_CACHE_S = 5      # How long a /api/ps answer is trusted
+
+
+def _keep_alive_value(value: str):
+    """Ollama accepts a duration string or a number of seconds"""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class OllamaModelManager:
+    """Pins a model in Ollama's memory and tracks reusable conversation context"""
+
+    def __init__(self, base_url: str, keep_alive: str = KEEP_ALIVE):
+        self.base_url = base_url
+        self.keep_alive = _keep_alive_value(keep_alive)
+        self.loading = set()
+        self._ps = (0.0, [])
+        self._lock = threading.Lock()
+
+        # Reusable context from the last exchange
+        self._context = None  # (model, context tokens, turns expected next, message, reply)
+        self.context_hits = 0
+        self.context_misses = 0
+
+    # -- Residency -----------------------------------------------------------
+
+    def pin(self, model: str) -> bool:
+        """
+        Load a model and keep it resident (blocking)
+
+        An empty prompt makes Ollama load the model without generating.
+        """
+        self.loading.add(model)
+        started = time.time()
+        try:
+            response = requests.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "keep_alive": self.keep_alive},
+                timeout=LOAD_TIMEOUT
+            )
+            if response.status_code != 200:
+                logger.warning(f"Failed to pin model {model}: {response.status_code}")
+                return False
+            logger.info(f"Model {model} loaded and pinned (keep_alive={self.keep_alive}) "
+                        f"in {time.time() - started:.2f}s")
+            return True
+        except requests.RequestException as e:
+            logger.error(f"Error pinning model {model}: {e}")
+            return False
+        finally:
+            self.loading.discard(model)
+            self._ps = (0.0, [])
+
+    def loaded_models(self) -> List[Dict[str, Any]]:
+        """Models Ollama currently holds in memory (/api/ps), briefly cached"""
+        with self._lock:
+            checked_at, models = self._ps
+            if time.time() - checked_at < PS_CACHE_S:
+                return models
+            try:
+                response = requests.get(f"{self.base_url}/api/ps", timeout=2)
+                models = response.json().get('models', []) if response.status_code == 200 else []
+            except (requests.RequestException, ValueError):
+                models = []
+            self._ps = (time.time(), models)
+            return models
+
+    def state(self, model: Optional[str]) -> str:
+        """'warm' (resident), 'loading' or 'cold'"""
+        if not model:
+            return 'cold'
+        if model in self.loading:
+            return 'loading'
+        resident = set()
+        for m in self.loaded_models():
+            resident.update((m.get('name'), m.get('model')))
+        return 'warm' if model in resident else 'cold'
+
+    # -- Context reuse -------------------------------------------------------
+
+    def reusable_context(self, model: str, conversation, message: str,
+                         max_tokens: int) -> Optional[List[int]]:
+        """
+        Ollama context tokens to continue from, if the conversation went on
+        exactly from the last exchange (same model, no reset, the last two
+        turns are that exchange) and the context still fits max_tokens
+        """
+        if self._context is None:
+            self.context_misses += 1
+            return None
+
+        ctx_model, tokens, expected_turns, last_message, last_reply = self._context
+        turns = conversation.messages[-2:]
+        continued = (
+            ctx_model == model
+            and conversation.total_turns == expected_turns
+            and len(turns) == 2
+            and turns[0]["content"] == last_message
+            and turns[1]["content"].strip().endswith(last_reply)
+            and len(tokens) + conversation.count_tokens(message) <= max_tokens
+        )
+        if not continued:
+            self._context = None
+            self.context_misses += 1
+            return None
+
+        self.context_hits += 1
+        return tokens
+
+    def remember_context(self, model: str, tokens: Optional[List[int]], conversation,
+                         message: str, reply: str):
+        """Keep the context Ollama returned for a reply to this conversation"""
+        if not tokens:
+            self._context = None
+            return
+        # The next turn should find this exchange appended to the conversation
+        self._context = (model, tokens, conversation.total_turns + 2, message, reply.strip())
+
+    def get_status(self, model: Optional[str]) -> Dict[str, Any]:
+        return {
+            "model_state": self.state(model),
+            "keep_alive": self.keep_alive,
+            "context_reuse_hits": self.context_hits,
+            "context_reuse_misses": self.context_misses,
+        }
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Payback Monte Carlo
+Distribution of battery payback years instead of a single deterministic
+figure. Each trial samples:
+
+- Tariff escalation (import rates) and a feed-in tariff trend, year by year
+- Battery aging: capacity fades day by day from rainflow-counted cycles and
+  calendar aging (battery_degradation), with a per-trial spread in cell aging
+- Weather years, resampled from our own history: every simulated day is
+  drawn from the same calendar month of the recorded data
+- Solar Sharer uptake (whether and how many years after install)
+
+The 5-minute battery simulation runs once per history and capacity level,
+not per trial: it is reduced to per-day energy flows (import value saved,
+export lost) and aging stress with and without Solar Sharer, cached to disk.
+Every trial only sums sampled days, interpolated at its current capacity. Trials are vectorized with numpy and can be split across a process
+pool, so 10,000 lifetimes take seconds.
+
+Run standalone (--rebuild re-simulates the cached daily flows):
+    python3 payback_monte_carlo.py [--rebuild]
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+import battery_roi_analysis as roi
+from battery_degradation import CAPACITY_LEVELS, DegradationState, day_stress, level_weights
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DATA_DIR = Path(__file__).parent
+FLOWS_FILE = DATA_DIR / "payback_daily_flows.json"
+RESULTS_FILE = DATA_DIR / "payback_distribution.json"
+
+TRIALS = int(os.getenv('MC_TRIALS', '10000'))
+YEARS = int(os.getenv('MC_YEARS', '15'))
+WORKERS = int(os.getenv('MC_WORKERS', '1'))
+SEED = int(os.getenv('MC_SEED', '42'))
+
+NET_COST = roi.NET_COST  # Battery cost less REPS rebate
+DISCOUNT_RATE = 0.05
+
+# Annual rates as fractions; each trial draws its own values
+ASSUMPTIONS = {
+    'tariff_escalation_mean': 0.035,
+    'tariff_escalation_sd': 0.02,
+    'feed_in_trend_mean': -0.03,
+    'feed_in_trend_sd': 0.04,
+    'aging_spread': 0.25,          # Lognormal sigma of per-battery aging rates
+    'sharer_uptake_p': 0.6,        # Chance the household takes up Solar Sharer
+    'sharer_max_delay_years': 3,   # Uptake happens 0..N years after install
+}
+
+PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+FLOW_COLUMNS = ['battery_import_value', 'battery_export_loss_kwh',
+                'sharer_import_value', 'sharer_export_loss_kwh']
+STRESS_COLUMNS = ['battery_cycle_damage', 'battery_mean_soc',
+                  'sharer_cycle_damage', 'sharer_mean_soc']
+
+# ============================================================================
+# DAILY ENERGY FLOWS (precomputed once)
+# ============================================================================
+
+def daily_flows_from_simulation(df_battery, df_sharer, rates: Dict, usable_kwh: float) -> Dict[str, list]:
+    """
+    Reduce two 5-minute battery simulations to per-day flows
+
+    Args:
+        df_battery: simulate_battery() output without Solar Sharer
+        df_sharer: simulate_battery() output with Solar Sharer on every day
+        rates: Rate structure the import values are priced at
+        usable_kwh: Capacity both were simulated at
+
+    Returns:
+        Dict of per-day lists: date, month, import value saved ($), export
+        lost (kWh), cycle damage and mean SOC for each variant, and Solar
+        Sharer kWh charged
+    """
+    interval_kh = (5 / 60.0) / 1000  # W per 5-minute row -> kWh
+
+    solar = df_battery['Power Now (W)']
+    consumption = df_battery['consumption_w']
+    solar_used = np.minimum(solar, consumption)
+    import_no_battery = consumption - solar_used
+    export_no_battery = solar - solar_used
+    rate = df_battery['rate_period'].map(rates)
+
+    frame = df_battery[['date']].copy()
+    for prefix, df in (('battery', df_battery), ('sharer', df_sharer)):
+        frame[f'{prefix}_import_value'] = (import_no_battery - df['grid_import_w']) * rate * interval_kh
+        frame[f'{prefix}_export_loss_kwh'] = (export_no_battery - df['grid_export_w']) * interval_kh
+    frame['sharer_kwh'] = df_sharer['solar_sharer_charge_w'] * interval_kh
+
+    daily = frame.groupby('date').sum()
+    for prefix, df in (('battery', df_battery), ('sharer', df_sharer)):
+        stress = (df['battery_soc_kwh'] / usable_kwh).groupby(df['date']).apply(lambda soc: day_stress(soc.values))
+        daily[f'{prefix}_cycle_damage'] = [damage for damage, _ in stress]
+        daily[f'{prefix}_mean_soc'] = [mean_soc for _, mean_soc in stress]
+    return {
+        'date': [d.isoformat() for d in daily.index],
+        'month': [d.month for d in daily.index],
+        **{col: [round(float(v), 4) for v in daily[col]] for col in FLOW_COLUMNS + ['sharer_kwh']},
+        **{col: [float(v) for v in daily[col]] for col in STRESS_COLUMNS},
+    }
+
+
+def build_daily_flows(path: Path = FLOWS_FILE) -> Dict:
+    """Run the battery simulation over the recorded history at each capacity level and cache its daily flows"""
+    csv_files = sorted(DATA_DIR.glob("C03AEC7B*.csv"))
+    if not csv_files:
+        raise FileNotFoundError(f"No C03AEC7B*.csv files in {DATA_DIR}")
+
+    solar_df = roi.categorize_by_rate_period(roi.load_solar_data(csv_files))
+    solar_df = roi.estimate_consumption(solar_df, roi.MONTHLY_BILLS)
+    levels = []
+    for level in CAPACITY_LEVELS:
+        usable_kwh = roi.BATTERY_USABLE_KWH * level
+        print(f"Simulating battery at {level:.0%} capacity ({usable_kwh:.1f} kWh)...")
+        df_battery = roi.simulate_battery(solar_df, enable_solar_sharer=False, usable_kwh=usable_kwh)
+        df_sharer = roi.simulate_battery(solar_df, enable_solar_sharer=True, solar_sharer_start=datetime.min,
+                                         usable_kwh=usable_kwh)
+        levels.append(daily_flows_from_simulation(df_battery, df_sharer, roi.DEFAULT_RATES, usable_kwh))
+
+    # Per-day columns hold one list per capacity level
+    days = {'date': levels[0]['date'], 'month': levels[0]['month']}
+    for col in FLOW_COLUMNS + STRESS_COLUMNS + ['sharer_kwh']:
+        days[col] = [level[col] for level in levels]
+    flows = {
+        'built': datetime.now().isoformat(),
+        'rates': roi.DEFAULT_RATES,
+        'capacity_levels': CAPACITY_LEVELS,
+        'days': days,
+    }
+    with open(path, 'w') as f:
+        json.dump(flows, f)
+    print(f"Cached {len(flows['days']['date'])} days of energy flows to {path.name}")
+    return flows
+
+
+def load_daily_flows(path: Path = FLOWS_FILE, rebuild: bool = False) -> Dict:
+    if not rebuild and path.exists():
+        with open(path) as f:
+            flows = json.load(f)
+        if flows.get('capacity_levels') == CAPACITY_LEVELS:
+            return flows
+    return build_daily_flows(path)
+
+# ============================================================================
+# SIMULATION
+# ============================================================================
+
+def _growth_factors(rng, mean: float, sd: float, shape) -> np.ndarray:
+    """Cumulative multipliers from yearly growth draws, 1.0 in year one"""
+    growth = np.maximum(1 + rng.normal(mean, sd, shape), 0)
+    factors = np.cumprod(growth, axis=1)
+    return np.hstack([np.ones((shape[0], 1)), factors[:, :-1]])
+
+
+def simulate_lifetimes(flows: Dict, trials: int, years: int = YEARS, net_cost: float = NET_COST,
+                       assumptions: Dict = None, seed=None) -> Dict[str, np.ndarray]:
+    """
+    Simulate battery lifetimes, vectorized across trials
+
+    Returns:
+        Dict of arrays: annual savings, cumulative savings and end-of-year
+        capacity (trials x years), payback years (inf when not within the
+        horizon) and NPV per trial
+    """
+    a = {**ASSUMPTIONS, **(assumptions or {})}
+    rng = np.random.default_rng(seed)
+    days = flows['days']
+    month = np.asarray(days['month'])
+    # Recorded days sorted by month, so each calendar month's pool is one contiguous slice
+    # (a month that was never recorded draws from every day)
+    order = np.argsort(month, kind='stable')
+    # Import value, export lost, cycle damage and mean SOC, each a flat array
+    # indexed by (variant, capacity level, day)
+    table = [
+        np.concatenate([np.asarray(days[f'{variant}_{col}'], dtype=float)[:, order].ravel()
+                        for variant in ('battery', 'sharer')])
+        for col in ('import_value', 'export_loss_kwh', 'cycle_damage', 'mean_soc')
+    ]
+    levels = flows['capacity_levels']
+    n_recorded = len(month)
+    first = np.searchsorted(month[order], np.arange(1, 13))
+    size = np.searchsorted(month[order], np.arange(1, 13), side='right') - first
+    first, size = np.where(size > 0, first, 0), np.where(size > 0, size, len(month))
+    day_month = np.repeat(np.arange(12), DAYS_IN_MONTH)
+    pool_first, pool_size = first[day_month], size[day_month]
+    feed_in_rate = flows['rates']['feed_in']
+
+    import_factor = _growth_factors(rng, a['tariff_escalation_mean'], a['tariff_escalation_sd'], (trials, years))
+    feed_in_factor = _growth_factors(rng, a['feed_in_trend_mean'], a['feed_in_trend_sd'], (trials, years))
+    battery = DegradationState(trials, rate_scale=rng.lognormal(0, a['aging_spread'], trials))
+    uptake = rng.random(trials) < a['sharer_uptake_p']
+    delay = rng.integers(0, a['sharer_max_delay_years'] + 1, trials)
+    sharer_on = uptake[:, None] & (np.arange(years)[None, :] >= delay[:, None])
+
+    savings = np.empty((trials, years))
+    capacity = np.empty((trials, years))
+    for year in range(years):
+        # One weather year per trial: each day of the year drawn from its month's pool
+        picks = pool_first[:, None] + (rng.random((len(day_month), trials)) * pool_size[:, None]).astype(np.intp)
+        variant_rows = sharer_on[:, year] * len(levels) * n_recorded
+        import_value = np.zeros(trials)
+        export_loss = np.zeros(trials)
+        for day in range(len(day_month)):
+            # The day's flows and stress at each trial's current capacity
+            i, w = level_weights(battery.capacity, levels)
+            lower = variant_rows + i * n_recorded + picks[day]
+            upper = lower + n_recorded
+            value, loss, damage, mean_soc = (col.take(lower) + (col.take(upper) - col.take(lower)) * w
+                                             for col in table)
+            import_value += value
+            export_loss += loss
+            battery.step(damage, mean_soc)
+        savings[:, year] = (import_factor[:, year] * import_value
+                            - feed_in_factor[:, year] * feed_in_rate * export_loss)
+        capacity[:, year] = battery.capacity
+
+    cumulative = np.cumsum(savings, axis=1)
+    reached = cumulative >= net_cost
+    first = reached.argmax(axis=1)
+    rows = np.arange(trials)
+    before = np.where(first > 0, cumulative[rows, np.maximum(first - 1, 0)], 0.0)
+    payback = np.where(reached.any(axis=1),
+                       first + (net_cost - before) / savings[rows, first], np.inf)
+    discount = (1 + DISCOUNT_RATE) ** -(np.arange(years) + 1.0)
+    return {
+        'savings': savings,
+        'cumulative': cumulative,
+        'capacity': capacity,
+        'payback_years': payback,
+        'npv': savings @ discount - net_cost,
+    }
+
+
+def _simulate_chunk(args):
+    flows, trials, years, net_cost, assumptions, seed = args
+    return simulate_lifetimes(flows, trials, years, net_cost, assumptions, seed)
+
+
+def run_monte_carlo(flows: Dict, trials: int = TRIALS, years: int = YEARS, net_cost: float = NET_COST,
+                    assumptions: Dict = None, seed: int = SEED, workers: int = WORKERS) -> Dict[str, np.ndarray]:
+    """Simulate trials, split across a process pool when workers > 1 (reproducible for a seed)"""
+    chunks = max(workers, 1)
+    sizes = [trials // chunks + (1 if i < trials % chunks else 0) for i in range(chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    jobs = [(flows, n, years, net_cost, assumptions, s) for n, s in zip(sizes, seeds) if n]
+
+    if len(jobs) == 1:
+        parts = [_simulate_chunk(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_chunk, jobs))
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def _finite(value: float) -> Optional[float]:
+    return round(float(value), 2) if np.isfinite(value) else None
+
+
+def summarize(results: Dict[str, np.ndarray], net_cost: float = NET_COST) -> Dict:
+    """Payback/NPV percentiles, payback probabilities and cumulative savings bands per year"""
+    payback = results['payback_years']
+    cumulative = results['cumulative']
+    years = cumulative.shape[1]
+    return {
+        'trials': len(payback),
+        'years': years,
+        'net_cost': net_cost,
+        'payback_years': {f'p{p}': _finite(v) for p, v in zip(PERCENTILES, np.percentile(payback, PERCENTILES))},
+        'payback_within_horizon_pct': round(float(np.isfinite(payback).mean() * 100), 1),
+        'payback_by_year_pct': [round(float((payback <= y).mean() * 100), 1) for y in range(1, years + 1)],
+        'npv': {f'p{p}': _finite(v) for p, v in zip(PERCENTILES, np.percentile(results['npv'], PERCENTILES))},
+        'first_year_savings': {f'p{p}': _finite(v)
+                               for p, v in zip(PERCENTILES, np.percentile(results['savings'][:, 0], PERCENTILES))},
+        'cumulative_savings': [
+            {'year': y + 1, **{f'p{p}': _finite(v) for p, v in
+                               zip((10, 50, 90), np.percentile(cumulative[:, y], (10, 50, 90)))}}
+            for y in range(years)
+        ],
+        'capacity_pct': [
+            {'year': y + 1, **{f'p{p}': _finite(v * 100) for p, v in
+                               zip((10, 50, 90), np.percentile(results['capacity'][:, y], (10, 50, 90)))}}
+            for y in range(years)
+        ],
+    }
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    print("=" * 80)
+    print("Battery Payback - Monte Carlo")
+    print("=" * 80)
+    print()
+
+    flows = load_daily_flows(rebuild='--rebuild' in sys.argv)
+    print(f"Energy flows: {len(flows['days']['date'])} days (built {flows['built'][:10]})")
+
+    start = time.perf_counter()
+    results = run_monte_carlo(flows)
+    elapsed = time.perf_counter() - start
+    summary = {**summarize(results), 'assumptions': ASSUMPTIONS, 'elapsed_s': round(elapsed, 2),
+               'analysis_date': datetime.now().isoformat()}
+
+    print(f"{summary['trials']:,} trials x {summary['years']} years in {elapsed:.2f}s ({WORKERS} worker(s))")
+    print()
+    print("Payback (years):")
+    for key, value in summary['payback_years'].items():
+        print(f"  {key:>4}: {value if value is not None else f'> {YEARS}'}")
+    print(f"  Pays back within {YEARS} years: {summary['payback_within_horizon_pct']}% of trials")
+    print(f"  Median NPV at {DISCOUNT_RATE:.0%}: ${summary['npv']['p50']:,.0f}")
+    print(f"  Median capacity after {YEARS} years: {summary['capacity_pct'][-1]['p50']}%")
+
+    with open(RESULTS_FILE, 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"\nResults saved to {RESULTS_FILE.name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,70 +6,96 @@ Prioritizes local models, preloads them during startup for faster responses
 import os
 import logging
 import requests
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
 import threading
-import time
+
+try:
+    from .provider_discovery import first_success, probe_ollama_url
+except ImportError:
+    from provider_discovery import first_success, probe_ollama_url
+
+try:
+    from .hf_model_registry import get_model_registry
+except ImportError:
+    from hf_model_registry import get_model_registry
+
+try:
+    from .conversation_context import ConversationContext
+except ImportError:
+    from conversation_context import ConversationContext
+
+try:
+    from .response_cache import get_response_cache
+except ImportError:
+    from response_cache import get_response_cache
+
+try:
+    from .ollama_lifecycle import OllamaModelManager
+except ImportError:
+    from ollama_lifecycle import OllamaModelManager
+
+try:
+    from .document_index import document_index_status, get_document_index
+except ImportError:
+    from document_index import document_index_status, get_document_index
+
+try:
+    from .provider_router import ProviderRouter
+except ImportError:
+    from provider_router import ProviderRouter
+
+try:
+    from .provider_routing import ProviderRoutingMixin
+except ImportError:
+    from provider_routing import ProviderRoutingMixin
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class LangChainHandler:
+SYSTEM_PROMPT = ("You are Enhanced Jarvis, a helpful AI assistant. Be concise and helpful. "
+                 "When data from our solar database is given, answer from those figures only.")
+OLLAMA_NUM_CTX = 2048
+OLLAMA_MAX_TOKENS = 800
+
+class LangChainHandler(ProviderRoutingMixin):
     """Local-first AI handler with automatic model preloading"""
     
     def __init__(self):
         self.openai_api_key = os.getenv('OPENAI_API_KEY', '')
         self.huggingface_token = os.getenv('HUGGINGFACE_TOKEN', '')
         self.initialized = False
-        self.chat_history = []
+        # Prompt history must leave room for the reply inside Ollama's context window
+        self.response_cache = get_response_cache()
+        self.context = ConversationContext(SYSTEM_PROMPT, token_budget=OLLAMA_NUM_CTX - OLLAMA_MAX_TOKENS)
+        self.context_lock = threading.RLock()  # Sessions chat concurrently through one handler
         self.available_models = {}
         self.preloaded_model = None
         self.model_preloading = False
+        self._model_manager = None
+        self.router = ProviderRouter(self._provider_probes())
         
         try:
             self._initialize_ai()
+            self.router.start()
             self.initialized = True
             logger.info(f"AI handler initialized successfully - Provider: {self.ai_provider}")
             
-            # Start model preloading in background if using Ollama
+            # Start model preloading in background (Ollama, or the local HF registry)
             if self.ai_provider == "ollama":
                 threading.Thread(target=self._preload_preferred_model, daemon=True).start()
+            elif self.ai_provider == "local_hf":
+                get_model_registry().warm(self.available_models['local_hf'][0])
                 
         except Exception as e:
             logger.error(f"Failed to initialize AI handler: {e}")
             self.initialized = False
     
-    def _initialize_ai(self):
-        """Initialize AI components with local-first priority"""
-        
-        # Priority 1: Check for local Ollama models
-        if self._check_ollama_available():
-            self.ai_provider = "ollama"
-            logger.info("Using local Ollama models")
-            return
-        
-        # Priority 2: Check for local HuggingFace models
-        if self._check_local_huggingface():
-            self.ai_provider = "local_hf"
-            logger.info("Using local HuggingFace models")
-            return
-            
-        # Priority 3: HuggingFace API (free tier available)
-        if self._check_huggingface_api():
-            self.ai_provider = "huggingface_api"
-            logger.info("Using HuggingFace API")
-            return
-            
-        # Priority 4: OpenAI API (paid service)
-        if self.openai_api_key:
-            self.ai_provider = "openai"
-            logger.info("Using OpenAI API")
-            return
-            
-        # Fallback: Local mock responses
-        self.ai_provider = "local_mock"
-        logger.info("Using local mock responses - no AI models available")
-    
+    @property
+    def chat_history(self) -> List[Dict]:
+        """Retained verbatim turns (older ones are folded into the context summary)"""
+        return self.context.messages
+
     def _check_ollama_available(self) -> bool:
         """Check if Ollama is running and has models"""
         try:
@@ -78,21 +104,14 @@ class LangChainHandler:
                 "http://localhost:11434",
                 "http://127.0.0.1:11434",
             ]
-            
-            for url in ollama_urls:
-                try:
-                    response = requests.get(f"{url}/api/tags", timeout=5)
-                    if response.status_code == 200:
-                        models = response.json()
-                        if models.get('models'):
-                            self.ollama_url = url
-                            self.available_models['ollama'] = [m['name'] for m in models['models']]
-                            logger.info(f"Found Ollama models: {self.available_models['ollama']}")
-                            return True
-                except requests.RequestException:
-                    continue
-            
-            return False
+
+            found = first_success(ollama_urls, lambda url: probe_ollama_url(url, timeout=5))
+            if not found:
+                return False
+
+            self.ollama_url, self.available_models['ollama'] = found
+            logger.info(f"Found Ollama models: {self.available_models['ollama']}")
+            return True
         except Exception as e:
             logger.warning(f"Error checking Ollama: {e}")
             return False
@@ -123,9 +142,27 @@ class LangChainHandler:
         
         # If no preferred model found, use the first available
         return models[0] if models else None
+
+    def _ollama_model(self) -> Optional[str]:
+        return self.preloaded_model or self._get_preferred_model()
+
+    def _skip_provider(self, provider: str) -> bool:
+        # The rest of the chain answers while the model loads
+        return provider == "ollama" and self.model_preloading and not self.preloaded_model
+
+    def _on_provider_changed(self):
+        if self.ai_provider == "ollama" and not self.model_preloading:
+            self._preload_preferred_model()
     
+    @property
+    def model_manager(self) -> OllamaModelManager:
+        """Lifecycle manager for the current Ollama instance"""
+        if self._model_manager is None or self._model_manager.base_url != self.ollama_url:
+            self._model_manager = OllamaModelManager(self.ollama_url)
+        return self._model_manager
+
     def _preload_preferred_model(self):
-        """Preload the preferred model in background"""
+        """Load the preferred model in background and keep it resident"""
         try:
             preferred_model = self._get_preferred_model()
             if not preferred_model:
@@ -135,31 +172,8 @@ class LangChainHandler:
             logger.info(f"Preloading model: {preferred_model}")
             self.model_preloading = True
             
-            # Send a small preload request
-            preload_payload = {
-                "model": preferred_model,
-                "prompt": "Ready",
-                "stream": False,
-                "options": {
-                    "max_tokens": 1,
-                    "temperature": 0.1
-                }
-            }
-            
-            start_time = time.time()
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=preload_payload,
-                timeout=300  # 5 minutes for initial model loading
-            )
-            
-            load_time = time.time() - start_time
-            
-            if response.status_code == 200:
+            if self.model_manager.pin(preferred_model):
                 self.preloaded_model = preferred_model
-                logger.info(f"Model {preferred_model} preloaded successfully in {load_time:.2f}s")
-            else:
-                logger.warning(f"Failed to preload model {preferred_model}: {response.status_code}")
                 
         except Exception as e:
             logger.error(f"Error preloading model: {e}")
@@ -216,29 +230,7 @@ class LangChainHandler:
             logger.warning(f"HuggingFace API not available: {e}")
             return False
     
-    def chat(self, message: str, chat_history: List[Dict] = None) -> str:
-        """Handle chat conversation with local-first approach"""
-        try:
-            if not self.initialized:
-                return "AI system not fully initialized. Please check your configuration."
-            
-            # Route to appropriate chat handler based on priority
-            if self.ai_provider == "ollama":
-                return self._ollama_chat(message, chat_history)
-            elif self.ai_provider == "local_hf":
-                return self._local_hf_chat(message, chat_history)
-            elif self.ai_provider == "huggingface_api":
-                return self._huggingface_api_chat(message, chat_history)
-            elif self.ai_provider == "openai":
-                return self._openai_chat(message, chat_history)
-            else:
-                return self._local_mock_chat(message, chat_history)
-                
-        except Exception as e:
-            logger.error(f"Chat error: {e}")
-            return f"Chat error: {str(e)}"
-    
-    def _ollama_chat(self, message: str, chat_history: List[Dict] = None) -> str:
+    def _ollama_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
         """Chat using local Ollama models with preloading support"""
         try:
             # Use preloaded model if available, otherwise get preferred model
@@ -251,33 +243,39 @@ class LangChainHandler:
             if self.model_preloading and not self.preloaded_model:
                 return f"**Enhanced Jarvis (Ollama - {model_to_use})**\n\nModel is loading for the first time, please wait a moment and try again..."
             
-            # Prepare the prompt with context
-            system_prompt = "You are Enhanced Jarvis, a helpful AI assistant. Be concise and helpful."
-            
-            # Build conversation context
-            conversation = f"System: {system_prompt}\n"
-            if chat_history:
-                for chat in chat_history[-5:]:  # Last 5 messages for context
-                    role = "Human" if chat["role"] == "user" else "Assistant"
-                    conversation += f"{role}: {chat['content']}\n"
-            
-            conversation += f"Human: {message}\nAssistant: "
+            # Prepare the prompt with context, within the context token budget
+            manager = self.model_manager
+            with self.context_lock:
+                if chat_history is not None:
+                    self.context.sync(chat_history, message)
+                
+                # Follow-up turns continue from Ollama's own context tokens, so only
+                # the new message is processed instead of the whole conversation
+                reused = manager.reusable_context(model_to_use, self.context, reference + message,
+                                                  OLLAMA_NUM_CTX - OLLAMA_MAX_TOKENS)
+                if reused:
+                    conversation = f"{reference}Human: {message}\nAssistant: "
+                else:
+                    conversation = self.context.build_prompt(message, reference)
             
-            # Call Ollama API with appropriate timeout
+            # Call Ollama API with appropriate timeout, keeping the model resident
             payload = {
                 "model": model_to_use,
                 "prompt": conversation,
                 "stream": False,
+                "keep_alive": manager.keep_alive,
                 "options": {
                     "temperature": 0.7,
                     "top_p": 0.9,
-                    "max_tokens": 800,
-                    "num_ctx": 2048
+                    "max_tokens": OLLAMA_MAX_TOKENS,
+                    "num_ctx": OLLAMA_NUM_CTX
                 }
             }
+            if reused:
+                payload["context"] = reused
             
-            # Use shorter timeout if model is preloaded
-            timeout = 60 if self.preloaded_model else 180
+            # Use shorter timeout if the model is already resident
+            timeout = 60 if manager.state(model_to_use) == 'warm' else 180
             
             response = requests.post(
                 f"{self.ollama_url}/api/generate", 
@@ -288,6 +286,13 @@ class LangChainHandler:
             if response.status_code == 200:
                 result = response.json()
                 ai_response = result.get('response', '').strip()
+                with self.context_lock:
+                    manager.remember_context(model_to_use, result.get('context'), self.context,
+                                             message, ai_response)
+                    if chat_history is None:
+                        # Callers without their own history rely on ours for the next turn
+                        self.context.add("user", message)
+                        self.context.add("assistant", ai_response)
                 model_display = f"{model_to_use} {'(Preloaded)' if self.preloaded_model else ''}"
                 return f"**Enhanced Jarvis (Ollama - {model_display})**\n\n{ai_response}"
             else:
@@ -297,28 +302,23 @@ class LangChainHandler:
             logger.error(f"Ollama chat error: {e}")
             return f"Ollama error: {str(e)}. Falling back to next available provider."
     
-    def _local_hf_chat(self, message: str, chat_history: List[Dict] = None) -> str:
+    def _local_hf_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
         """Chat using local HuggingFace models"""
         try:
-            from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-            
             model_name = self.available_models['local_hf'][0]  # Use first available
-            
-            # Create a text generation pipeline
-            generator = pipeline('text-generation', model=model_name, tokenizer=model_name)
-            
-            # Generate response
-            response = generator(
-                message, 
-                max_length=200, 
-                num_return_sequences=1, 
-                temperature=0.7,
-                pad_token_id=generator.tokenizer.eos_token_id
+            prompt = f"{reference}\n{message}" if reference else message
+            
+            # Generate with the shared, already-loaded pipeline (batched with concurrent chats)
+            generated_text = get_model_registry().generate(
+                model_name,
+                prompt,
+                max_length=200,
+                num_return_sequences=1,
+                temperature=0.7
             )
             
-            generated_text = response[0]['generated_text']
             # Remove the input prompt from the response
-            ai_response = generated_text.replace(message, '').strip()
+            ai_response = generated_text.replace(prompt, '').strip()
             
             return f"**Enhanced Jarvis (Local HF - {model_name})**\n\n{ai_response}"
             
@@ -326,9 +326,10 @@ class LangChainHandler:
             logger.error(f"Local HF chat error: {e}")
             return f"Local HuggingFace error: {str(e)}"
     
-    def _huggingface_api_chat(self, message: str, chat_history: List[Dict] = None) -> str:
+    def _huggingface_api_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
         """Chat using HuggingFace Inference API"""
         try:
+            prompt = f"{reference}\n{message}" if reference else message
             # Use free HuggingFace models
             model_endpoint = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium"
             
@@ -336,14 +337,14 @@ class LangChainHandler:
             if self.huggingface_token:
                 headers["Authorization"] = f"Bearer {self.huggingface_token}"
             
-            payload = {"inputs": message}
+            payload = {"inputs": prompt}
             
             response = requests.post(model_endpoint, headers=headers, json=payload, timeout=15)
             
             if response.status_code == 200:
                 result = response.json()
                 if isinstance(result, list) and result:
-                    ai_response = result[0].get('generated_text', message).replace(message, '').strip()
+                    ai_response = result[0].get('generated_text', prompt).replace(prompt, '').strip()
                 else:
                     ai_response = str(result)
                 return f"**Enhanced Jarvis (HuggingFace API)**\n\n{ai_response}"
@@ -354,7 +355,7 @@ class LangChainHandler:
             logger.error(f"HuggingFace API error: {e}")
             return f"HuggingFace API error: {str(e)}"
     
-    def _openai_chat(self, message: str, chat_history: List[Dict] = None) -> str:
+    def _openai_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '') -> str:
         """OpenAI chat (fallback option)"""
         try:
             import openai
@@ -370,7 +371,7 @@ class LangChainHandler:
                     if chat["role"] in ["user", "assistant"]:
                         messages.append({"role": chat["role"], "content": chat["content"]})
             
-            messages.append({"role": "user", "content": message})
+            messages.append({"role": "user", "content": f"{reference}\n{message}" if reference else message})
             
             response = client.chat.completions.create(
                 model="gpt-3.5-turbo",
@@ -454,30 +455,45 @@ Would you like help setting up local models?"""
         return {
             "initialized": self.initialized,
             "ai_provider": getattr(self, 'ai_provider', 'unknown'),
+            "routing": self.router.get_status(),
             "available_models": self.available_models,
             "preloaded_model": self.preloaded_model,
             "model_preloading": self.model_preloading,
+            "ollama_model": (self.model_manager.get_status(self.preloaded_model or self._get_preferred_model())
+                             if getattr(self, 'ollama_url', None) else None),
             "has_openai_key": bool(self.openai_api_key),
             "has_hf_token": bool(self.huggingface_token),
-            "chat_history_length": len(self.chat_history),
-            "ollama_url": getattr(self, 'ollama_url', None)
+            "chat_history_length": len(self.context),
+            "response_cache": self.response_cache.get_status(),
+            "context": self.context.get_status(),
+            "documents": document_index_status(),
+            "ollama_url": getattr(self, 'ollama_url', None),
+            "local_model_registry": (get_model_registry().get_status()
+                                     if getattr(self, 'ai_provider', None) == "local_hf" else None)
         }
 
-    def process_document(self, document_content: str, filename: str) -> Dict[str, Any]:
-        """Process uploaded documents"""
+    def process_document(self, document_content: Union[str, bytes], filename: str) -> Dict[str, Any]:
+        """Chunk and index an uploaded document (text, or raw PDF/DOCX bytes) for retrieval in chat"""
         try:
-            word_count = len(document_content.split())
-            char_count = len(document_content)
-            lines = len(document_content.split('\n'))
+            result = get_document_index().add_document(filename, document_content)
+            if result["unchanged"]:
+                summary = f"Document '{filename}' is already indexed ({result['chunks']} chunks, unchanged)."
+            else:
+                summary = (f"Document '{filename}' indexed for chat!\n\nAnalysis:\n"
+                           f"- Words: {result['words']}\n- Characters: {result['chars']}\n"
+                           f"- Chunks: {result['chunks']} ({result['new']} new, {result['reused']} reused, "
+                           f"{result['removed']} removed)")
+            preview = result["preview"]
             
             return {
                 "success": True,
                 "filename": filename,
-                "word_count": word_count,
-                "char_count": char_count,
-                "lines": lines,
-                "message": f"Document '{filename}' processed successfully!\n\nAnalysis:\n- Words: {word_count}\n- Characters: {char_count}\n- Lines: {lines}",
-                "content_preview": document_content[:200] + "..." if len(document_content) > 200 else document_content
+                "word_count": result["words"],
+                "char_count": result["chars"],
+                "chunks": result["chunks"],
+                "new_chunks": result["new"],
+                "message": summary,
+                "content_preview": preview[:200] + "..." if len(preview) > 200 else preview
             }
         except Exception as e:
             return {
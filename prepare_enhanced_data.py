@@ -1,49 +1,72 @@
 #!/usr/bin/env python3
 """
 Prepare enhanced battery data for HTML embedding
-Include summaries + sample days to keep size reasonable
+Scenarios are stored as deltas against the continuous run (full fidelity)
 """
 
 import json
 
-# Load the enhanced data
-with open('battery_daily_charging_enhanced.json', 'r') as f:
-    data = json.load(f)
+from result_stream import ResultStreamReader, index_path
+from scenario_compaction import compact_scenario
+
+STREAM_PATH = 'battery_daily_charging_enhanced.ndjson'
+JSON_PATH = 'battery_daily_charging_enhanced.json'
+
+# Load the enhanced data - from the result stream when available, so each
+# scenario is read (and compacted) one at a time instead of all at once
+if index_path(STREAM_PATH).exists():
+    reader = ResultStreamReader(STREAM_PATH)
+    scenario_names = [s.split('/', 1)[1] for s in reader.sections if s.startswith('scenario_based/')]
+    battery_spec = reader.meta('battery_spec')
+    continuous_summary = reader.meta('continuous_simulation/summary')
+    continuous_results = list(reader.iter_days('continuous_simulation'))
+
+    def load_scenario(name):
+        return {
+            'starting_soc_pct': reader.meta(f'scenario_based/{name}/starting_soc_pct'),
+            'summary': reader.meta(f'scenario_based/{name}/summary'),
+            'daily_results': list(reader.iter_days(f'scenario_based/{name}'))
+        }
+else:
+    with open(JSON_PATH, 'r') as f:
+        data = json.load(f)
+    scenario_names = list(data['scenario_based'].keys())
+    battery_spec = data['battery_spec']
+    continuous_summary = data['continuous_simulation']['summary']
+    continuous_results = data['continuous_simulation']['daily_results']
+
+    def load_scenario(name):
+        return data['scenario_based'][name]
 
 # Create a compact version with:
 # 1. Full summaries
-# 2. Sample days (every 7th day) for scenarios
-# 3. Full continuous results (needed for realistic view)
+# 2. Scenarios delta-encoded against the continuous run + histograms
+# 3. Full continuous results (needed for realistic view and as delta base)
+
+usable_kwh = battery_spec['usable_kwh']
 
 compact_data = {
     'continuous_simulation': {
-        'summary': data['continuous_simulation']['summary'],
-        'daily_results': data['continuous_simulation']['daily_results']  # Keep all for realistic view
+        'summary': continuous_summary,
+        'daily_results': continuous_results  # Keep all for realistic view
     },
     'scenario_based': {},
-    'battery_spec': data['battery_spec']
+    'battery_spec': battery_spec
 }
 
-# For scenarios, include every 7th day as samples
-for scenario_name, scenario_data in data['scenario_based'].items():
-    daily_results = scenario_data['daily_results']
-    # Take every 7th day to show weekly patterns
-    sampled_results = [daily_results[i] for i in range(0, len(daily_results), 7)]
-
-    compact_data['scenario_based'][scenario_name] = {
-        'starting_soc_pct': scenario_data['starting_soc_pct'],
-        'summary': scenario_data['summary'],
-        'sample_days': sampled_results,  # ~54 days instead of 381
-        'note': 'Sample days (every 7th day) for visualization'
-    }
+for scenario_name in scenario_names:
+    scenario_data = load_scenario(scenario_name)
+    compact = compact_scenario(scenario_data, continuous_results, usable_kwh)
+    compact_data['scenario_based'][scenario_name] = compact
+    print(f"  {scenario_name}: {len(scenario_data['daily_results'])} days ({compact['encoding']})")
 
 # Save compact version
 with open('battery_daily_charging_enhanced_compact.json', 'w') as f:
-    json.dump(compact_data, f, indent=2)
+    json.dump(compact_data, f, separators=(',', ':'))
 
 # Check sizes
 import os
-full_size = os.path.getsize('battery_daily_charging_enhanced.json')
+full_size = os.path.getsize(STREAM_PATH if index_path(STREAM_PATH).exists() else JSON_PATH)
 compact_size = os.path.getsize('battery_daily_charging_enhanced_compact.json')
 
 print(f"[OK] Created compact version!")
@@ -0,0 +1,91 @@
+"""
+Enhanced Jarvis AI - Provider Discovery
+Probes AI provider candidates concurrently and persists the last successful
+discovery to disk, so handlers start instantly from the cache and
+re-validate in the background
+"""
+
+import os
+import json
+import time
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = Path(os.getenv('AI_PROVIDER_CACHE', Path(__file__).parent / '.ai_provider_cache.json'))
+CACHE_TTL = 6 * 3600  # Trust a cached discovery for this long (re-validated in background)
+OLLAMA_PROBE_TIMEOUT = 3
+
+
+def first_success(candidates: Sequence[Any], probe: Callable[[Any], Any]) -> Optional[Tuple[Any, Any]]:
+    """
+    Probe all candidates concurrently, keeping priority order
+
+    Args:
+        candidates: Candidates in priority order
+        probe: Returns a result for a usable candidate, None (or raises) otherwise
+
+    Returns:
+        (candidate, result) for the highest-priority usable candidate, or None.
+        Worst case is the slowest single probe rather than the sum of them.
+    """
+    if not candidates:
+        return None
+
+    pool = ThreadPoolExecutor(max_workers=len(candidates))
+    try:
+        futures = [pool.submit(probe, c) for c in candidates]
+        for candidate, future in zip(candidates, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.debug(f"Probe failed for {candidate}: {e}")
+                continue
+            if result is not None:
+                return candidate, result
+        return None
+    finally:
+        # Don't wait on lower-priority probes once a winner is known
+        pool.shutdown(wait=False)
+
+
+def probe_ollama_url(url: str, timeout: float = OLLAMA_PROBE_TIMEOUT) -> Optional[List[str]]:
+    """Model names served by an Ollama instance, or None if unreachable/empty"""
+    try:
+        response = requests.get(f"{url}/api/tags", timeout=timeout)
+        if response.status_code == 200:
+            models = [m['name'] for m in response.json().get('models', [])]
+            return models or None
+    except requests.RequestException:
+        pass
+    return None
+
+
+def load_discovery(path: Path = CACHE_PATH, ttl: float = CACHE_TTL) -> Optional[Dict[str, Any]]:
+    """Last saved discovery if younger than ttl"""
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    age = time.time() - state.get('checked_at', 0)
+    if age > ttl or not state.get('ai_provider'):
+        return None
+    return state
+
+
+def save_discovery(state: Dict[str, Any], path: Path = CACHE_PATH):
+    """Persist a discovery (atomically, so a concurrent reader never sees half a file)"""
+    state = dict(state, checked_at=time.time())
+    tmp = Path(f"{path}.tmp")
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Could not save provider discovery cache: {e}")
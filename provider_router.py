@@ -0,0 +1,186 @@
+"""
+Enhanced Jarvis AI - Provider Router
+Tracks latency and errors per AI provider, trips a circuit breaker on
+failures, orders providers for each request along the priority chain
+(degraded-latency providers after healthy ones) and probes open circuits in
+the background so recovered providers rejoin the chain.
+
+Circuit states:
+    closed     Serving traffic
+    open       Failing - skipped until a background probe succeeds
+    half_open  Probe succeeded - the next request is a trial; success closes
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_CHAIN = [p.strip() for p in
+                  os.getenv('AI_PROVIDER_CHAIN', 'ollama,local_hf,huggingface_api,openai').split(',') if p.strip()]
+FALLBACK_PROVIDER = 'local_mock'  # Always available, never tripped
+
+FAILURE_THRESHOLD = 3          # Consecutive failures that trip the breaker
+ERROR_RATE_THRESHOLD = 0.5     # ...or this error rate over the window
+MIN_WINDOW_CALLS = 5
+WINDOW_S = 120                 # Latency/error statistics cover this much recent traffic
+OPEN_COOLDOWN_S = 30           # First re-probe delay, doubling per trip
+MAX_COOLDOWN_S = 600
+SLOW_LATENCY_S = float(os.getenv('AI_SLOW_LATENCY_S', '20'))  # Median above this is degraded
+PROBE_INTERVAL_S = 5
+
+
+class CircuitBreaker:
+    """Breaker plus a time-windowed record of one provider's calls"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = 'open'        # Unverified until discovery or a probe says otherwise
+        self.next_probe = 0.0
+        self.trips = 0
+        self.consecutive_failures = 0
+        self.calls = deque()       # (time, ok, latency_s)
+
+    def _trim(self, now: float):
+        while self.calls and self.calls[0][0] < now - WINDOW_S:
+            self.calls.popleft()
+
+    def record(self, ok: bool, latency_s: float):
+        now = time.time()
+        self.calls.append((now, ok, latency_s))
+        self._trim(now)
+
+        if ok:
+            self.consecutive_failures = 0
+            if self.state != 'closed':
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = 'closed'
+            self.trips = 0
+            return
+
+        self.consecutive_failures += 1
+        errors = sum(1 for _, call_ok, _ in self.calls if not call_ok)
+        if (self.state == 'half_open'
+                or self.consecutive_failures >= FAILURE_THRESHOLD
+                or (len(self.calls) >= MIN_WINDOW_CALLS and errors / len(self.calls) >= ERROR_RATE_THRESHOLD)):
+            self.trip()
+
+    def trip(self):
+        self.trips += 1
+        cooldown = min(OPEN_COOLDOWN_S * 2 ** (self.trips - 1), MAX_COOLDOWN_S)
+        if self.state != 'open':  # Failed re-probes of an open circuit aren't news
+            logger.warning(f"Circuit for {self.name} opened - re-probing in {cooldown:.0f}s")
+        self.state = 'open'
+        self.next_probe = time.time() + cooldown
+
+    def close(self):
+        self.state = 'closed'
+        self.trips = 0
+        self.consecutive_failures = 0
+
+    def median_latency(self) -> Optional[float]:
+        self._trim(time.time())
+        latencies = sorted(latency for _, ok, latency in self.calls if ok)
+        return latencies[len(latencies) // 2] if latencies else None
+
+    def degraded(self) -> bool:
+        median = self.median_latency()
+        return median is not None and median > SLOW_LATENCY_S
+
+    def get_status(self) -> Dict[str, Any]:
+        self._trim(time.time())
+        median = self.median_latency()
+        return {
+            'state': self.state,
+            'calls': len(self.calls),
+            'error_rate': round(sum(1 for _, ok, _ in self.calls if not ok) / len(self.calls), 2) if self.calls else None,
+            'median_latency_s': round(median, 2) if median is not None else None,
+            'degraded': self.degraded(),
+            'next_probe_in_s': round(max(self.next_probe - time.time(), 0)) if self.state == 'open' else None,
+        }
+
+
+class ProviderRouter:
+    """
+    Request routing over a priority chain of providers
+
+    Args:
+        probes: provider -> callable returning True when the provider is usable
+        chain: Providers in priority order
+    """
+
+    def __init__(self, probes: Dict[str, Callable[[], bool]], chain: Sequence[str] = PROVIDER_CHAIN):
+        self.chain = [p for p in chain if p in probes]
+        self.probes = probes
+        self.breakers = {p: CircuitBreaker(p) for p in self.chain}
+        self._lock = threading.Lock()
+        self._prober = None
+
+    def mark_discovered(self, provider: str):
+        """Adopt a discovery result: the provider works, higher-priority ones didn't"""
+        rank = self.chain.index(provider) if provider in self.chain else len(self.chain)
+        with self._lock:
+            for i, name in enumerate(self.chain):
+                if i == rank:
+                    self.breakers[name].close()
+                elif i < rank:
+                    # Just probed: wait a cooldown before trying again.
+                    # Lower-priority providers stay unverified and are probed next.
+                    self.breakers[name].state = 'open'
+                    self.breakers[name].next_probe = time.time() + OPEN_COOLDOWN_S
+
+    def start(self):
+        """Begin probing open circuits in the background"""
+        if self._prober is None:
+            self._prober = threading.Thread(target=self._probe_loop, name='provider-prober', daemon=True)
+            self._prober.start()
+
+    def candidates(self, exclude: Sequence[str] = ()) -> List[str]:
+        """Providers to try for the next request, best first, ending with the fallback"""
+        with self._lock:
+            usable = [p for p in self.chain if p not in exclude and self.breakers[p].state != 'open']
+            healthy = [p for p in usable if not self.breakers[p].degraded()]
+            slow = [p for p in usable if p not in healthy]
+        return healthy + slow + [FALLBACK_PROVIDER]
+
+    def preferred(self) -> str:
+        return self.candidates()[0]
+
+    def record(self, provider: str, ok: bool, latency_s: float):
+        if provider in self.breakers:
+            with self._lock:
+                self.breakers[provider].record(ok, latency_s)
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(PROBE_INTERVAL_S)
+            now = time.time()
+            with self._lock:
+                due = [p for p in self.chain
+                       if self.breakers[p].state == 'open' and self.breakers[p].next_probe <= now]
+            for provider in due:
+                try:
+                    ok = bool(self.probes[provider]())
+                except Exception as e:
+                    logger.debug(f"Probe for {provider} failed: {e}")
+                    ok = False
+                with self._lock:
+                    breaker = self.breakers[provider]
+                    if ok:
+                        breaker.state = 'half_open'
+                        logger.info(f"Provider {provider} answered its probe - trying it again")
+                    else:
+                        breaker.trip()
+
+    def get_status(self) -> Dict[str, Any]:
+        preferred = self.preferred()
+        with self._lock:
+            return {
+                'chain': self.chain,
+                'preferred': preferred,
+                'providers': {p: b.get_status() for p, b in self.breakers.items()},
+            }
@@ -0,0 +1,224 @@
+"""
+Enhanced Jarvis AI - Provider Routing
+Discovery, failover routing and response-cache keys shared by the chat
+handlers (local_first_ai_handler, preload_enhanced_handler)
+
+Handlers mix in ProviderRoutingMixin and provide the provider checks
+(_check_ollama_available, _check_local_huggingface, _check_huggingface_api),
+the per-provider chat methods and _ollama_model(). Handler-specific
+behaviour hooks in through _skip_provider, _is_cacheable and
+_on_provider_changed.
+"""
+
+import time
+import logging
+import threading
+from typing import List, Dict, Optional, Any, Tuple
+
+try:
+    from .provider_discovery import first_success, load_discovery, save_discovery
+except ImportError:
+    from provider_discovery import first_success, load_discovery, save_discovery
+
+try:
+    from .document_index import reference_for
+except ImportError:
+    from document_index import reference_for
+
+try:
+    from .solar_query_tools import solar_data_for
+except ImportError:
+    from solar_query_tools import solar_data_for
+
+try:
+    from .chat_scheduler import provider_slot
+except ImportError:
+    from chat_scheduler import provider_slot
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderRoutingMixin:
+    """Provider discovery and routed, cached chat for a handler with a ProviderRouter"""
+
+    @property
+    def ai_provider(self) -> str:
+        """Provider the next request goes to first (healthy, highest priority)"""
+        return self.router.preferred()
+
+    @ai_provider.setter
+    def ai_provider(self, provider: str):
+        self.router.mark_discovered(provider)
+
+    def _provider_probes(self) -> Dict[str, Any]:
+        """Availability checks the router re-runs for providers with an open circuit"""
+        probes = {
+            "ollama": self._check_ollama_available,
+            "local_hf": self._check_local_huggingface,
+            "huggingface_api": self._check_huggingface_api,
+        }
+        if self.openai_api_key:
+            probes["openai"] = lambda: True
+        return probes
+
+    # -- Discovery -----------------------------------------------------------
+
+    def _initialize_ai(self):
+        """Initialize AI components with local-first priority"""
+
+        # Start instantly from the last successful discovery, re-validating in the background
+        cached = load_discovery()
+        if cached and self._apply_discovery(cached):
+            logger.info(f"Using cached provider discovery: {self.ai_provider}")
+            threading.Thread(target=self._revalidate_providers, daemon=True).start()
+            return
+
+        self._apply_discovery(self._discover_providers())
+        logger.info(f"Using {self.ai_provider} provider")
+
+    def _discover_providers(self) -> Dict[str, Any]:
+        """Probe all providers concurrently and pick the highest-priority available one"""
+        # Priority 1: local Ollama, 2: local HuggingFace, 3: HuggingFace API (free tier)
+        checks = {
+            "ollama": self._check_ollama_available,
+            "local_hf": self._check_local_huggingface,
+            "huggingface_api": self._check_huggingface_api,
+        }
+        found = first_success(list(checks), lambda name: True if checks[name]() else None)
+
+        if found:
+            provider = found[0]
+        elif self.openai_api_key:
+            provider = "openai"  # Priority 4: OpenAI API (paid service)
+        else:
+            provider = "local_mock"  # Fallback: Local mock responses
+            logger.info("No AI models available")
+
+        state = {
+            "ai_provider": provider,
+            "ollama_url": getattr(self, 'ollama_url', None),
+            "available_models": dict(self.available_models),
+        }
+        save_discovery(state)
+        return state
+
+    def _apply_discovery(self, state: Dict[str, Any]) -> bool:
+        """Adopt a discovery result; False if it no longer applies (e.g. key removed)"""
+        if state["ai_provider"] == "openai" and not self.openai_api_key:
+            return False
+        self.available_models = dict(state.get("available_models") or {})
+        if state.get("ollama_url"):
+            self.ollama_url = state["ollama_url"]
+        self.ai_provider = state["ai_provider"]
+        return True
+
+    def _revalidate_providers(self):
+        """Background re-check of a cached discovery"""
+        try:
+            previous = self.ai_provider
+            self._apply_discovery(self._discover_providers())
+            if self.ai_provider != previous:
+                logger.info(f"Provider changed on re-validation: {previous} -> {self.ai_provider}")
+                self._on_provider_changed()
+        except Exception as e:
+            logger.warning(f"Provider re-validation failed: {e}")
+
+    def _on_provider_changed(self):
+        """Called after re-validation switched the preferred provider"""
+
+    # -- Routing -------------------------------------------------------------
+
+    def chat(self, message: str, chat_history: List[Dict] = None) -> str:
+        """Handle chat conversation with local-first approach"""
+        try:
+            if not self.initialized:
+                return "AI system not fully initialized. Please check your configuration."
+
+            # Answers grounded in our solar data or uploaded documents bypass the response cache
+            reference = solar_data_for(message) + reference_for(message)
+
+            # Repeated standalone questions are answered from the response cache
+            cache_model = None if reference else self._response_cache_model(message, chat_history)
+            if cache_model:
+                cached = self.response_cache.get(cache_model, message)
+                if cached is not None:
+                    if chat_history is None:
+                        with self.context_lock:
+                            self.context.add("user", message)
+                            self.context.add("assistant", cached)
+                    return cached
+
+            provider, response = self._route_chat(message, chat_history, reference)
+            if cache_model and cache_model.startswith(f"{provider}:") and self._is_cacheable(provider, response):
+                self.response_cache.put(cache_model, message, response)
+            return response
+
+        except Exception as e:
+            logger.error(f"Chat error: {e}")
+            return f"Chat error: {str(e)}"
+
+    def _route_chat(self, message: str, chat_history: List[Dict] = None, reference: str = '',
+                    exclude: Tuple[str, ...] = ()) -> Tuple[str, str]:
+        """Try providers in routing order, failing over until one answers; returns (provider, response)"""
+        for provider in self.router.candidates(exclude):
+            if self._skip_provider(provider):
+                continue
+            with provider_slot(provider):
+                started = time.perf_counter()
+                response = self._call_provider(provider, message, chat_history, reference)
+            answered = self._is_cacheable(provider, response)
+            self.router.record(provider, answered, time.perf_counter() - started)
+            if answered or provider == "local_mock":
+                return provider, response
+            logger.warning(f"{provider} failed, failing over: {response[:120]}")
+
+    def _skip_provider(self, provider: str) -> bool:
+        """Leave a provider out of this request's chain without counting it as failed"""
+        return False
+
+    def _call_provider(self, provider: str, message: str, chat_history: List[Dict] = None,
+                       reference: str = '') -> str:
+        if provider == "ollama":
+            return self._ollama_chat(message, chat_history, reference)
+        elif provider == "local_hf":
+            return self._local_hf_chat(message, chat_history, reference)
+        elif provider == "huggingface_api":
+            return self._huggingface_api_chat(message, chat_history, reference)
+        elif provider == "openai":
+            return self._openai_chat(message, chat_history, reference)
+        else:
+            return self._local_mock_chat(message, chat_history)
+
+    def _is_cacheable(self, provider: str, response: str) -> bool:
+        """A complete model answer - not an error (also what counts as success for routing)"""
+        return response.startswith("**Enhanced Jarvis (")
+
+    # -- Response cache ------------------------------------------------------
+
+    def _response_cache_model(self, message: str, chat_history: List[Dict] = None) -> Optional[str]:
+        """
+        Cache key model for a standalone question (first turn of a conversation),
+        None when the answer may depend on earlier turns or would be a mock response
+        """
+        if chat_history is None:
+            if self.context.total_turns:
+                return None
+        else:
+            prior = [c for c in chat_history if c.get("role") in ("user", "assistant")]
+            if prior and prior[-1]["role"] == "user" and prior[-1]["content"] == message:
+                prior = prior[:-1]
+            if prior:
+                return None
+
+        provider = self.ai_provider
+        if provider == "ollama":
+            model = self._ollama_model()
+        elif provider == "local_hf":
+            model = self.available_models['local_hf'][0]
+        elif provider == "huggingface_api":
+            model = "microsoft/DialoGPT-medium"
+        elif provider == "openai":
+            model = "gpt-3.5-turbo"
+        else:
+            return None
+        return f"{provider}:{model}"
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Render Pipeline
+Report figures as registered jobs, so regenerating a report only redraws
+figures whose data changed.
+
+- Each figure registers a render function and a selector that picks its
+  slice of the results; the job key is a hash of that slice plus the render
+  function's source
+- Jobs whose key matches the manifest (and whose files exist) are skipped
+- The rest render in a process pool on the non-interactive Agg backend
+- Each figure can be written in several formats (png, webp, svg, pdf) and,
+  for raster formats, several resolutions
+
+Usage:
+    @figure('battery_roi_analysis', select=lambda results: {...})
+    def dashboard(data): ...  # returns a matplotlib Figure
+
+    render_all(results)
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import matplotlib
+matplotlib.use('Agg')
+
+log = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MANIFEST_FILE = '.render_manifest.json'
+RENDER_FORMATS = tuple(os.getenv('RENDER_FORMATS', 'png').split(','))
+RENDER_DPIS = tuple(int(d) for d in os.getenv('RENDER_DPIS', '300').split(','))
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', str(os.cpu_count() or 1)))
+
+VECTOR_FORMATS = {'svg', 'pdf'}
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class FigureJob:
+    """A registered figure: render(data) -> Figure, select(results) -> data"""
+
+    def __init__(self, name: str, render: Callable, select: Callable[[Any], Any]):
+        self.name = name
+        self.render = render
+        self.select = select
+        self.source_hash = hashlib.sha256(inspect.getsource(render).encode()).hexdigest()
+
+    def key(self, data: Any) -> str:
+        payload = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(f"{self.source_hash}:{payload}".encode()).hexdigest()[:16]
+
+
+_registry: Dict[str, FigureJob] = {}
+
+
+def figure(name: str, select: Callable[[Any], Any]):
+    """Register a render function under name (the output file stem)"""
+    def register(render: Callable) -> Callable:
+        _registry[name] = FigureJob(name, render, select)
+        return render
+    return register
+
+
+def registered() -> List[str]:
+    return list(_registry)
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+def output_files(name: str, formats: Sequence[str], dpis: Sequence[int]) -> List[Tuple[str, str, int]]:
+    """(filename, format, dpi) for every output of a figure"""
+    files = []
+    for fmt in formats:
+        if fmt in VECTOR_FORMATS:
+            files.append((f"{name}.{fmt}", fmt, dpis[0]))
+        else:
+            # The first resolution keeps the plain name existing reports link to
+            files.extend((f"{name}.{fmt}" if i == 0 else f"{name}@{dpi}.{fmt}", fmt, dpi)
+                         for i, dpi in enumerate(dpis))
+    return files
+
+
+def _render(args) -> List[str]:
+    """Render one figure to all its files (runs in a worker process)"""
+    render, data, out_dir, files = args
+    import matplotlib.pyplot as plt
+
+    fig = render(data)
+    try:
+        written = []
+        for filename, fmt, dpi in files:
+            fig.savefig(Path(out_dir) / filename, format=fmt, dpi=dpi, bbox_inches='tight')
+            written.append(filename)
+        return written
+    finally:
+        plt.close(fig)
+
+
+def _load_manifest(path: Path) -> Dict[str, Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def render_all(results: Any, out_dir: str = '.', formats: Sequence[str] = RENDER_FORMATS,
+               dpis: Sequence[int] = RENDER_DPIS, workers: int = RENDER_WORKERS,
+               force: bool = False, only: Sequence[str] = None) -> Dict[str, Dict]:
+    """
+    Render registered figures whose input changed
+
+    Args:
+        results: Object passed to every figure's selector
+        out_dir: Directory for images and the manifest
+        formats: File formats to write
+        dpis: Resolutions for raster formats
+        workers: Process pool size (1 renders in this process)
+        force: Re-render even when cached
+        only: Figure names to consider (default: all registered)
+
+    Returns:
+        name -> {'status': 'cached' | 'rendered' | 'failed', 'files': [...]} (plus 'error')
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest_path = out / MANIFEST_FILE
+    manifest = _load_manifest(manifest_path)
+
+    report = {}
+    pending = []
+    for name in (only or registered()):
+        job = _registry[name]
+        data = job.select(results)
+        key = job.key(data)
+        files = output_files(name, formats, dpis)
+        cached = manifest.get(name, {})
+        if (not force and cached.get('key') == key
+                and all((out / f).exists() for f, _, _ in files)):
+            report[name] = {'status': 'cached', 'files': [f for f, _, _ in files]}
+            continue
+        pending.append((name, key, (job.render, data, str(out), files)))
+
+    if pending:
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                futures = [(name, key, pool.submit(_render, args)) for name, key, args in pending]
+                outcomes = []
+                for name, key, future in futures:
+                    try:
+                        outcomes.append((name, key, future.result(), None))
+                    except Exception as e:
+                        outcomes.append((name, key, None, e))
+        else:
+            outcomes = []
+            for name, key, args in pending:
+                try:
+                    outcomes.append((name, key, _render(args), None))
+                except Exception as e:
+                    outcomes.append((name, key, None, e))
+
+        for name, key, written, error in outcomes:
+            if error is not None:
+                log.error(f"Rendering {name} failed: {error}")
+                manifest.pop(name, None)
+                report[name] = {'status': 'failed', 'files': [], 'error': str(error)}
+            else:
+                manifest[name] = {'key': key, 'files': written}
+                report[name] = {'status': 'rendered', 'files': written}
+
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    return report
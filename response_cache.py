@@ -0,0 +1,220 @@
+"""
+Enhanced Jarvis AI - Response Cache
+SQLite cache of assistant answers keyed by model and normalized prompt, with
+optional embedding similarity for near-duplicate questions, TTL expiry and
+size-bounded least-recently-used eviction
+"""
+
+import os
+import re
+import time
+import struct
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = Path(os.getenv('RESPONSE_CACHE_PATH', Path(__file__).parent / 'response_cache.db'))
+CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 7 * 86400))
+MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+SIMILARITY_THRESHOLD = 0.92
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", prompt.lower())).strip()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+
+
+def sentence_transformer_embedder(model_name: str = 'all-MiniLM-L6-v2') -> Optional[Callable[[str], List[float]]]:
+    """Normalized sentence-transformers embeddings, or None if the library isn't installed"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.info("sentence-transformers not available - response cache uses exact matches only")
+        return None
+
+    model = SentenceTransformer(model_name)
+    return lambda text: model.encode(text, normalize_embeddings=True).tolist()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return struct.pack(f'{len(vector)}f', *vector)
+
+
+def _unpack(blob: bytes) -> List[float]:
+    return list(struct.unpack(f'{len(blob) // 4}f', blob))
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """
+    Exact-plus-near-duplicate response cache
+
+    Args:
+        path: SQLite file
+        ttl: Seconds an answer stays valid
+        max_entries: Entries kept before least-recently-used eviction
+        embedder: text -> vector for near-duplicate matching (None: exact only)
+        threshold: Minimum cosine similarity for a near-duplicate hit
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, ttl: float = CACHE_TTL, max_entries: int = MAX_ENTRIES,
+                 embedder: Optional[Callable[[str], List[float]]] = None,
+                 threshold: float = SIMILARITY_THRESHOLD):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embedder = embedder
+        self.threshold = threshold
+        self.stats = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                model TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                prompt TEXT,
+                response TEXT,
+                embedding BLOB,
+                created_at REAL,
+                last_hit REAL,
+                hits INTEGER DEFAULT 0,
+                PRIMARY KEY (model, prompt_hash)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_lru ON response_cache(last_hit)")
+        self._db.commit()
+
+        # model -> [(prompt_hash, vector)] for similarity search without re-reading blobs
+        self._vectors = {}
+
+    def _model_vectors(self, model: str, cutoff: float) -> List[Tuple[str, List[float]]]:
+        if model not in self._vectors:
+            rows = self._db.execute("""
+                SELECT prompt_hash, embedding FROM response_cache
+                WHERE model = ? AND embedding IS NOT NULL AND created_at >= ?
+            """, (model, cutoff)).fetchall()
+            self._vectors[model] = [(h, _unpack(blob)) for h, blob in rows]
+        return self._vectors[model]
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """Cached answer for this model and prompt (exact, then near-duplicate)"""
+        key = prompt_hash(prompt)
+        now = time.time()
+        cutoff = now - self.ttl
+
+        with self._lock:
+            row = self._db.execute("""
+                SELECT response FROM response_cache
+                WHERE model = ? AND prompt_hash = ? AND created_at >= ?
+            """, (model, key, cutoff)).fetchone()
+            kind = 'exact_hits'
+
+            if row is None and self.embedder is not None:
+                query = self.embedder(normalize_prompt(prompt))
+                best_hash, best_score = None, self.threshold
+                for candidate_hash, vector in self._model_vectors(model, cutoff):
+                    score = _cosine(query, vector)
+                    if score >= best_score:
+                        best_hash, best_score = candidate_hash, score
+                if best_hash is not None:
+                    key = best_hash
+                    row = self._db.execute("""
+                        SELECT response FROM response_cache
+                        WHERE model = ? AND prompt_hash = ? AND created_at >= ?
+                    """, (model, key, cutoff)).fetchone()
+                    kind = 'similar_hits'
+
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            self._db.execute("""
+                UPDATE response_cache SET last_hit = ?, hits = hits + 1
+                WHERE model = ? AND prompt_hash = ?
+            """, (now, model, key))
+            self._db.commit()
+            self.stats[kind] += 1
+            return row[0]
+
+    def put(self, model: str, prompt: str, response: str):
+        """Store an answer, then drop expired and least-recently-used entries"""
+        key = prompt_hash(prompt)
+        now = time.time()
+        vector = self.embedder(normalize_prompt(prompt)) if self.embedder is not None else None
+
+        with self._lock:
+            self._db.execute("""
+                INSERT OR REPLACE INTO response_cache
+                    (model, prompt_hash, prompt, response, embedding, created_at, last_hit, hits)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+            """, (model, key, prompt, response, _pack(vector) if vector else None, now, now))
+            self.stats['stores'] += 1
+
+            expired = self._db.execute("DELETE FROM response_cache WHERE created_at < ?",
+                                       (now - self.ttl,)).rowcount
+            overflow = self._db.execute("""
+                DELETE FROM response_cache WHERE rowid IN (
+                    SELECT rowid FROM response_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,)).rowcount
+            self._db.commit()
+            self.stats['evictions'] += expired + overflow
+
+            if vector and not (expired or overflow) and model in self._vectors:
+                self._vectors[model] = [(h, v) for h, v in self._vectors[model] if h != key]
+                self._vectors[model].append((key, vector))
+            else:
+                self._vectors.clear()  # Rebuilt lazily from the table
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM response_cache")
+            self._db.commit()
+            self._vectors.clear()
+
+    def get_status(self) -> Dict[str, object]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        lookups = self.stats['exact_hits'] + self.stats['similar_hits'] + self.stats['misses']
+        hits = self.stats['exact_hits'] + self.stats['similar_hits']
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'semantic': self.embedder is not None,
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+            **self.stats,
+        }
+
+
+# Global instance
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Get or create the shared response cache (semantic if RESPONSE_CACHE_EMBEDDINGS=1)"""
+    global _cache
+    if _cache is None:  # Lock-free once created; both handlers ask on every construction
+        with _cache_lock:
+            if _cache is None:
+                embedder = None
+                if os.getenv('RESPONSE_CACHE_EMBEDDINGS', '0') == '1':
+                    embedder = sentence_transformer_embedder()
+                _cache = ResponseCache(embedder=embedder)
+    return _cache
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Streaming Result Output
+Writes analysis results as newline-delimited JSON records while the
+simulation runs, with a sparse date index alongside so readers can seek
+straight to a date range without loading the whole file.
+
+File layout (one JSON object per line):
+    {"m": "battery_spec", "v": {...}}                 - metadata value
+    {"s": "continuous_simulation", "r": {...}}        - daily record
+
+Sections and metadata keys are '/'-separated paths into the legacy nested
+JSON layout ('' is the top level), so write_json_from_stream() can rebuild
+the old file for consumers that still json.load() it.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+INDEX_STRIDE = 64  # Index every Nth record of a section
+RECORDS_KEY = 'daily_results'
+
+# ============================================================================
+# WRITER
+# ============================================================================
+
+class ResultStreamWriter:
+    """
+    Append-only NDJSON writer with a sparse per-section date index
+
+    Use as a context manager so the index is written even if the run fails.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        # An index left by an earlier run would point into the old file
+        # until close() writes the new one
+        index_path(self.path).unlink(missing_ok=True)
+        self._f = open(self.path, 'wb')
+        self._offset = 0
+        self._counts = {}
+        self._index = {'meta': {}, 'sections': {}}
+
+    def _write_line(self, obj: Dict) -> int:
+        line = (json.dumps(obj, separators=(',', ':')) + '\n').encode('utf-8')
+        offset = self._offset
+        self._f.write(line)
+        self._offset += len(line)
+        return offset
+
+    def write_meta(self, key: str, value: Any):
+        """Write a metadata value (summary, battery spec, ...) under a '/' path"""
+        self._index['meta'][key] = self._write_line({'m': key, 'v': value})
+
+    def write(self, section: str, record: Dict):
+        """Write one daily record; records within a section must be date-ordered"""
+        offset = self._write_line({'s': section, 'r': record})
+        n = self._counts.get(section, 0)
+        if n % INDEX_STRIDE == 0:
+            self._index['sections'].setdefault(section, []).append([record['date'], offset])
+        self._counts[section] = n + 1
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.close()
+        self._index['counts'] = self._counts
+        with open(index_path(self.path), 'w') as f:
+            json.dump(self._index, f, separators=(',', ':'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def index_path(path) -> Path:
+    """Sidecar index file for a result stream"""
+    path = Path(path)
+    return path.with_name(path.name + '.idx')
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class ResultStreamReader:
+    """Random-access reader for files written by ResultStreamWriter"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(index_path(self.path), 'r') as f:
+            self._index = json.load(f)
+
+    @property
+    def sections(self):
+        return list(self._index['sections'].keys())
+
+    @property
+    def meta_keys(self):
+        return list(self._index['meta'].keys())
+
+    def count(self, section: str) -> int:
+        return self._index['counts'].get(section, 0)
+
+    def _read_at(self, f, offset: int) -> Dict:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def meta(self, key: str, default: Any = None) -> Any:
+        """Read a single metadata value by seeking to it"""
+        offset = self._index['meta'].get(key)
+        if offset is None:
+            return default
+        with open(self.path, 'rb') as f:
+            return self._read_at(f, offset)['v']
+
+    def iter_days(self, section: str, start: Optional[str] = None,
+                  end: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Yield records of one section whose date lies in [start, end]
+
+        Args:
+            section: Section path, e.g. 'scenario_based/25%'
+            start: First date (YYYY-MM-DD), default: beginning
+            end: Last date (YYYY-MM-DD), default: end
+
+        Yields:
+            Daily record dicts, in date order
+        """
+        entries = self._index['sections'].get(section)
+        if not entries:
+            return
+
+        # Seek to the last indexed record at or before start
+        skipped = 0
+        offset = entries[0][1]
+        if start is not None:
+            for i, (date, entry_offset) in enumerate(entries):
+                if date > start:
+                    break
+                offset = entry_offset
+                skipped = i * INDEX_STRIDE
+
+        remaining = self.count(section) - skipped
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                obj = json.loads(line)
+                if obj.get('s') != section:
+                    continue
+                record = obj['r']
+                if end is not None and record['date'] > end:
+                    return
+                if start is None or record['date'] >= start:
+                    yield record
+                remaining -= 1
+                if remaining <= 0:
+                    return
+
+# ============================================================================
+# LEGACY JSON EXPORT
+# ============================================================================
+
+class _Records:
+    """Placeholder for a section's record list in the legacy layout"""
+
+    def __init__(self, section: str):
+        self.section = section
+
+
+def _legacy_tree(reader: ResultStreamReader) -> Dict:
+    """Nested layout of metadata values (loaded) and record lists (deferred)"""
+    tree = {}
+
+    def place(path: str, value):
+        *parents, leaf = path.split('/')
+        node = tree
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+
+    # Keep the order records and metadata were written in
+    ordered = [(offset, key, 'meta') for key, offset in reader._index['meta'].items()]
+    ordered += [(entries[0][1], section, 'records') for section, entries in reader._index['sections'].items()]
+    for _, key, kind in sorted(ordered):
+        if kind == 'meta':
+            place(key, reader.meta(key))
+        else:
+            place(f"{key}/{RECORDS_KEY}" if key else RECORDS_KEY, _Records(key))
+    return tree
+
+
+def _write_value(f, reader: ResultStreamReader, value, level: int, indent: int):
+    pad = ' ' * (indent * (level + 1))
+    end_pad = ' ' * (indent * level)
+
+    if isinstance(value, _Records):
+        f.write('[')
+        first = True
+        for record in reader.iter_days(value.section):
+            f.write(('' if first else ',') + '\n' + pad)
+            f.write(json.dumps(record, indent=indent).replace('\n', '\n' + pad))
+            first = False
+        f.write(']' if first else '\n' + end_pad + ']')
+    elif isinstance(value, dict) and value:
+        f.write('{')
+        for i, (key, item) in enumerate(value.items()):
+            f.write((',' if i else '') + '\n' + pad + json.dumps(key) + ': ')
+            _write_value(f, reader, item, level + 1, indent)
+        f.write('\n' + end_pad + '}')
+    else:
+        f.write(json.dumps(value, indent=indent).replace('\n', '\n' + end_pad))
+
+
+def write_json_from_stream(stream_path, json_path, indent: int = 2):
+    """
+    Rebuild the legacy nested JSON file from a result stream, one record at
+    a time, for consumers that still json.load() the whole document
+    """
+    reader = ResultStreamReader(stream_path)
+    with open(json_path, 'w') as f:
+        _write_value(f, reader, _legacy_tree(reader), 0, indent)
+
+
+def load_daily_results(stream_path, json_path, section: str,
+                       start: Optional[str] = None, end: Optional[str] = None):
+    """
+    Daily results for one section, from the stream when present
+    (seeking to the date range), else from the legacy JSON file
+    """
+    if index_path(stream_path).exists():
+        return list(ResultStreamReader(stream_path).iter_days(section, start, end))
+
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    node = data
+    for key in section.split('/') if section else []:
+        node = node[key]
+    return [d for d in node[RECORDS_KEY]
+            if (start is None or d['date'] >= start) and (end is None or d['date'] <= end)]
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Scenario Compaction
+Stores starting-SOC scenario results as deltas against the continuous
+simulation, plus per-scenario summary histograms, so every day survives
+compaction (including the extreme days that every-7th-day sampling dropped).
+Supports level-of-detail retrieval: full resolution for a selected date
+range, weekly aggregates elsewhere.
+"""
+
+from typing import Dict, List, Optional
+
+ENCODING = 'delta_v1'
+
+# Histogram bins
+FILLED_PCT_EDGES = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 100.01]
+SOLAR_KWH_EDGES = [0, 5, 10, 15, 20, 25, 30, 35, 40, 50, 1000]
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _centi(value: float) -> int:
+    """Convert a 2dp kWh value to integer hundredths (exact, no float drift)"""
+    return int(round(value * 100))
+
+
+def _time_to_minutes(hhmm: Optional[str]) -> Optional[int]:
+    """'HH:MM' -> minutes from midnight (None passes through)"""
+    if hhmm is None:
+        return None
+    h, m = map(int, hhmm.split(':'))
+    return h * 60 + m
+
+
+def _minutes_to_time(minutes: Optional[int]) -> Optional[str]:
+    """Minutes from midnight -> 'HH:MM' (None passes through)"""
+    if minutes is None:
+        return None
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _histogram(values: List[float], edges: List[float]) -> Dict:
+    """Count values into [edges[i], edges[i+1]) bins"""
+    counts = [0] * (len(edges) - 1)
+    for v in values:
+        for i in range(len(edges) - 1):
+            if edges[i] <= v < edges[i + 1]:
+                counts[i] += 1
+                break
+    return {'edges': edges, 'counts': counts}
+
+
+def scenario_histograms(daily_results: List[Dict]) -> Dict:
+    """
+    Per-scenario summary histograms
+
+    Args:
+        daily_results: Expanded scenario daily results
+
+    Returns:
+        Dict of histograms (battery fill %, time-to-full hour, daily solar)
+    """
+    full_hours = {}
+    for d in daily_results:
+        minutes = _time_to_minutes(d['time_to_full'])
+        if minutes is not None:
+            hour = str(minutes // 60)
+            full_hours[hour] = full_hours.get(hour, 0) + 1
+
+    return {
+        'battery_filled_pct': _histogram([d['battery_filled_pct'] for d in daily_results], FILLED_PCT_EDGES),
+        'total_solar_kwh': _histogram([d['total_solar_kwh'] for d in daily_results], SOLAR_KWH_EDGES),
+        'time_to_full_hour': dict(sorted(full_hours.items(), key=lambda kv: int(kv[0]))),
+        'never_full_days': sum(1 for d in daily_results if d['time_to_full'] is None),
+    }
+
+# ============================================================================
+# ENCODE / DECODE
+# ============================================================================
+
+def _encode(daily_results: List[Dict], continuous_results: List[Dict],
+            starting_soc_kwh: float, usable_kwh: float) -> Optional[Dict]:
+    """Delta-encode a scenario against the continuous run (None if not aligned)"""
+    if len(daily_results) != len(continuous_results):
+        return None
+
+    max_soc_delta = []
+    time_to_full_min = []
+    hourly_soc_delta = []
+    filled_pct_fix = {}
+
+    for i, (day, base) in enumerate(zip(daily_results, continuous_results)):
+        if day['date'] != base['date'] or day['total_solar_kwh'] != base['total_solar_kwh']:
+            return None
+        if day['starting_soc_kwh'] != starting_soc_kwh:
+            return None
+
+        # Hourly SOC must cover the same hours as the continuous day
+        if list(day['hourly_soc'].keys()) != list(base['hourly_soc'].keys()):
+            return None
+
+        max_soc_delta.append(_centi(day['max_battery_soc_kwh']) - _centi(base['max_soc_kwh']))
+        time_to_full_min.append(_time_to_minutes(day['time_to_full']))
+        hourly_soc_delta.append([
+            _centi(day['hourly_soc'][h]) - _centi(base['hourly_soc'][h])
+            for h in base['hourly_soc']
+        ])
+
+        # Fill % is derived from the unrounded max SOC, so keep the rare
+        # values where recomputing from the rounded figure disagrees
+        recomputed = round(day['max_battery_soc_kwh'] / usable_kwh * 100, 1)
+        if recomputed != day['battery_filled_pct']:
+            filled_pct_fix[str(i)] = day['battery_filled_pct']
+
+    return {
+        'max_soc_delta': max_soc_delta,
+        'time_to_full_min': time_to_full_min,
+        'hourly_soc_delta': hourly_soc_delta,
+        'filled_pct_fix': filled_pct_fix,
+    }
+
+
+def expand_scenario(compact: Dict, continuous_results: List[Dict],
+                    usable_kwh: float) -> List[Dict]:
+    """
+    Rebuild full-resolution scenario daily results from a compacted scenario
+
+    Args:
+        compact: One entry of compact_data['scenario_based']
+        continuous_results: Continuous simulation daily_results
+        usable_kwh: Usable battery capacity (for battery_filled_pct)
+
+    Returns:
+        List of daily result dicts identical to the analysis output
+    """
+    if compact.get('encoding') != ENCODING:
+        return compact.get('daily_results', [])
+
+    starting_soc_kwh = compact['starting_soc_kwh']
+    fixes = compact['filled_pct_fix']
+    daily_results = []
+
+    for i, base in enumerate(continuous_results):
+        max_soc = (_centi(base['max_soc_kwh']) + compact['max_soc_delta'][i]) / 100
+        hourly_delta = compact['hourly_soc_delta'][i]
+        hourly_soc = {
+            h: (_centi(v) + hourly_delta[j]) / 100
+            for j, (h, v) in enumerate(base['hourly_soc'].items())
+        }
+
+        daily_results.append({
+            'date': base['date'],
+            'day_of_week': base['day_of_week'],
+            'total_solar_kwh': base['total_solar_kwh'],
+            'starting_soc_kwh': starting_soc_kwh,
+            'max_battery_soc_kwh': max_soc,
+            'battery_filled_pct': fixes.get(str(i), round(max_soc / usable_kwh * 100, 1)),
+            'time_to_full': _minutes_to_time(compact['time_to_full_min'][i]),
+            'hourly_soc': hourly_soc,
+        })
+
+    return daily_results
+
+
+def compact_scenario(scenario_data: Dict, continuous_results: List[Dict],
+                     usable_kwh: float) -> Dict:
+    """
+    Compact one starting-SOC scenario
+
+    Stores deltas against the continuous run when the two line up day for
+    day, and verifies the round trip; otherwise keeps the raw daily results
+    so nothing is ever lost.
+
+    Args:
+        scenario_data: Scenario entry from battery_daily_charging_enhanced.json
+        continuous_results: Continuous simulation daily_results
+        usable_kwh: Usable battery capacity
+
+    Returns:
+        Compacted scenario dict
+    """
+    daily_results = scenario_data['daily_results']
+    starting_soc_kwh = daily_results[0]['starting_soc_kwh'] if daily_results else 0
+
+    compact = {
+        'starting_soc_pct': scenario_data['starting_soc_pct'],
+        'summary': scenario_data['summary'],
+        'histograms': scenario_histograms(daily_results),
+    }
+
+    encoded = _encode(daily_results, continuous_results, starting_soc_kwh, usable_kwh)
+    if encoded is not None:
+        candidate = {**compact, 'encoding': ENCODING, 'starting_soc_kwh': starting_soc_kwh, **encoded}
+        if expand_scenario(candidate, continuous_results, usable_kwh) == daily_results:
+            return candidate
+
+    compact['encoding'] = 'raw'
+    compact['daily_results'] = daily_results
+    return compact
+
+# ============================================================================
+# LEVEL-OF-DETAIL RETRIEVAL
+# ============================================================================
+
+def _aggregate_bucket(days: List[Dict]) -> Dict:
+    """Summarise a run of days, keeping the extremes"""
+    filled = [d['battery_filled_pct'] for d in days]
+    solar = [d['total_solar_kwh'] for d in days]
+    return {
+        'start': days[0]['date'],
+        'end': days[-1]['date'],
+        'days': len(days),
+        'days_reached_full': sum(1 for d in days if d['time_to_full'] is not None),
+        'total_solar_kwh': {'min': min(solar), 'mean': round(sum(solar) / len(solar), 2), 'max': max(solar)},
+        'battery_filled_pct': {'min': min(filled), 'mean': round(sum(filled) / len(filled), 1), 'max': max(filled)},
+    }
+
+
+def get_scenario_days(compact_data: Dict, scenario_name: str,
+                      start: Optional[str] = None, end: Optional[str] = None,
+                      bucket_days: int = 7) -> Dict:
+    """
+    Level-of-detail view of a scenario
+
+    Args:
+        compact_data: Output of prepare_enhanced_data.py
+        scenario_name: Scenario key, e.g. '25%'
+        start: First date (YYYY-MM-DD) to return at full resolution
+        end: Last date (YYYY-MM-DD) to return at full resolution
+        bucket_days: Days per aggregate bucket outside the selected range
+
+    Returns:
+        Dict with 'daily_results' (full resolution inside the range) and
+        'aggregates' (bucketed summaries before/after the range)
+    """
+    continuous = compact_data['continuous_simulation']['daily_results']
+    usable_kwh = compact_data['battery_spec']['usable_kwh']
+    days = expand_scenario(compact_data['scenario_based'][scenario_name], continuous, usable_kwh)
+
+    start = start or (days[0]['date'] if days else None)
+    end = end or (days[-1]['date'] if days else None)
+
+    inside = [d for d in days if start <= d['date'] <= end]
+    before = [d for d in days if d['date'] < start]
+    after = [d for d in days if d['date'] > end]
+
+    aggregates = []
+    for segment in (before, after):
+        for i in range(0, len(segment), bucket_days):
+            aggregates.append(_aggregate_bucket(segment[i:i + bucket_days]))
+
+    return {'daily_results': inside, 'aggregates': aggregates}
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Weather-to-Solar Forecast Model
+Fits a regression from historical daily weather (radiation, cloud cover,
+sunshine, condition) against solar_daily.total_yield_kwh, refits
+incrementally as each day's data lands, and exports compact coefficients
+for the dashboard (split/solar_forecast_model.json, embedded by build.py).
+
+The model keeps ridge-regression sufficient statistics (X'X, X'y) with an
+exponential forgetting factor, so adding a day is O(p^2) and a refit is a
+tiny p x p solve - no need to revisit history.
+"""
+
+import json
+import math
+import sqlite3
+import urllib.request
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DB_PATH = Path(__file__).parent / "solar_data.db"
+STATE_PATH = Path(__file__).parent / "solar_forecast_state.json"
+EXPORT_PATH = Path(__file__).parent / "split" / "solar_forecast_model.json"
+
+# Ferryden Park, SA (same as the dashboard)
+LATITUDE = -34.8481
+LONGITUDE = 138.5597
+OPEN_METEO_ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+DAILY_VARIABLES = "weather_code,cloud_cover_mean,shortwave_radiation_sum,sunshine_duration"
+
+# Monthly clear-sky solar radiation for Adelaide (MJ/m2/day) - matches split/config.js
+ADELAIDE_CLEAR_SKY_MJ = [28.5, 25.5, 20.5, 14.5, 10.0, 8.0, 9.0, 12.5, 17.5, 22.5, 26.5, 29.0]
+
+FORGETTING_FACTOR = 0.998  # Per-day weight decay (~1 year half-life)
+RIDGE_LAMBDA = 0.5
+MIN_TRAINING_DAYS = 14
+
+# WMO weather code -> condition group (clear is the baseline)
+CONDITION_GROUPS = ['cloudy', 'fog', 'rain', 'storm']
+
+def condition_group(weather_code: Optional[int]) -> str:
+    """Group a WMO weather code into a coarse condition"""
+    if weather_code is None or weather_code <= 1:
+        return 'clear'
+    if weather_code <= 3:
+        return 'cloudy'
+    if weather_code in (45, 48):
+        return 'fog'
+    if weather_code >= 95:
+        return 'storm'
+    return 'rain'
+
+FEATURES = [
+    'intercept',
+    'radiation_mj',
+    'radiation_x_cloud',
+    'clear_sky_ratio',
+    'cloud_frac',
+    'sunshine_hours',
+] + [f'cond_{g}' for g in CONDITION_GROUPS]
+
+# ============================================================================
+# WEATHER HISTORY
+# ============================================================================
+
+def init_weather_table(db: sqlite3.Connection):
+    """Create the daily weather history table if it doesn't exist."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS weather_daily (
+            date TEXT PRIMARY KEY,
+            weather_code INTEGER,
+            cloud_cover_mean REAL,
+            shortwave_radiation_sum REAL,
+            sunshine_duration_hours REAL,
+            source TEXT,
+            updated_at TEXT
+        )
+    """)
+    db.commit()
+
+
+def fetch_weather_history(start_date: str, end_date: str) -> List[Dict]:
+    """
+    Fetch observed daily weather from the Open-Meteo archive
+
+    Args:
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD)
+
+    Returns:
+        List of day dicts in the same shape as the dashboard forecast days
+    """
+    url = (f"{OPEN_METEO_ARCHIVE_URL}?latitude={LATITUDE}&longitude={LONGITUDE}"
+           f"&start_date={start_date}&end_date={end_date}"
+           f"&daily={DAILY_VARIABLES}&timezone=Australia%2FAdelaide")
+    with urllib.request.urlopen(url, timeout=30) as response:
+        daily = json.loads(response.read().decode())['daily']
+
+    days = []
+    for i, date in enumerate(daily['time']):
+        sunshine_s = daily['sunshine_duration'][i]
+        days.append({
+            'date': date,
+            'weather_code': daily['weather_code'][i],
+            'cloud_cover_mean': daily['cloud_cover_mean'][i],
+            'shortwave_radiation_sum': daily['shortwave_radiation_sum'][i],
+            'sunshine_duration_hours': sunshine_s / 3600.0 if sunshine_s is not None else None,
+        })
+    return days
+
+
+def store_weather_days(db: sqlite3.Connection, days: List[Dict], source: str = 'open-meteo-archive'):
+    """Insert or replace daily weather rows."""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    db.executemany("""
+        INSERT OR REPLACE INTO weather_daily
+        (date, weather_code, cloud_cover_mean, shortwave_radiation_sum,
+         sunshine_duration_hours, source, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(
+        d['date'], d.get('weather_code'), d.get('cloud_cover_mean'),
+        d.get('shortwave_radiation_sum'), d.get('sunshine_duration_hours'),
+        source, now
+    ) for d in days])
+    db.commit()
+
+
+def load_training_days(db: sqlite3.Connection, after: Optional[str] = None,
+                       before: Optional[str] = None) -> List[Dict]:
+    """Weather days joined with the measured daily yield, in date order"""
+    rows = db.execute("""
+        SELECT w.date, w.weather_code, w.cloud_cover_mean, w.shortwave_radiation_sum,
+               w.sunshine_duration_hours, s.total_yield_kwh
+        FROM weather_daily w
+        JOIN solar_daily s ON s.date = w.date
+        WHERE s.total_yield_kwh IS NOT NULL
+          AND (? IS NULL OR w.date > ?)
+          AND (? IS NULL OR w.date < ?)
+        ORDER BY w.date
+    """, (after, after, before, before)).fetchall()
+
+    keys = ['date', 'weather_code', 'cloud_cover_mean', 'shortwave_radiation_sum',
+            'sunshine_duration_hours', 'total_yield_kwh']
+    return [dict(zip(keys, row)) for row in rows]
+
+# ============================================================================
+# MODEL
+# ============================================================================
+
+def _solve(a: List[List[float]], b: List[float]) -> List[float]:
+    """Solve a small dense linear system (Gaussian elimination, partial pivoting)"""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        m[col], m[pivot] = m[pivot], m[col]
+        if abs(m[col][col]) < 1e-12:
+            continue
+        for r in range(col + 1, n):
+            factor = m[r][col] / m[col][col]
+            if factor:
+                for c in range(col, n + 1):
+                    m[r][c] -= factor * m[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        if abs(m[r][r]) < 1e-12:
+            continue
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+
+class SolarForecastModel:
+    """Incrementally updated ridge regression of daily yield on weather"""
+
+    def __init__(self):
+        p = len(FEATURES)
+        self.xtx = [[0.0] * p for _ in range(p)]
+        self.xty = [0.0] * p
+        self.feature_sums = [0.0] * p
+        self.weight = 0.0
+        self.sse = 0.0
+        self.n_days = 0
+        self.last_date = None
+        self.coef = [0.0] * p
+
+    # -- Features ------------------------------------------------------------
+
+    def _mean(self, name: str, fallback: float) -> float:
+        if self.weight <= 0:
+            return fallback
+        return self.feature_sums[FEATURES.index(name)] / self.weight
+
+    def features(self, day: Dict) -> List[float]:
+        """
+        Feature vector for one day (missing values fall back to training means)
+
+        Args:
+            day: Dict with date and Open-Meteo style daily weather fields
+        """
+        month = int(day['date'][5:7]) - 1
+        clear_sky = ADELAIDE_CLEAR_SKY_MJ[month]
+
+        radiation = day.get('shortwave_radiation_sum')
+        if radiation is None:
+            radiation = self._mean('radiation_mj', clear_sky * 0.7)
+        cloud = day.get('cloud_cover_mean')
+        cloud_frac = cloud / 100.0 if cloud is not None else self._mean('cloud_frac', 0.4)
+        sunshine = day.get('sunshine_duration_hours')
+        if sunshine is None:
+            sunshine = self._mean('sunshine_hours', 8.0)
+
+        group = condition_group(day.get('weather_code'))
+        return [
+            1.0,
+            radiation,
+            radiation * cloud_frac,
+            min(radiation / clear_sky, 1.2),
+            cloud_frac,
+            sunshine,
+        ] + [1.0 if group == g else 0.0 for g in CONDITION_GROUPS]
+
+    # -- Training ------------------------------------------------------------
+
+    def update(self, day: Dict, actual_kwh: float):
+        """Add one observed day (with exponential forgetting of older days)"""
+        x = self.features(day)
+
+        # One-step-ahead residual, before this day is learned
+        if self.n_days >= MIN_TRAINING_DAYS:
+            self.fit()
+            err = actual_kwh - self.predict_features(x)
+            self.sse = self.sse * FORGETTING_FACTOR + err * err
+
+        p = len(x)
+        for i in range(p):
+            xi = x[i]
+            row = self.xtx[i]
+            for j in range(p):
+                row[j] = row[j] * FORGETTING_FACTOR + xi * x[j]
+            self.xty[i] = self.xty[i] * FORGETTING_FACTOR + xi * actual_kwh
+            self.feature_sums[i] = self.feature_sums[i] * FORGETTING_FACTOR + xi
+        self.weight = self.weight * FORGETTING_FACTOR + 1.0
+        self.n_days += 1
+        self.last_date = day['date']
+
+    def fit(self) -> List[float]:
+        """Solve the ridge normal equations (intercept not penalised)"""
+        a = [row[:] for row in self.xtx]
+        for i in range(1, len(a)):
+            a[i][i] += RIDGE_LAMBDA
+        self.coef = _solve(a, self.xty)
+        return self.coef
+
+    # -- Prediction ----------------------------------------------------------
+
+    def predict_features(self, x: List[float]) -> float:
+        return max(0.0, sum(c * v for c, v in zip(self.coef, x)))
+
+    def predict(self, day: Dict) -> float:
+        """Predicted daily yield (kWh) for a forecast day"""
+        return round(self.predict_features(self.features(day)), 1)
+
+    @property
+    def rmse(self) -> Optional[float]:
+        effective = self.n_days - MIN_TRAINING_DAYS
+        if effective <= 0 or self.weight <= 0:
+            return None
+        # sse is forgetting-weighted like weight, so normalise by the same decay
+        decayed_count = (1 - FORGETTING_FACTOR ** effective) / (1 - FORGETTING_FACTOR)
+        return math.sqrt(self.sse / decayed_count)
+
+    # -- Persistence ---------------------------------------------------------
+
+    def to_dict(self) -> Dict:
+        return {
+            'features': FEATURES,
+            'xtx': self.xtx,
+            'xty': self.xty,
+            'feature_sums': self.feature_sums,
+            'weight': self.weight,
+            'sse': self.sse,
+            'n_days': self.n_days,
+            'last_date': self.last_date,
+            'coef': self.coef,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SolarForecastModel':
+        model = cls()
+        if data.get('features') != FEATURES:
+            return model  # Feature set changed - retrain from scratch
+        for key in ['xtx', 'xty', 'feature_sums', 'weight', 'sse', 'n_days', 'last_date', 'coef']:
+            setattr(model, key, data[key])
+        return model
+
+    def export(self) -> Dict:
+        """Compact coefficients for the dashboard"""
+        means = [s / self.weight if self.weight else 0.0 for s in self.feature_sums]
+        return {
+            'features': FEATURES,
+            'coef': [round(c, 5) for c in self.coef],
+            'feature_means': {
+                'radiation_mj': round(means[FEATURES.index('radiation_mj')], 3),
+                'cloud_frac': round(means[FEATURES.index('cloud_frac')], 3),
+                'sunshine_hours': round(means[FEATURES.index('sunshine_hours')], 3),
+            },
+            'clear_sky_mj': ADELAIDE_CLEAR_SKY_MJ,
+            'training_days': self.n_days,
+            'last_date': self.last_date,
+            'rmse_kwh': round(self.rmse, 2) if self.rmse is not None else None,
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+
+def load_model(path: Path = STATE_PATH) -> SolarForecastModel:
+    if path.exists():
+        with open(path, 'r') as f:
+            return SolarForecastModel.from_dict(json.load(f))
+    return SolarForecastModel()
+
+
+def save_model(model: SolarForecastModel, path: Path = STATE_PATH):
+    with open(path, 'w') as f:
+        json.dump(model.to_dict(), f)
+
+
+def export_coefficients(model: SolarForecastModel, path: Path = EXPORT_PATH):
+    with open(path, 'w') as f:
+        json.dump(model.export(), f, indent=2)
+
+# ============================================================================
+# INCREMENTAL REFIT
+# ============================================================================
+
+def refit(db_path: Path = DB_PATH, state_path: Path = STATE_PATH,
+          export_path: Path = EXPORT_PATH, backfill_days: int = 400) -> Tuple[SolarForecastModel, int]:
+    """
+    Learn every completed day not yet seen by the model, then refit and export
+
+    Missing weather history (up to yesterday) is backfilled from the
+    Open-Meteo archive first. Today is never learned - its yield is partial.
+    """
+    model = load_model(state_path)
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    db = sqlite3.connect(db_path)
+    init_weather_table(db)
+
+    # Backfill weather for days we have yield data but no weather
+    missing = db.execute("""
+        SELECT MIN(s.date), MAX(s.date) FROM solar_daily s
+        LEFT JOIN weather_daily w ON w.date = s.date
+        WHERE w.date IS NULL AND s.date < ? AND s.date >= ?
+    """, (today, (datetime.now() - timedelta(days=backfill_days)).strftime('%Y-%m-%d'))).fetchone()
+    if missing and missing[0]:
+        try:
+            store_weather_days(db, fetch_weather_history(missing[0], missing[1]))
+        except Exception as e:
+            print(f"Weather backfill failed: {e}")
+
+    new_days = load_training_days(db, after=model.last_date, before=today)
+    db.close()
+
+    for day in new_days:
+        model.update(day, day['total_yield_kwh'])
+    if model.n_days >= MIN_TRAINING_DAYS:
+        model.fit()
+
+    save_model(model, state_path)
+    if model.n_days >= MIN_TRAINING_DAYS:
+        export_coefficients(model, export_path)
+
+    return model, len(new_days)
+
+
+def main():
+    print("=" * 80)
+    print("Weather-to-Solar Forecast Model")
+    print("=" * 80)
+    print()
+
+    model, added = refit()
+    print(f"Learned {added} new days ({model.n_days} total, last: {model.last_date})")
+
+    if model.n_days < MIN_TRAINING_DAYS:
+        print(f"Need at least {MIN_TRAINING_DAYS} days of weather + yield data to fit")
+        return
+
+    print()
+    print("Coefficients:")
+    for name, c in zip(FEATURES, model.coef):
+        print(f"  {name:<20} {c:>10.4f}")
+    if model.rmse is not None:
+        print(f"\nOne-step-ahead RMSE: {model.rmse:.2f} kWh")
+    print(f"\nCoefficients exported to {EXPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Intraday Solar Nowcasting
+Combines today's partial power curve with the day's forecast radiation
+profile to update expected remaining kWh, battery time-to-full and the
+overnight grid top-up needed - on every collector poll.
+
+The battery is modelled net of the household: it charges from PV surplus
+over the measured load (inverter output less feed-in) and discharges
+against the shortfall as it happens, so the SOC carried to the next day is
+what the battery would really hold.
+
+Each reading is O(1): observed energy and the forecast energy over the same
+observed intervals are kept as running sums, and the forecast profile is
+pre-integrated into hourly prefix sums so any time-of-day lookup is constant.
+"""
+
+import logging
+import math
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from battery_spec import BATTERY_CHARGE_RATE_KW, BATTERY_DISCHARGE_RATE_KW, BATTERY_USABLE_KWH
+
+log = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Battery size and rates come from battery_spec; charging goes through the
+# inverter (split/config.js inverterEfficiency)
+BATTERY_EFFICIENCY = 0.975
+FULL_THRESHOLD = 0.95
+
+SYSTEM_KW = 5.0
+PERFORMANCE_RATIO = 0.82  # Inverter, wiring, temperature, soiling losses
+
+# Shrink the observed/forecast ratio towards 1.0 until this much energy has
+# been seen, so a single cloudy 7am reading doesn't swing the whole day
+PRIOR_KWH = 1.5
+MAX_READING_GAP_S = 20 * 60  # Don't integrate across collector outages
+
+# The forecast never holds up a poll: only cached data is used, and a
+# nowcaster built without it retries (from the cache) this often
+FORECAST_RETRY_S = 30 * 60
+
+# Monthly peak sun hours for Adelaide (kWh/m2/day) - matches split/config.js
+ADELAIDE_PEAK_SUN_HOURS = [7.2, 6.4, 5.1, 3.6, 2.5, 2.0, 2.2, 3.1, 4.4, 5.6, 6.6, 7.3]
+# Approximate daylight window (sunrise, sunset hour) by month
+ADELAIDE_DAYLIGHT = [(6.2, 20.4), (6.7, 20.1), (7.1, 19.5), (6.6, 17.9), (7.0, 17.3), (7.3, 17.1),
+                     (7.3, 17.3), (6.9, 17.7), (6.3, 18.1), (6.6, 19.6), (6.0, 20.1), (5.9, 20.4)]
+
+# ============================================================================
+# FORECAST PROFILE
+# ============================================================================
+
+def clear_sky_profile(month: int) -> List[float]:
+    """Fallback hourly radiation profile (W/m2) - half-sine over daylight"""
+    sunrise, sunset = ADELAIDE_DAYLIGHT[month - 1]
+    length = sunset - sunrise
+    daily_wh = ADELAIDE_PEAK_SUN_HOURS[month - 1] * 1000
+    peak = daily_wh * math.pi / (2 * length)
+
+    profile = []
+    for h in range(24):
+        # Average of the half-sine over [h, h+1)
+        a, b = max(h, sunrise), min(h + 1, sunset)
+        if b <= a:
+            profile.append(0.0)
+            continue
+        x0, x1 = (a - sunrise) / length * math.pi, (b - sunrise) / length * math.pi
+        profile.append(peak * length / math.pi * (math.cos(x0) - math.cos(x1)))
+    return profile
+
+
+def profile_from_open_meteo(hourly_times: List[str], hourly_radiation: List[float], date: str) -> List[float]:
+    """
+    Hourly W/m2 profile for one date from Open-Meteo hourly data
+
+    Open-Meteo's shortwave_radiation is the mean over the preceding hour,
+    so the value stamped (h+1):00 covers [h, h+1).
+    """
+    by_time = dict(zip(hourly_times, hourly_radiation))
+    profile = []
+    for h in range(24):
+        stamp = f"{date}T{h + 1:02d}:00" if h < 23 else None
+        profile.append(by_time.get(stamp) or 0.0)
+    return profile
+
+# ============================================================================
+# BATTERY
+# ============================================================================
+
+def reading_load_w(grid_power: Optional[float], feed_in_power: Optional[float]) -> Optional[float]:
+    """Household load (W) from a reading: inverter output less feed-in (imports are negative feed-in)"""
+    if grid_power is None or feed_in_power is None:
+        return None
+    return max(grid_power - feed_in_power, 0.0)
+
+
+def battery_step(soc_kwh: float, net_kwh: float, hours: float, usable_kwh: float = BATTERY_USABLE_KWH,
+                 charge_rate_kw: float = BATTERY_CHARGE_RATE_KW,
+                 discharge_rate_kw: float = BATTERY_DISCHARGE_RATE_KW,
+                 efficiency: float = BATTERY_EFFICIENCY) -> float:
+    """
+    SOC after an interval with net_kwh of PV over load (negative: a shortfall
+    the battery covers), limited by the charge/discharge rates and capacity
+    """
+    if net_kwh >= 0:
+        soc_kwh += min(net_kwh, charge_rate_kw * hours) * efficiency
+    else:
+        soc_kwh -= min(-net_kwh, discharge_rate_kw * hours)
+    return min(max(soc_kwh, 0.0), usable_kwh)
+
+# ============================================================================
+# NOWCASTER
+# ============================================================================
+
+class SolarNowcaster:
+    """
+    Running nowcast for one day
+
+    Args:
+        date: Day being nowcast (YYYY-MM-DD)
+        radiation_profile: 24 hourly mean W/m2 values (None: clear-sky shape)
+        predicted_kwh: Day-ahead yield forecast used to scale the profile
+            (None: scale by system size and performance ratio)
+        start_soc_kwh: Battery state of charge at the start of the day
+
+    Readings without a load measurement use the average load seen so far
+    (zero before any is seen, i.e. charging from gross PV).
+    """
+
+    def __init__(self, date: str, radiation_profile: Optional[List[float]] = None,
+                 predicted_kwh: Optional[float] = None, start_soc_kwh: float = 0.0,
+                 usable_kwh: float = BATTERY_USABLE_KWH, charge_rate_kw: float = BATTERY_CHARGE_RATE_KW,
+                 discharge_rate_kw: float = BATTERY_DISCHARGE_RATE_KW, efficiency: float = BATTERY_EFFICIENCY,
+                 system_kw: float = SYSTEM_KW):
+        self.date = date
+        self.profile = radiation_profile or clear_sky_profile(int(date[5:7]))
+        self.usable_kwh = usable_kwh
+        self.charge_rate_kw = charge_rate_kw
+        self.discharge_rate_kw = discharge_rate_kw
+        self.efficiency = efficiency
+
+        # Hourly prefix sums of forecast radiation (Wh/m2)
+        self.prefix = [0.0]
+        for w in self.profile:
+            self.prefix.append(self.prefix[-1] + w)
+
+        # kWh of our generation per Wh/m2 of forecast radiation
+        total_wh = self.prefix[-1]
+        if predicted_kwh is not None and total_wh > 0:
+            self.kwh_per_wh = predicted_kwh / total_wh
+        else:
+            self.kwh_per_wh = system_kw * PERFORMANCE_RATIO / 1000.0
+
+        # Running sums
+        self.observed_kwh = 0.0           # Integrated generation so far
+        self.forecast_observed_kwh = 0.0  # Forecast energy over the same intervals
+        self.gap_forecast_kwh = 0.0       # Forecast energy over unobserved gaps
+        self.load_kwh = 0.0               # Measured household load...
+        self.load_hours = 0.0             # ...and the time it was measured over
+        self.soc_kwh = min(start_soc_kwh, usable_kwh)
+        self.max_soc_kwh = self.soc_kwh
+        self.time_to_full = '00:00' if self.soc_kwh >= usable_kwh * FULL_THRESHOLD else None
+        self.has_forecast = radiation_profile is not None
+        self.built_at = time.time()
+        self.readings = 0
+        self._last_ts = None
+        self._last_power_w = None
+        self._last_load_w = None
+
+    # -- Profile lookups (O(1)) ---------------------------------------------
+
+    def _cumulative_kwh(self, hour: float) -> float:
+        """Forecast kWh from midnight to a fractional hour of the day"""
+        hour = min(max(hour, 0.0), 24.0)
+        h = int(hour)
+        partial = self.profile[h] * (hour - h) if h < 24 else 0.0
+        return (self.prefix[h] + partial) * self.kwh_per_wh
+
+    @staticmethod
+    def _hour_of(ts: datetime) -> float:
+        return ts.hour + ts.minute / 60.0 + ts.second / 3600.0
+
+    # -- Updates -------------------------------------------------------------
+
+    def update(self, ts: datetime, power_w: float, load_w: Optional[float] = None) -> Dict:
+        """Feed one reading (timestamp, total PV power, household load) and return the nowcast"""
+        power_w = max(power_w or 0.0, 0.0)
+
+        if self._last_ts is not None:
+            dt_s = (ts - self._last_ts).total_seconds()
+            if dt_s > 0:
+                h0, h1 = self._hour_of(self._last_ts), self._hour_of(ts)
+                forecast_kwh = self._cumulative_kwh(h1) - self._cumulative_kwh(h0)
+
+                dt_h = dt_s / 3600.0
+                if dt_s <= MAX_READING_GAP_S:
+                    # Trapezoid over the true interval
+                    energy_kwh = (self._last_power_w + power_w) / 2 * dt_h / 1000.0
+                    self.observed_kwh += energy_kwh
+                    self.forecast_observed_kwh += forecast_kwh
+
+                    if load_w is not None and self._last_load_w is not None:
+                        load_kwh = (self._last_load_w + load_w) / 2 * dt_h / 1000.0
+                        self.load_kwh += load_kwh
+                        self.load_hours += dt_h
+                    else:
+                        load_kwh = self.load_kw * dt_h
+                    self._battery(energy_kwh - load_kwh, dt_h, ts)
+                else:
+                    # Outage: estimate the missing span from the forecast and average load
+                    self.gap_forecast_kwh += forecast_kwh
+                    self._battery(forecast_kwh * self.ratio - self.load_kw * dt_h, dt_h, ts)
+
+        self._last_ts = ts
+        self._last_power_w = power_w
+        self._last_load_w = load_w
+        self.readings += 1
+        return self.nowcast(ts)
+
+    def _battery(self, net_kwh: float, hours: float, ts: datetime):
+        self.soc_kwh = battery_step(self.soc_kwh, net_kwh, hours, self.usable_kwh, self.charge_rate_kw,
+                                    self.discharge_rate_kw, self.efficiency)
+        self.max_soc_kwh = max(self.max_soc_kwh, self.soc_kwh)
+        if self.time_to_full is None and self.soc_kwh >= self.usable_kwh * FULL_THRESHOLD:
+            self.time_to_full = ts.strftime('%H:%M')
+
+    @property
+    def load_kw(self) -> float:
+        """Average measured household load so far"""
+        return self.load_kwh / self.load_hours if self.load_hours > 0 else 0.0
+
+    @property
+    def ratio(self) -> float:
+        """Observed / forecast generation, shrunk towards 1.0 early in the day"""
+        return (self.observed_kwh + PRIOR_KWH) / (self.forecast_observed_kwh + PRIOR_KWH)
+
+    # -- Projection ----------------------------------------------------------
+
+    def _project(self, hour: float, ratio: float):
+        """
+        Walk the remaining forecast hours against the average load:
+        (projected max SOC, time-to-full)
+        """
+        soc = max_soc = self.soc_kwh
+        target = self.usable_kwh * FULL_THRESHOLD
+        time_to_full = self.time_to_full
+        load_kw = self.load_kw
+
+        h = hour
+        while h < 24:
+            end = min(int(h) + 1, 24)
+            power_kw = self.profile[int(h)] * self.kwh_per_wh * ratio  # kWh per hour == kW
+            net_kw = power_kw - load_kw
+            new_soc = battery_step(soc, net_kw * (end - h), end - h, self.usable_kwh, self.charge_rate_kw,
+                                   self.discharge_rate_kw, self.efficiency)
+            if time_to_full is None and new_soc >= target > soc:
+                rate = min(net_kw, self.charge_rate_kw) * self.efficiency
+                t = h + (target - soc) / rate
+                time_to_full = f"{int(t):02d}:{int(round((t % 1) * 60)) % 60:02d}"
+            soc = new_soc
+            max_soc = max(max_soc, soc)
+            h = end
+        return max(max_soc, self.max_soc_kwh), time_to_full
+
+    def nowcast(self, ts: datetime, topup_target_pct: float = 100.0) -> Dict:
+        """
+        Current nowcast
+
+        Args:
+            ts: Time of the nowcast
+            topup_target_pct: SOC (% of usable) wanted by the evening peak
+
+        Returns:
+            Dict with observed/remaining/expected kWh, projected SOC,
+            time-to-full and the off-peak grid top-up needed tonight
+        """
+        hour = self._hour_of(ts)
+        ratio = self.ratio
+        remaining_kwh = (self._cumulative_kwh(24) - self._cumulative_kwh(hour)) * ratio
+        projected_max_soc, time_to_full = self._project(hour, ratio)
+        topup_kwh = max(0.0, self.usable_kwh * topup_target_pct / 100.0 - projected_max_soc)
+
+        return {
+            'date': self.date,
+            'updated_at': ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'observed_kwh': round(self.observed_kwh, 2),
+            'gap_estimate_kwh': round(self.gap_forecast_kwh * ratio, 2),
+            'remaining_kwh': round(remaining_kwh, 2),
+            'expected_total_kwh': round(self.observed_kwh + self.gap_forecast_kwh * ratio + remaining_kwh, 2),
+            'forecast_total_kwh': round(self._cumulative_kwh(24), 2),
+            'performance_ratio': round(ratio, 3),
+            'soc_kwh': round(self.soc_kwh, 2),
+            'projected_max_soc_kwh': round(projected_max_soc, 2),
+            'time_to_full': time_to_full,
+            'topup_needed_kwh': round(topup_kwh, 2),
+            'readings': self.readings,
+        }
+
+# ============================================================================
+# PERSISTENCE
+# ============================================================================
+
+NOWCAST_COLUMNS = ['date', 'updated_at', 'observed_kwh', 'gap_estimate_kwh', 'remaining_kwh',
+                   'expected_total_kwh', 'forecast_total_kwh', 'performance_ratio', 'soc_kwh',
+                   'projected_max_soc_kwh', 'time_to_full', 'topup_needed_kwh', 'readings']
+
+def init_nowcast_table(db: sqlite3.Connection):
+    """Create the nowcast table (latest nowcast per day) if it doesn't exist."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS solar_nowcast (
+            date TEXT PRIMARY KEY,
+            updated_at TEXT,
+            observed_kwh REAL,
+            gap_estimate_kwh REAL,
+            remaining_kwh REAL,
+            expected_total_kwh REAL,
+            forecast_total_kwh REAL,
+            performance_ratio REAL,
+            soc_kwh REAL,
+            projected_max_soc_kwh REAL,
+            time_to_full TEXT,
+            topup_needed_kwh REAL,
+            readings INTEGER
+        )
+    """)
+    db.commit()
+
+
+def store_nowcast(db: sqlite3.Connection, nowcast: Dict):
+    db.execute(f"""
+        INSERT OR REPLACE INTO solar_nowcast ({', '.join(NOWCAST_COLUMNS)})
+        VALUES ({', '.join('?' for _ in NOWCAST_COLUMNS)})
+    """, [nowcast[c] for c in NOWCAST_COLUMNS])
+    db.commit()
+
+
+def start_soc(db: sqlite3.Connection, date: str) -> Tuple[float, bool]:
+    """
+    Battery SOC at the start of a date: the last net nowcast SOC stored
+    before it, carried through any readings recorded after that nowcast (a
+    collector that stopped nowcasting) with the same PV-minus-load flows.
+    (0.0, False) without history.
+    """
+    row = db.execute("""
+        SELECT soc_kwh, updated_at FROM solar_nowcast
+        WHERE date < ? ORDER BY date DESC LIMIT 1
+    """, (date,)).fetchone()
+    if row is None or row[0] is None:
+        return 0.0, False
+    soc_kwh, since = row
+
+    rows = db.execute("""
+        SELECT timestamp, total_pv_power, grid_power, feed_in_power FROM solar_readings
+        WHERE timestamp > ? AND timestamp < ?
+        ORDER BY timestamp
+    """, (since, date)).fetchall()
+    last = datetime.strptime(since, '%Y-%m-%d %H:%M:%S')
+    for stamp, power, grid, feed_in in rows:
+        ts = datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S')
+        dt_h = min((ts - last).total_seconds(), MAX_READING_GAP_S) / 3600.0
+        load_w = reading_load_w(grid, feed_in) or 0.0
+        soc_kwh = battery_step(soc_kwh, (max(power or 0.0, 0.0) - load_w) / 1000.0 * dt_h, dt_h)
+        last = ts
+    return soc_kwh, True
+
+
+def build_nowcaster(date: str, db: Optional[sqlite3.Connection] = None) -> SolarNowcaster:
+    """
+    Nowcaster for a date, using the cached Open-Meteo hourly radiation when
+    available (clear-sky shape otherwise), starting from the carried-over
+    battery SOC and replaying any readings already stored for that date so
+    a collector restart doesn't lose the day
+
+    The weather cache is asked without waiting: on a miss it starts its own
+    background fetch and the clear-sky shape is used until a later rebuild.
+    """
+    profile = None
+    predicted_kwh = None
+    try:
+        from weather_cache import get_weather_cache
+        data, _ = get_weather_cache().get('open_meteo', timeout=0)
+        hourly = data.get('hourly') or {}
+        if hourly.get('time'):
+            profile = profile_from_open_meteo(hourly['time'], hourly['shortwave_radiation'], date)
+            if not any(profile):
+                profile = None
+
+        # Scale the profile by our own fitted day-ahead model when it's trained
+        from solar_forecast_model import MIN_TRAINING_DAYS, load_model
+        model = load_model()
+        day = next((d for d in data.get('forecast_days', []) if d['date'] == date), None)
+        if profile and day and model.n_days >= MIN_TRAINING_DAYS:
+            predicted_kwh = model.predict(day)
+    except Exception as e:
+        log.warning(f"Nowcast forecast unavailable, using clear-sky profile: {e}")
+        profile = None
+
+    soc_kwh, known = start_soc(db, date) if db is not None else (0.0, False)
+    if not known:
+        log.info(f"No earlier nowcast to carry battery SOC from; {date} starts from empty")
+    nowcaster = SolarNowcaster(date, profile, predicted_kwh, start_soc_kwh=soc_kwh)
+
+    if db is not None:
+        rows = db.execute("""
+            SELECT timestamp, total_pv_power, grid_power, feed_in_power FROM solar_readings
+            WHERE substr(timestamp, 1, 10) = ?
+            ORDER BY timestamp
+        """, (date,)).fetchall()
+        for stamp, power, grid, feed_in in rows:
+            nowcaster.update(datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S'), power or 0.0,
+                             reading_load_w(grid, feed_in))
+
+    return nowcaster
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Solar Pipeline
+One entry point for the analysis scripts, run as a DAG of stages:
+
+    csv_files -> readings -> labelled -> consumption -> simulated_* -> costs -> roi_results
+                 readings -> roi_v2_results, daily_charging -> daily_results_js,
+                             daily_enhanced -> enhanced_compact
+
+Each stage runs at most once per invocation. Intermediate results are also
+pickled under PIPELINE_CACHE_DIR, keyed by a hash of the stage's source
+files, its config and its inputs' keys, so a later run reuses everything
+upstream of what changed. Export stages record their key in a manifest and
+are skipped while their files exist and the key matches.
+
+Run from the directory the outputs should be written to:
+    python3 solar_pipeline.py                           # every output (nightly refresh)
+    python3 solar_pipeline.py roi_results daily_charging
+    python3 solar_pipeline.py --list                    # stages and whether they're current
+    python3 solar_pipeline.py --force                   # ignore cached results
+    python3 solar_pipeline.py --profile                 # stage timings (see stage_profiler)
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+import runpy
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import battery_daily_analysis as daily
+import battery_daily_analysis_enhanced as enhanced
+import battery_roi_analysis as roi
+import battery_roi_analysis_v2 as roi_v2
+import gap_filling
+import load_disaggregation
+from stage_profiler import print_report, setup_from_argv, stage
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DATA_DIR = Path(__file__).parent
+CACHE_DIR = Path(os.getenv('PIPELINE_CACHE_DIR', DATA_DIR / '.pipeline_cache'))
+MANIFEST_FILE = 'manifest.json'
+CSV_PATTERN = 'C03AEC7B*.csv'
+
+# ============================================================================
+# STAGE REGISTRY
+# ============================================================================
+
+class Stage:
+    """
+    One pipeline step: fn(*dependency values) -> value
+
+    Args:
+        deps: Stages whose values are passed to fn, in order
+        sources: Files whose contents are part of the cache key (the code the stage runs)
+        config: Callable returning JSON-able settings that are part of the key
+        outputs: Files an export stage writes (its value isn't kept)
+        persist: Pickle the value to the disk cache
+    """
+
+    def __init__(self, name: str, fn: Callable, deps: Sequence[str] = (), sources: Sequence[str] = (),
+                 config: Callable[[], Any] = None, outputs: Sequence[str] = (), persist: bool = True):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.sources = tuple(sources)
+        self.config = config
+        self.outputs = tuple(outputs)
+        self.persist = persist and not outputs
+
+
+STAGES: Dict[str, Stage] = {}
+
+
+def step(name: str, **kwargs):
+    """Register a function as a pipeline stage"""
+    def register(fn: Callable) -> Callable:
+        STAGES[name] = Stage(name, fn, **kwargs)
+        return fn
+    return register
+
+
+def exports() -> List[str]:
+    return [name for name, s in STAGES.items() if s.outputs]
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+def _csv_fingerprint():
+    return [(Path(p).name, os.path.getsize(p), os.path.getmtime(p))
+            for p in sorted(glob.glob(str(DATA_DIR / CSV_PATTERN)))]
+
+
+def _gap_config():
+    return {'interpolate_max': gap_filling.INTERPOLATE_MAX_SLOTS, 'fill_max': gap_filling.FILL_MAX_SLOTS}
+
+
+def _consumption_config():
+    # Collector readings fill intervals the CSV meter data misses, so they're an input too
+    db = load_disaggregation.COLLECTOR_DB
+    return {'convention': load_disaggregation.METER_CONVENTION, 'bills': roi.MONTHLY_BILLS,
+            'collector_db': (db.stat().st_size, db.stat().st_mtime) if db.exists() else None}
+
+
+@step('csv_files', config=_csv_fingerprint, persist=False)
+def csv_files():
+    return sorted(DATA_DIR.glob(CSV_PATTERN))
+
+
+@step('readings', deps=['csv_files'], sources=['battery_roi_analysis.py', 'gap_filling.py'], config=_gap_config)
+def readings(files):
+    if not files:
+        raise FileNotFoundError(f"No {CSV_PATTERN} files in {DATA_DIR}")
+    return roi.load_solar_data(files)
+
+
+@step('labelled', deps=['readings'], sources=['battery_roi_analysis.py'])
+def labelled(solar_df):
+    return roi.categorize_by_rate_period(solar_df)
+
+
+@step('consumption', deps=['labelled'], sources=['battery_roi_analysis.py', 'load_disaggregation.py'],
+      config=_consumption_config)
+def consumption(solar_df):
+    return roi.estimate_consumption(solar_df, roi.MONTHLY_BILLS)
+
+
+@step('simulated_no_sharer', deps=['consumption'], sources=['battery_roi_analysis.py'])
+def simulated_no_sharer(solar_df):
+    return roi.simulate_battery(solar_df.copy(), enable_solar_sharer=False)
+
+
+@step('simulated_with_sharer', deps=['consumption'], sources=['battery_roi_analysis.py'])
+def simulated_with_sharer(solar_df):
+    return roi.simulate_battery(solar_df.copy(), enable_solar_sharer=True)
+
+
+@step('costs', deps=['simulated_no_sharer', 'simulated_with_sharer'], sources=['battery_roi_analysis.py'])
+def costs(df_no_sharer, df_with_sharer):
+    return {'no_sharer': roi.calculate_costs(df_no_sharer), 'with_sharer': roi.calculate_costs(df_with_sharer)}
+
+
+@step('roi_results', deps=['consumption', 'costs'], sources=['battery_roi_analysis.py'],
+      outputs=['battery_roi_results.json'])
+def roi_results(solar_df, scenario_costs):
+    results = roi.build_results(solar_df, scenario_costs['no_sharer'], scenario_costs['with_sharer'])
+    with open('battery_roi_results.json', 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+@step('roi_v2_results', deps=['readings'], sources=['battery_roi_analysis_v2.py', 'load_disaggregation.py'],
+      outputs=['battery_roi_results_v2.json'])
+def roi_v2_results(solar_df):
+    roi_v2.main(solar_df[['Power Now (W)', 'Feed In Power (W)']].copy())
+
+
+@step('daily_charging', deps=['readings'], sources=['battery_daily_analysis.py', 'result_stream.py'],
+      outputs=['battery_daily_charging.ndjson', 'battery_daily_charging.json'])
+def daily_charging(solar_df):
+    daily.main(solar_df[['Power Now (W)']].copy())
+
+
+@step('daily_enhanced', deps=['readings'], sources=['battery_daily_analysis_enhanced.py', 'result_stream.py'],
+      outputs=['battery_daily_charging_enhanced.ndjson', 'battery_daily_charging_enhanced.json'])
+def daily_enhanced(solar_df):
+    enhanced.main(solar_df[['Power Now (W)']].copy())
+
+
+@step('daily_results_js', deps=['daily_charging'], sources=['extract_daily_data.py'],
+      outputs=['daily_results_js.txt'])
+def daily_results_js(_):
+    runpy.run_path(str(DATA_DIR / 'extract_daily_data.py'), run_name='__main__')
+
+
+@step('enhanced_compact', deps=['daily_enhanced'], sources=['prepare_enhanced_data.py', 'scenario_compaction.py'],
+      outputs=['battery_daily_charging_enhanced_compact.json'])
+def enhanced_compact(_):
+    runpy.run_path(str(DATA_DIR / 'prepare_enhanced_data.py'), run_name='__main__')
+
+# ============================================================================
+# EXECUTION
+# ============================================================================
+
+@lru_cache(maxsize=None)
+def _source_hash(name: str) -> str:
+    return hashlib.sha256((DATA_DIR / name).read_bytes()).hexdigest()
+
+
+class Pipeline:
+    """Resolves stages on demand: in-process memo, then disk cache, then compute"""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, force: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.force = force
+        self.values: Dict[str, Any] = {}
+        self.status: Dict[str, str] = {}
+        self._keys: Dict[str, str] = {}
+        self._manifest_path = self.cache_dir / MANIFEST_FILE
+        try:
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def key(self, name: str) -> str:
+        """Hash of the stage's code, config and input keys"""
+        if name not in self._keys:
+            s = STAGES[name]
+            parts = {
+                'stage': name,
+                'sources': [_source_hash(src) for src in s.sources],
+                'config': s.config() if s.config else None,
+                'deps': [self.key(d) for d in s.deps],
+            }
+            self._keys[name] = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return self._keys[name]
+
+    def _pickle_path(self, name: str) -> Path:
+        return self.cache_dir / f"{name}-{self.key(name)}.pkl"
+
+    def is_current(self, name: str) -> bool:
+        s = STAGES[name]
+        if s.outputs:
+            return (self.manifest.get(name) == self.key(name)
+                    and all(Path(o).exists() for o in s.outputs))
+        return s.persist and self._pickle_path(name).exists()
+
+    def get(self, name: str) -> Any:
+        if name in self.values:
+            return self.values[name]
+        s = STAGES[name]
+
+        if not self.force and self.is_current(name):
+            if s.outputs:
+                self.status[name] = 'up to date'
+                self.values[name] = None
+                return None
+            with open(self._pickle_path(name), 'rb') as f:
+                self.values[name] = pickle.load(f)
+            self.status[name] = 'disk cache'
+            return self.values[name]
+
+        args = [self.get(d) for d in s.deps]
+        log.info(f"Running {name}")
+        with stage(name):
+            value = s.fn(*args)
+        self.status[name] = 'ran'
+
+        if s.persist:
+            self._store(name, value)
+        if s.outputs:
+            self.manifest[name] = self.key(name)
+            self._save_manifest()
+            value = None
+        self.values[name] = value
+        return value
+
+    def _store(self, name: str, value: Any):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._pickle_path(name)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        # Only the latest result of each stage is kept
+        for old in self.cache_dir.glob(f"{name}-*.pkl"):
+            if old != path:
+                old.unlink()
+
+    def _save_manifest(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self._manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    def run(self, targets: Sequence[str]) -> Dict[str, str]:
+        for target in targets:
+            self.get(target)
+        return self.status
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> int:
+    setup_from_argv()
+    flags = [a for a in sys.argv[1:] if a.startswith('--')]
+    targets = [a for a in sys.argv[1:] if not a.startswith('--')] or exports()
+    unknown = [t for t in targets if t not in STAGES]
+    if unknown:
+        print(f"Unknown stage(s): {', '.join(unknown)}. Stages: {', '.join(STAGES)}")
+        return 2
+
+    pipeline = Pipeline(force='--force' in flags)
+
+    if '--list' in flags:
+        for name, s in STAGES.items():
+            kind = f"-> {', '.join(s.outputs)}" if s.outputs else ('cached' if s.persist else '')
+            state = 'current' if pipeline.is_current(name) else ''
+            print(f"{name:<24}{state:<9}{'<- ' + ', '.join(s.deps) if s.deps else '':<52}{kind}")
+        return 0
+
+    status = pipeline.run(targets)
+
+    print()
+    print("=" * 80)
+    print("PIPELINE SUMMARY")
+    print("=" * 80)
+    for name, state in status.items():
+        print(f"{name:<28}{state}")
+    print_report()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Solar Database Query Tools
+Parameterized, indexed queries over solar_data.db that the chat assistant
+calls to ground answers about generation, export and import in real data.
+
+Each tool returns a compact plain-text table sized for a prompt (long ranges
+are rolled up by week or month rather than listed day by day). Results are
+cached per tool and date range: closed ranges for an hour, ranges that
+include today until the collector's next poll.
+
+    python3 solar_query_tools.py "how much did we export last week?"
+"""
+
+import re
+import sqlite3
+import sys
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DB_PATH = Path(__file__).parent / "solar_data.db"
+READING_INTERVAL_S = 300  # Collector poll interval (solax_collector.POLL_INTERVAL)
+MAX_TABLE_ROWS = 14       # Longer ranges are rolled up by week/month
+
+CLOSED_RANGE_TTL = 3600
+OPEN_RANGE_TTL = READING_INTERVAL_S
+CACHE_SIZE = 256
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december']
+
+# ============================================================================
+# PERIODS
+# ============================================================================
+
+def find_period(text: str, today: Optional[date] = None) -> Optional[Tuple[str, str]]:
+    """
+    Inclusive (start, end) ISO dates for the period a question names:
+    today, yesterday, this/last week|month|year, last N days, a month name
+    or an ISO date. None if it names none of them.
+    """
+    today = today or date.today()
+    text = text.lower()
+
+    match = re.search(r'\d{4}-\d{2}-\d{2}', text)
+    if match:
+        return match.group(0), match.group(0)
+    if 'yesterday' in text:
+        day = (today - timedelta(days=1)).isoformat()
+        return day, day
+    if 'today' in text:
+        return today.isoformat(), today.isoformat()
+
+    match = re.search(r'(?:last|past)\s+(\d+)\s+days', text)
+    if match:
+        return (today - timedelta(days=int(match.group(1)) - 1)).isoformat(), today.isoformat()
+
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    if 'last week' in text:
+        return (week_start - timedelta(days=7)).isoformat(), (week_start - timedelta(days=1)).isoformat()
+    if 'this week' in text:
+        return week_start.isoformat(), today.isoformat()
+    if 'last month' in text:
+        last_end = month_start - timedelta(days=1)
+        return last_end.replace(day=1).isoformat(), last_end.isoformat()
+    if 'this month' in text:
+        return month_start.isoformat(), today.isoformat()
+    if 'last year' in text:
+        return date(today.year - 1, 1, 1).isoformat(), date(today.year - 1, 12, 31).isoformat()
+    if 'this year' in text:
+        return date(today.year, 1, 1).isoformat(), today.isoformat()
+
+    for number, name in enumerate(MONTHS, 1):
+        # "in may", "for march" or "march 2025" - a bare "may" is usually the verb
+        match = (re.search(rf'\b{name}\s+(\d{{4}})\b', text)
+                 or re.search(rf'\b(?:in|of|for|during)\s+{name}\b()', text))
+        if match:
+            # Most recent occurrence of that month unless a year is given
+            year = int(match.group(1)) if match.group(1) else (
+                today.year if number <= today.month else today.year - 1)
+            start = date(year, number, 1)
+            end = (date(year + number // 12, number % 12 + 1, 1) - timedelta(days=1))
+            return start.isoformat(), min(end, today).isoformat()
+
+    return None
+
+
+def resolve_period(text: str, today: Optional[date] = None) -> Tuple[str, str]:
+    """find_period(), defaulting to the last 7 days"""
+    today = today or date.today()
+    return find_period(text, today) or ((today - timedelta(days=6)).isoformat(), today.isoformat())
+
+
+def _next_day(day: str) -> str:
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+class SolarQueryTools:
+    """Cached query tools over one solar database"""
+
+    def __init__(self, db_path: Path = DB_PATH):
+        self.db_path = db_path
+        self._db = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (tool, args) -> (expires_at, text)
+        self.stats = {'calls': 0, 'cache_hits': 0, 'query_ms': 0.0}
+
+        self.tools: Dict[str, Callable[..., str]] = {
+            'daily_generation': self.daily_generation,
+            'monthly_generation': self.monthly_generation,
+            'energy_flows': self.energy_flows,
+            'intraday_profile': self.intraday_profile,
+        }
+
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            if self._db is None:
+                # Read-only: the collector is the only writer
+                self._db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            return self._db.execute(sql, params).fetchall()
+
+    def call(self, tool: str, *args) -> str:
+        """Run a tool by name, answering from the cache when the range is still fresh"""
+        key = (tool, args)
+        now = time.time()
+        # Chat workers share one instance; the query itself takes the lock in _query()
+        with self._lock:
+            self.stats['calls'] += 1
+            cached = self._cache.get(key)
+            if cached and cached[0] > now:
+                self._cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                return cached[1]
+
+        started = time.perf_counter()
+        text = self.tools[tool](*args)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        last = str(args[-1])  # Range end as a date or YYYY-MM month
+        open_range = last >= date.today().isoformat()[:len(last)]
+        with self._lock:
+            self.stats['query_ms'] += elapsed_ms
+            self._cache[key] = (now + (OPEN_RANGE_TTL if open_range else CLOSED_RANGE_TTL), text)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return text
+
+    # -- Tools ---------------------------------------------------------------
+
+    def daily_generation(self, start: str, end: str) -> str:
+        """Solar yield per day from solar_daily (rolled up by week for long ranges)"""
+        rows = self._query("""
+            SELECT date, total_yield_kwh, peak_power_w, hours_generating
+            FROM solar_daily WHERE date BETWEEN ? AND ? ORDER BY date
+        """, (start, end))
+        if not rows:
+            return f"No daily generation data between {start} and {end}."
+
+        total = sum(r[1] or 0 for r in rows)
+        best = max(rows, key=lambda r: r[1] or 0)
+        worst = min(rows, key=lambda r: r[1] or 0)
+        lines = [f"Solar generation {start} to {end}: {total:.1f} kWh over {len(rows)} days "
+                 f"(avg {total / len(rows):.1f} kWh/day, best {best[0]} {best[1]:.1f} kWh, "
+                 f"worst {worst[0]} {worst[1]:.1f} kWh)"]
+
+        if len(rows) <= MAX_TABLE_ROWS:
+            lines.append("date | kWh | peak W | hours generating")
+            lines += [f"{d} | {kwh:.1f} | {peak or 0:.0f} | {hours or 0:.1f}" for d, kwh, peak, hours in rows]
+        else:
+            weeks = OrderedDict()
+            for d, kwh, _, _ in rows:
+                monday = date.fromisoformat(d) - timedelta(days=date.fromisoformat(d).weekday())
+                weeks.setdefault(monday.isoformat(), []).append(kwh or 0)
+            lines.append("week of | kWh | days")
+            lines += [f"{w} | {sum(v):.1f} | {len(v)}" for w, v in list(weeks.items())[-MAX_TABLE_ROWS:]]
+        return "\n".join(lines)
+
+    def monthly_generation(self, start_month: str, end_month: str) -> str:
+        """Monthly totals from solar_monthly (months as YYYY-MM)"""
+        rows = self._query("""
+            SELECT month, total_yield_kwh, avg_daily_kwh, peak_day_kwh, peak_day_date, days_with_data
+            FROM solar_monthly WHERE month BETWEEN ? AND ? ORDER BY month
+        """, (start_month, end_month))
+        if not rows:
+            return f"No monthly generation data between {start_month} and {end_month}."
+
+        lines = ["month | kWh | avg kWh/day | best day | days with data"]
+        lines += [f"{m} | {total:.0f} | {avg:.1f} | {peak_date} ({peak:.1f}) | {days}"
+                  for m, total, avg, peak, peak_date, days in rows[-MAX_TABLE_ROWS:]]
+        return "\n".join(lines)
+
+    def energy_flows(self, start: str, end: str) -> str:
+        """
+        Export and import per day from raw readings (kept for 90 days).
+        feed_in_power is positive when exporting and negative when importing.
+        """
+        kwh = READING_INTERVAL_S / 3600 / 1000
+        rows = self._query(f"""
+            SELECT substr(timestamp, 1, 10) AS day,
+                   SUM(CASE WHEN feed_in_power > 0 THEN feed_in_power ELSE 0 END) * {kwh},
+                   SUM(CASE WHEN feed_in_power < 0 THEN -feed_in_power ELSE 0 END) * {kwh},
+                   SUM(CASE WHEN total_pv_power > 0 THEN total_pv_power ELSE 0 END) * {kwh},
+                   MAX(feed_in_power)
+            FROM solar_readings
+            WHERE timestamp >= ? AND timestamp < ?
+            GROUP BY day ORDER BY day
+        """, (start, _next_day(end)))
+        if not rows:
+            return f"No inverter readings between {start} and {end} (raw readings are kept for 90 days)."
+
+        exported = sum(r[1] for r in rows)
+        imported = sum(r[2] for r in rows)
+        solar = sum(r[3] for r in rows)
+        lines = [f"Energy flows {start} to {end} ({len(rows)} days with readings): "
+                 f"exported {exported:.1f} kWh, imported {imported:.1f} kWh, solar {solar:.1f} kWh"
+                 + (f", self-consumed {1 - exported / solar:.0%} of solar" if solar else "")]
+        if len(rows) <= MAX_TABLE_ROWS:
+            lines.append("date | exported kWh | imported kWh | solar kWh | peak export W")
+            lines += [f"{d} | {e:.1f} | {i:.1f} | {s:.1f} | {max(p or 0, 0):.0f}" for d, e, i, s, p in rows]
+        return "\n".join(lines)
+
+    def intraday_profile(self, day: str) -> str:
+        """Average solar, export and import power by hour for one day"""
+        rows = self._query("""
+            SELECT substr(timestamp, 12, 2) AS hour,
+                   AVG(total_pv_power),
+                   AVG(CASE WHEN feed_in_power > 0 THEN feed_in_power ELSE 0 END),
+                   AVG(CASE WHEN feed_in_power < 0 THEN -feed_in_power ELSE 0 END)
+            FROM solar_readings
+            WHERE timestamp >= ? AND timestamp < ?
+            GROUP BY hour ORDER BY hour
+        """, (day, _next_day(day)))
+        if not rows:
+            return f"No inverter readings for {day}."
+
+        lines = [f"Hourly average power on {day}", "hour | solar W | export W | import W"]
+        lines += [f"{h}:00 | {pv or 0:.0f} | {e:.0f} | {i:.0f}" for h, pv, e, i in rows
+                  if (pv or 0) > 0 or e > 0 or i > 0]
+        return "\n".join(lines)
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'cached_results': len(self._cache), 'database': str(self.db_path)}
+
+# ============================================================================
+# ASSISTANT ROUTING
+# ============================================================================
+
+# Words that ask for a measured quantity. A question needs one of these and a
+# period (find_period) before it's answered from the database; topic words
+# alone ("solar", "grid") would send general questions and FAQs here too and
+# bypass the response cache.
+MEASUREMENT_PATTERN = re.compile(
+    r'\bkwh\b|\bgenerat|\bproduc|\byield|\bexport|\bimport|\bfeed[- ]?in\b|\bself[- ]consum'
+    r'|\bhow much (?:solar|power|energy|electricity)\b|\bpeak (?:power|output)\b|\boutput\b')
+
+def select_tools(message: str, today: Optional[date] = None) -> List[Tuple[str, tuple]]:
+    """Tool calls that answer a chat message about our solar data ([] if it isn't one)"""
+    text = f" {message.lower()}"
+    period = find_period(text, today)
+    if period is None or not MEASUREMENT_PATTERN.search(text):
+        return []
+
+    start, end = period
+    calls = []
+    if any(k in text for k in ('export', 'import', 'feed', 'grid', 'self-consum', 'self consum')):
+        calls.append(('energy_flows', (start, end)))
+    if start == end and any(k in text for k in ('hour', 'when', 'time of day', 'profile', 'peak')):
+        calls.append(('intraday_profile', (start,)))
+    if any(k in text for k in ('month', 'year', 'season')) and start[:7] != end[:7]:
+        calls.append(('monthly_generation', (start[:7], end[:7])))
+    if not calls or any(k in text for k in ('generat', 'produc', 'yield', 'solar')):
+        calls.append(('daily_generation', (start, end)))
+    return calls
+
+
+def solar_data_for(message: str) -> str:
+    """Query results relevant to a chat message, as a prompt section ('' if none)"""
+    calls = select_tools(message)
+    if not calls or not DB_PATH.exists():
+        return ''
+    try:
+        tools = get_query_tools()
+        results = [tools.call(name, *args) for name, args in calls]
+    except sqlite3.Error as e:
+        log.warning(f"Solar data query failed: {e}")
+        return ''
+    return "Data from our solar database:\n" + "\n\n".join(results) + "\n"
+
+
+# Global instance
+_tools = None
+
+def get_query_tools() -> SolarQueryTools:
+    """Get or create the shared query tools"""
+    global _tools
+    if _tools is None:
+        _tools = SolarQueryTools()
+    return _tools
+
+
+if __name__ == '__main__':
+    question = " ".join(sys.argv[1:]) or "how much solar did we generate this week?"
+    for name, args in select_tools(question):
+        print(f"[{name}{args}]")
+    print(solar_data_for(question) or "No solar data for that question.")
@@ -14,11 +14,28 @@ import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from collector_metrics import METRICS_PORT, MetricsRegistry, serve_in_background
+from solar_nowcast import FORECAST_RETRY_S, build_nowcaster, init_nowcast_table, reading_load_w, store_nowcast
+
 # Configuration
 INVERTER_URL = "http://192.168.68.55/api/realTimeData.htm"
 POLL_INTERVAL = 300  # 5 minutes
 DB_PATH = Path(__file__).parent / "solar_data.db"
 LOG_PATH = Path("/var/log/solax-collector.log")
+METRICS_SNAPSHOT = Path(__file__).parent / "collector_metrics.json"
+
+# Collector metrics (served on /metrics and /metrics.json, snapshot after every poll)
+metrics = MetricsRegistry()
+POLL_LATENCY = metrics.histogram('solax_poll_latency_seconds', 'Inverter HTTP round trip, including timeouts')
+PARSE_TIME = metrics.histogram('solax_parse_seconds', 'Parsing an inverter response',
+                               buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1))
+DB_WRITE_TIME = metrics.histogram('solax_db_write_seconds', 'Storing a reading (insert + commit)')
+POLLS = metrics.counter('solax_polls_total', 'Inverter polls by result')
+CONSECUTIVE_FAILURES = metrics.gauge('solax_consecutive_failures', 'Failed polls since the last stored reading')
+MISSED_POLLS = metrics.counter('solax_missed_polls_total', 'Poll slots with no stored reading, including downtime')
+READINGS_TODAY = metrics.gauge('solax_readings_today', 'Readings stored so far today')
+DB_SIZE = metrics.gauge('solax_db_size_bytes', 'SQLite database size including the WAL')
+LAST_READING = metrics.gauge('solax_last_reading_timestamp_seconds', 'Unix time of the last stored reading')
 
 # Solax AL_SI4 data field mapping
 FIELDS = {
@@ -119,6 +136,7 @@ def init_db():
     db.execute("CREATE INDEX IF NOT EXISTS idx_readings_timestamp ON solar_readings(timestamp)")
     db.execute("CREATE INDEX IF NOT EXISTS idx_readings_date ON solar_readings(substr(timestamp, 1, 10))")
     db.commit()
+    init_nowcast_table(db)
     db.close()
     log.info(f"Database initialized at {DB_PATH}")
 
@@ -126,8 +144,10 @@ def init_db():
 def poll_inverter():
     """Poll the Solax inverter and return parsed data."""
     try:
-        resp = requests.get(INVERTER_URL, timeout=10)
+        with POLL_LATENCY.time():
+            resp = requests.get(INVERTER_URL, timeout=10)
         resp.raise_for_status()
+        parse_start = time.perf_counter()
         # Solax API returns empty values as ",," which isn't valid JSON
         import re
         raw = resp.text
@@ -138,6 +158,7 @@ def poll_inverter():
 
         if not data.get('Data'):
             log.warning(f"No Data field in response: {data.get('message', 'unknown')}")
+            POLLS.inc(result='no_data')
             return None
 
         raw = data['Data']
@@ -156,21 +177,26 @@ def poll_inverter():
         parsed['sn'] = data.get('SN', '')
         parsed['type'] = data.get('type', '')
 
+        PARSE_TIME.observe(time.perf_counter() - parse_start)
+        POLLS.inc(result='ok')
         return parsed
 
     except requests.exceptions.Timeout:
         log.warning("Inverter request timed out")
+        POLLS.inc(result='timeout')
         return None
     except requests.exceptions.ConnectionError:
         log.warning("Cannot connect to inverter")
+        POLLS.inc(result='connection_error')
         return None
     except Exception as e:
         log.error(f"Error polling inverter: {e}")
+        POLLS.inc(result='error')
         return None
 
 
 def store_reading(data):
-    """Store a reading in the database."""
+    """Store a reading in the database. Returns the reading's timestamp."""
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     db = sqlite3.connect(DB_PATH)
     db.execute("""
@@ -194,6 +220,36 @@ def store_reading(data):
     ))
     db.commit()
     db.close()
+    return now
+
+
+def update_nowcast(nowcaster, stamp, total_pv, load_w=None):
+    """
+    Feed a reading to today's nowcaster and store the updated nowcast.
+    A new nowcaster is built at midnight (or on startup), replaying any
+    readings already stored today - including this one.
+    """
+    ts = datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S')
+    db = sqlite3.connect(DB_PATH)
+    try:
+        # New day, startup, or a clear-sky stand-in whose forecast may be cached by now
+        stale = nowcaster is not None and not nowcaster.has_forecast and \
+            time.time() - nowcaster.built_at >= FORECAST_RETRY_S
+        if nowcaster is None or nowcaster.date != stamp[:10] or stale:
+            nowcaster = build_nowcaster(stamp[:10], db)
+            nowcast = nowcaster.nowcast(ts)
+        else:
+            nowcast = nowcaster.update(ts, total_pv, load_w)
+        store_nowcast(db, nowcast)
+    finally:
+        db.close()
+
+    log.info(
+        f"Nowcast: {nowcast['observed_kwh']:.1f}kWh so far + {nowcast['remaining_kwh']:.1f}kWh remaining "
+        f"(x{nowcast['performance_ratio']:.2f} vs forecast) | "
+        f"Full: {nowcast['time_to_full'] or 'not today'} | Top-up: {nowcast['topup_needed_kwh']:.1f}kWh"
+    )
+    return nowcaster
 
 
 def update_daily_aggregate(date_str=None):
@@ -296,6 +352,41 @@ def cleanup_old_readings(days=90):
         log.info(f"Cleaned up {deleted} readings older than {cutoff}")
 
 
+def init_metrics():
+    """Seed today's reading count and the last reading time from the database."""
+    db = sqlite3.connect(DB_PATH)
+    try:
+        today = datetime.now().strftime('%Y-%m-%d')
+        READINGS_TODAY.set(db.execute(
+            "SELECT COUNT(*) FROM solar_readings WHERE timestamp >= ?", (today,)).fetchone()[0])
+        last = db.execute("SELECT MAX(timestamp) FROM solar_readings").fetchone()[0]
+    finally:
+        db.close()
+    update_db_size()
+    if last:
+        LAST_READING.set(datetime.strptime(last, '%Y-%m-%d %H:%M:%S').timestamp())
+
+
+def update_db_size():
+    DB_SIZE.set(sum(p.stat().st_size for p in (DB_PATH, DB_PATH.with_name(DB_PATH.name + '-wal')) if p.exists()))
+
+
+def record_reading_metrics(stamp):
+    """Update per-reading metrics; a gap of more than 1.5 intervals counts the skipped poll slots."""
+    ts = datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S')
+    last = LAST_READING.value()
+    if last:
+        gap = ts.timestamp() - last
+        if gap > 1.5 * POLL_INTERVAL:
+            MISSED_POLLS.inc(round(gap / POLL_INTERVAL) - 1)
+        if datetime.fromtimestamp(last).date() != ts.date():
+            READINGS_TODAY.set(0)
+    READINGS_TODAY.inc()
+    LAST_READING.set(ts.timestamp())
+    CONSECUTIVE_FAILURES.set(0)
+    update_db_size()
+
+
 def main():
     log.info("Solax Collector starting")
     log.info(f"Inverter: {INVERTER_URL}")
@@ -303,16 +394,25 @@ def main():
     log.info(f"Poll interval: {POLL_INTERVAL}s")
 
     init_db()
+    init_metrics()
+    try:
+        serve_in_background(metrics)
+        log.info(f"Metrics: http://0.0.0.0:{METRICS_PORT}/metrics (+ /metrics.json, {METRICS_SNAPSHOT.name})")
+    except OSError as e:
+        log.warning(f"Metrics endpoint unavailable: {e}")
 
     poll_count = 0
     last_daily_update = None
     last_cleanup = datetime.now()
+    nowcaster = None
 
     while running:
         data = poll_inverter()
 
         if data:
-            store_reading(data)
+            with DB_WRITE_TIME.time():
+                stamp = store_reading(data)
+            record_reading_metrics(stamp)
             poll_count += 1
 
             total_pv = data.get('total_pv_power', 0)
@@ -326,6 +426,13 @@ def main():
                 f"Readings: {poll_count}"
             )
 
+            # Intraday nowcast of remaining generation and battery time-to-full
+            try:
+                load_w = reading_load_w(data.get('grid_power'), data.get('feed_in_power'))
+                nowcaster = update_nowcast(nowcaster, stamp, total_pv, load_w)
+            except Exception as e:
+                log.error(f"Nowcast update failed: {e}")
+
             # Update daily aggregate every reading
             today_str = datetime.now().strftime('%Y-%m-%d')
             update_daily_aggregate(today_str)
@@ -344,6 +451,14 @@ def main():
 
         else:
             log.debug("No data received from inverter")
+            CONSECUTIVE_FAILURES.inc()
+            if CONSECUTIVE_FAILURES.value() == 3:
+                log.warning("3 consecutive failed polls - check the inverter Wi-Fi link")
+
+        try:
+            metrics.write_snapshot(METRICS_SNAPSHOT)
+        except OSError as e:
+            log.debug(f"Metrics snapshot not written: {e}")
 
         # Weekly cleanup of old raw readings
         if (datetime.now() - last_cleanup).days >= 7:
@@ -26,6 +26,10 @@ tab_solar = read('tab-solar.js')
 tab_grid = read('tab-grid.js')
 app_js = read('app.js')
 
+# Fitted weather-to-solar coefficients (from ../solar_forecast_model.py), if trained
+model_path = os.path.join(DIR, 'solar_forecast_model.json')
+forecast_model = read('solar_forecast_model.json').strip() if os.path.exists(model_path) else 'null'
+
 html = f'''<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -44,6 +48,8 @@ html = f'''<!DOCTYPE html>
 <body>
 <div id="root"></div>
 <script type="text/babel">
+const SOLAR_FORECAST_MODEL = {forecast_model};
+
 {config_js}
 
 {tab_finance}
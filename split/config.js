@@ -349,6 +349,37 @@ function radiationToSolarKwh(radiationMJ, month, systemCapacityKw) {
   return Math.round(systemCapacityKw * peakHours * 0.82 * 10) / 10;
 }
 
+// Predict daily yield from the regression fitted on our own history
+// (solar_forecast_model.py; coefficients embedded by build.py as SOLAR_FORECAST_MODEL)
+const WMO_CONDITION_GROUPS = ['cloudy', 'fog', 'rain', 'storm'];
+function wmoConditionGroup(code) {
+  if (code === null || code === undefined || code <= 1) return 'clear';
+  if (code <= 3) return 'cloudy';
+  if (code === 45 || code === 48) return 'fog';
+  if (code >= 95) return 'storm';
+  return 'rain';
+}
+
+function modelSolarKwh(day, month) {
+  const m = SOLAR_FORECAST_MODEL;
+  const means = m.feature_means;
+  const clearSky = m.clear_sky_mj[month];
+  const radiation = day.shortwave_radiation_sum ?? means.radiation_mj;
+  const cloudFrac = day.cloud_cover_mean != null ? day.cloud_cover_mean / 100 : means.cloud_frac;
+  const group = wmoConditionGroup(day.weather_code);
+  const features = {
+    intercept: 1,
+    radiation_mj: radiation,
+    radiation_x_cloud: radiation * cloudFrac,
+    clear_sky_ratio: Math.min(radiation / clearSky, 1.2),
+    cloud_frac: cloudFrac,
+    sunshine_hours: day.sunshine_duration_hours ?? means.sunshine_hours,
+  };
+  WMO_CONDITION_GROUPS.forEach(g => { features[`cond_${g}`] = group === g ? 1 : 0; });
+  const kwh = m.features.reduce((sum, name, i) => sum + m.coef[i] * features[name], 0);
+  return Math.round(Math.max(0, kwh) * 10) / 10;
+}
+
 // Transform raw Open-Meteo forecast into prediction objects
 function processOpenMeteoForecast(forecastDays, cfg) {
   if (!forecastDays || !forecastDays.length) return [];
@@ -361,7 +392,9 @@ function processOpenMeteoForecast(forecastDays, cfg) {
     const dateObj = new Date(day.date + 'T00:00:00');
     const month = dateObj.getMonth();
     const wmoInfo = WMO_CODE_TO_CONDITION[day.weather_code] || { label: 'Unknown', icon: '\uD83C\uDF24\uFE0F' };
-    const predictedSolarKwh = radiationToSolarKwh(day.shortwave_radiation_sum, month, sysKw);
+    const predictedSolarKwh = SOLAR_FORECAST_MODEL
+      ? modelSolarKwh(day, month)
+      : radiationToSolarKwh(day.shortwave_radiation_sum, month, sysKw);
     const batteryPred = predictBatteryPerformance(predictedSolarKwh, bCap, chargeRate, efficiency);
 
     return {
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Stage Profiler
+Timing spans around the analysis pipeline stages, with optional per-stage
+cProfile and tracemalloc capture and a summary table or JSON trace at the end.
+
+Off unless asked for. While off, stage() hands back a shared no-op context
+manager and profiled() functions call straight through, so the
+instrumented scripts run as before.
+
+Enable with a flag on any instrumented CLI (or SOLAR_PROFILE):
+    python3 battery_roi_analysis.py --profile                    # timings
+    python3 battery_roi_analysis.py --profile=cprofile,memory    # + hotspots, peak memory
+    python3 battery_roi_analysis.py --profile --profile-json=trace.json
+
+Instrumenting a script:
+    with stage('simulate'):
+        ...
+
+    @profiled()
+    def load_solar_data(csv_files): ...
+"""
+
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MODES = ('time', 'cprofile', 'memory')
+PROFILE_DIR = Path(os.getenv('SOLAR_PROFILE_DIR', 'profiles'))  # .prof files, one per top-level stage
+TOP_FUNCTIONS = 10  # cProfile hotspots kept in the trace
+
+_enabled = False
+_modes = set()
+_json_path: Optional[Path] = None
+_spans: Dict[str, 'Span'] = {}   # path -> aggregated span, in first-entry order
+_stack: List['Span'] = []
+_t0 = 0.0
+
+_NULL = contextlib.nullcontext()
+
+# ============================================================================
+# SPANS
+# ============================================================================
+
+class Span:
+    """One named stage; re-entering the same path accumulates into it"""
+
+    def __init__(self, path: str, depth: int):
+        self.path = path
+        self.name = path.rsplit('/', 1)[-1]
+        self.depth = depth
+        self.calls = 0
+        self.total_s = 0.0
+        self.first_start_s = None
+        self.peak_bytes = 0
+        self.hotspots = None
+        self._start = 0.0
+        self._base_bytes = 0
+        self._running_peak = 0
+        self._profile = None
+
+    def to_dict(self) -> Dict:
+        d = {'path': self.path, 'depth': self.depth, 'calls': self.calls,
+             'total_s': round(self.total_s, 4), 'start_s': round(self.first_start_s, 4)}
+        if 'memory' in _modes:
+            d['peak_mb'] = round(self.peak_bytes / 1e6, 2)
+        if self.hotspots is not None:
+            d['hotspots'] = self.hotspots
+        return d
+
+
+def _fold_peak():
+    # tracemalloc keeps one peak; fold it into every open span before resetting it
+    _, peak = tracemalloc.get_traced_memory()
+    for span in _stack:
+        span._running_peak = max(span._running_peak, peak)
+    tracemalloc.reset_peak()
+
+
+class _Active:
+    """Context manager for one entry into a span"""
+
+    __slots__ = ('name', 'span')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.span = None
+
+    def __enter__(self):
+        path = '/'.join([s.path for s in _stack[-1:]] + [self.name])
+        span = _spans.get(path)
+        if span is None:
+            span = _spans[path] = Span(path, len(_stack))
+        self.span = span
+
+        if 'memory' in _modes:
+            _fold_peak()
+            span._base_bytes = tracemalloc.get_traced_memory()[0]
+            span._running_peak = span._base_bytes
+        # cProfile can't nest, so only top-level stages are profiled
+        if 'cprofile' in _modes and not _stack:
+            span._profile = cProfile.Profile()
+            span._profile.enable()
+
+        _stack.append(span)
+        span._start = time.perf_counter()
+        if span.first_start_s is None:
+            span.first_start_s = span._start - _t0
+        return span
+
+    def __exit__(self, *exc):
+        span = self.span
+        span.total_s += time.perf_counter() - span._start
+        span.calls += 1
+
+        if span._profile is not None:
+            span._profile.disable()
+            _capture_hotspots(span)
+        if 'memory' in _modes:
+            _fold_peak()
+            span.peak_bytes = max(span.peak_bytes, span._running_peak - span._base_bytes)
+        _stack.pop()
+        return False
+
+
+def _capture_hotspots(span: Span):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in span.path)
+    span._profile.dump_stats(PROFILE_DIR / f"{safe_name}.prof")
+
+    stats = pstats.Stats(span._profile, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)  # cumulative time
+    span.hotspots = [{'function': f"{Path(file).name}:{line}({func})", 'calls': nc,
+                      'own_s': round(tt, 4), 'cumulative_s': round(ct, 4)}
+                     for (file, line, func), (_, nc, tt, ct, _) in rows[:TOP_FUNCTIONS]]
+    span._profile = None
+
+
+def stage(name: str):
+    """Span around a block; a shared no-op when profiling is off"""
+    if not _enabled:
+        return _NULL
+    return _Active(name)
+
+
+def profiled(name: str = None) -> Callable:
+    """Decorator form of stage(), named after the function by default"""
+    def wrap(fn: Callable) -> Callable:
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Active(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+# ============================================================================
+# SETUP AND REPORTING
+# ============================================================================
+
+def enable(modes=('time',), json_path: str = None):
+    """Start collecting spans (modes from MODES; 'time' is always on)"""
+    global _enabled, _modes, _json_path, _t0
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        raise ValueError(f"Unknown profile mode(s) {sorted(unknown)}; choose from {MODES}")
+    _modes = set(modes) | {'time'}
+    _json_path = Path(json_path) if json_path else None
+    _spans.clear()
+    _stack.clear()
+    if 'memory' in _modes and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _t0 = time.perf_counter()
+    _enabled = True
+
+
+def setup_from_argv(argv: List[str] = None):
+    """Enable from --profile[=modes] / --profile-json=PATH, or SOLAR_PROFILE / SOLAR_PROFILE_JSON"""
+    argv = sys.argv[1:] if argv is None else argv
+    modes = os.getenv('SOLAR_PROFILE', '')
+    json_path = os.getenv('SOLAR_PROFILE_JSON')
+    for arg in argv:
+        if arg == '--profile':
+            modes = modes or 'time'
+        elif arg.startswith('--profile='):
+            modes = arg.split('=', 1)[1]
+        elif arg.startswith('--profile-json='):
+            json_path = arg.split('=', 1)[1]
+            modes = modes or 'time'
+    if modes:
+        enable([m.strip() for m in modes.split(',') if m.strip()], json_path)
+
+
+def trace() -> Dict:
+    """Collected spans as a JSON-ready dict"""
+    return {'modes': sorted(_modes), 'wall_s': round(time.perf_counter() - _t0, 4),
+            'spans': [span.to_dict() for span in _spans.values()]}
+
+
+def print_report():
+    """Print the summary table (and write the JSON trace if requested); no-op when disabled"""
+    if not _enabled:
+        return
+    data = trace()
+    wall = data['wall_s'] or 1e-9
+    memory = 'memory' in _modes
+
+    print()
+    print("=" * 80)
+    print(f"STAGE TIMINGS (wall {data['wall_s']:.2f}s)")
+    print("=" * 80)
+    header = f"{'Stage':<44}{'calls':>6}{'total s':>10}{'% wall':>8}"
+    print(header + (f"{'peak MB':>10}" if memory else ''))
+    print("-" * 80)
+    for span in _spans.values():
+        line = (f"{'  ' * span.depth + span.name:<44}{span.calls:>6}"
+                f"{span.total_s:>10.3f}{span.total_s / wall * 100:>7.1f}%")
+        if memory:
+            line += f"{span.peak_bytes / 1e6:>10.1f}"
+        print(line)
+        for hot in (span.hotspots or [])[:5]:
+            print(f"      {hot['cumulative_s']:>8.3f}s  {hot['function']}")
+    if 'cprofile' in _modes:
+        print(f"\ncProfile dumps written to {PROFILE_DIR}/")
+
+    if _json_path:
+        with open(_json_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        print(f"Profile trace saved to {_json_path}")
@@ -0,0 +1,133 @@
+"""Tests for LangChainHandler's Ollama token streaming against a stubbed requests.post"""
+
+import json
+import threading
+
+import pytest
+import requests
+
+import local_first_ai_handler
+from conversation_context import ConversationContext
+from local_first_ai_handler import SYSTEM_PROMPT, LangChainHandler
+from response_cache import ResponseCache
+
+MODEL = 'qwen2.5-coder:7b'
+HEADER = f"**Enhanced Jarvis (Ollama - {MODEL})**\n\n"
+
+
+class FakeStreamResponse:
+    """NDJSON body as Ollama's /api/generate streams it; optionally cut off after `cut_after` lines"""
+
+    def __init__(self, chunks, cut_after=None):
+        self.status_code = 200
+        self.text = ''
+        self.lines = [json.dumps(c).encode() for c in chunks]
+        self.cut_after = cut_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self, chunk_size=512):
+        for i, line in enumerate(self.lines):
+            if i == self.cut_after:
+                raise requests.exceptions.ChunkedEncodingError('Connection broken: IncompleteRead')
+            yield line
+
+
+class FakeRouter:
+    def __init__(self):
+        self.recorded = []
+
+    def preferred(self):
+        return 'ollama'
+
+    def record(self, provider, success, latency_s):
+        self.recorded.append((provider, success))
+
+
+def token_chunks(tokens):
+    chunks = [{'model': MODEL, 'response': t, 'done': False} for t in tokens]
+    chunks.append({'model': MODEL, 'response': '', 'done': True,
+                   'eval_count': len(tokens), 'eval_duration': 500_000_000})
+    return chunks
+
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    # Skip provider discovery: only what the streaming path touches
+    monkeypatch.setattr(local_first_ai_handler, 'solar_data_for', lambda message: '')
+    monkeypatch.setattr(local_first_ai_handler, 'reference_for', lambda message: '')
+    handler = LangChainHandler.__new__(LangChainHandler)
+    handler.initialized = True
+    handler.ollama_url = 'http://ollama.test:11434'
+    handler.available_models = {'ollama': [MODEL]}
+    handler.context = ConversationContext(SYSTEM_PROMPT)
+    handler.context_lock = threading.RLock()
+    handler._thread_state = threading.local()
+    handler.router = FakeRouter()
+    handler.response_cache = ResponseCache(tmp_path / 'response_cache.db')
+    return handler
+
+
+def stub_post(monkeypatch, response):
+    calls = []
+
+    def post(url, json=None, stream=False, timeout=None):
+        calls.append({'url': url, 'json': json, 'stream': stream})
+        return response
+
+    monkeypatch.setattr(local_first_ai_handler.requests, 'post', post)
+    return calls
+
+
+def test_tokens_stream_in_order_and_metrics_are_recorded(handler, monkeypatch):
+    calls = stub_post(monkeypatch, FakeStreamResponse(token_chunks([' The', ' sun', ' shines', '.'])))
+
+    chunks = list(handler.chat_stream('How much solar today?'))
+
+    assert chunks == [HEADER, 'The', ' sun', ' shines', '.']
+    assert calls[0]['url'] == 'http://ollama.test:11434/api/generate'
+    assert calls[0]['stream'] and calls[0]['json']['stream']
+
+    metrics = handler.last_stream_metrics
+    assert metrics['model'] == MODEL
+    assert metrics['complete'] is True
+    assert metrics['tokens'] == 4
+    assert metrics['tokens_per_s'] == 8.0  # Ollama's own eval counters
+    assert metrics['ttft_s'] is not None
+    assert handler.router.recorded == [('ollama', True)]
+
+    # A complete answer is cached and kept as the conversation's next turn
+    assert handler.response_cache.get(f"ollama:{MODEL}", 'How much solar today?') == ''.join(chunks).strip()
+    assert [m['role'] for m in handler.chat_history] == ['user', 'assistant']
+
+
+def test_stream_cut_off_midway_is_reported_and_not_cached(handler, monkeypatch):
+    # Connection drops after two tokens, before Ollama's final 'done' chunk
+    stub_post(monkeypatch, FakeStreamResponse(token_chunks(['Partial', ' answer', ' lost']), cut_after=2))
+
+    chunks = list(handler.chat_stream('How much solar today?'))
+
+    assert chunks[:3] == [HEADER, 'Partial', ' answer']
+    assert chunks[3].startswith('Ollama error: Connection broken')
+    assert len(chunks) == 4
+
+    metrics = handler.last_stream_metrics
+    assert metrics['complete'] is False
+    assert metrics['tokens'] == 2
+    assert handler.router.recorded == [('ollama', False)]
+    assert handler.response_cache.get(f"ollama:{MODEL}", 'How much solar today?') is None
+
+
+def test_stream_ending_without_done_is_incomplete(handler, monkeypatch):
+    chunks = token_chunks(['Half', ' an', ' answer'])[:-1]
+    stub_post(monkeypatch, FakeStreamResponse(chunks))
+
+    assert list(handler._ollama_chat_stream('How much solar today?')) == [HEADER, 'Half', ' an', ' answer']
+    metrics = handler.last_stream_metrics
+    assert metrics['complete'] is False
+    assert metrics['tokens'] == 3
+    assert metrics['tokens_per_s'] is not None  # Falls back to wall-clock timing
@@ -0,0 +1,109 @@
+"""Tests for weather_cache.WeatherCache against a stubbed urlopen"""
+
+import io
+import json
+import urllib.error
+
+import pytest
+
+import weather_cache
+from weather_cache import WeatherCache, bom_upstream
+
+URL = 'http://bom.test/forecast.json'
+
+
+class FakeUpstream:
+    """Stands in for urllib.request.urlopen: counts calls, serves a payload or fails"""
+
+    def __init__(self):
+        self.calls = 0
+        self.payload = {'forecast': 'sunny'}
+        self.error = None
+
+    def __call__(self, req, timeout=None):
+        self.calls += 1
+        assert req.full_url == URL
+        if self.error is not None:
+            raise self.error
+        return io.BytesIO(json.dumps(self.payload).encode())
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = FakeUpstream()
+    monkeypatch.setattr(weather_cache.urllib.request, 'urlopen', fake)
+    return fake
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = WeatherCache([bom_upstream(URL, ttl=100)], cache_dir=tmp_path / 'cache', clock=clock)
+    yield cache
+    cache._executor.shutdown(wait=True)
+
+
+def test_fresh_hit_serves_cache_without_upstream_call(cache, upstream, tmp_path):
+    assert not (tmp_path / 'cache').exists()  # Created lazily on first write
+
+    data, meta = cache.get('bom')
+    assert data == {'forecast': 'sunny'}
+    assert meta['state'] == 'fresh'
+    assert upstream.calls == 1
+    assert (tmp_path / 'cache' / 'bom.json').exists()
+
+    upstream.payload = {'forecast': 'rain'}
+    data, meta = cache.get('bom')
+    assert data == {'forecast': 'sunny'}
+    assert meta['state'] == 'fresh'
+    assert upstream.calls == 1
+    assert cache.stats['hits'] == 1
+
+
+def test_stale_entry_is_served_while_revalidating(cache, upstream, clock):
+    cache.get('bom')
+    upstream.payload = {'forecast': 'rain'}
+    clock.now += 150  # Past the TTL and min_interval
+
+    data, meta = cache.get('bom')
+    assert data == {'forecast': 'sunny'}
+    assert meta['state'] == 'stale'
+    assert cache.stats['stale_hits'] == 1
+
+    cache._executor.shutdown(wait=True)  # Let the background refresh finish
+    assert upstream.calls == 2
+    data, meta = cache.get('bom')
+    assert data == {'forecast': 'rain'}
+    assert meta['state'] == 'fresh'
+
+
+def test_miss_while_rate_limited_fails_fast(cache, upstream, clock):
+    upstream.error = urllib.error.URLError('connection refused')
+    with pytest.raises(RuntimeError, match='connection refused'):
+        cache.get('bom')
+    assert upstream.calls == 1
+
+    # Within min_interval of the failed attempt: no second upstream call
+    clock.now += 10
+    with pytest.raises(RuntimeError, match='retry in 50s'):
+        cache.get('bom')
+    assert upstream.calls == 1
+
+    # Once the interval has passed the upstream is tried again
+    upstream.error = None
+    clock.now += 60
+    data, _ = cache.get('bom')
+    assert data == {'forecast': 'sunny'}
+    assert upstream.calls == 2
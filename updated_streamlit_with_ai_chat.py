@@ -9,10 +9,12 @@ import json
 import logging
 from pathlib import Path
 import sys
+import uuid
 
 # Import our AI handler
 try:
     from app.langchain_handler import get_langchain_handler
+    from app.chat_scheduler import get_chat_scheduler
     AI_HANDLER_AVAILABLE = True
 except ImportError:
     AI_HANDLER_AVAILABLE = False
@@ -192,6 +194,8 @@ with tab2:
         # Chat interface
         if "chat_messages" not in st.session_state:
             st.session_state.chat_messages = []
+        if "chat_session_id" not in st.session_state:
+            st.session_state.chat_session_id = uuid.uuid4().hex
 
         # Display chat messages
         for message in st.session_state.chat_messages:
@@ -207,15 +211,35 @@ with tab2:
 
             # Get AI response
             with st.chat_message("assistant"):
-                with st.spinner("🧠 Thinking..."):
-                    try:
-                        response = ai_handler.chat(prompt, st.session_state.chat_messages)
-                        st.markdown(response)
-                        st.session_state.chat_messages.append({"role": "assistant", "content": response})
-                    except Exception as e:
-                        error_msg = f"❌ Chat error: {str(e)}"
-                        st.error(error_msg)
-                        st.session_state.chat_messages.append({"role": "assistant", "content": error_msg})
+                try:
+                    # Sessions share the handler through a bounded worker pool; leaving the
+                    # page mid-answer closes the stream, which cancels the request
+                    scheduler = get_chat_scheduler(ai_handler)
+                    request = scheduler.submit(prompt, st.session_state.chat_messages,
+                                               st.session_state.chat_session_id)
+
+                    # Render tokens as they arrive instead of waiting on a spinner
+                    placeholder = st.empty()
+                    placeholder.markdown("🧠 Thinking...")
+                    response = ""
+                    for chunk in scheduler.stream(request):
+                        response += chunk
+                        placeholder.markdown(response + "▌")
+                    response = response.strip()
+                    placeholder.markdown(response)
+
+                    metrics = request.metrics
+                    if metrics and metrics.get("ttft_s") is not None:
+                        rate = f"{metrics['tokens_per_s']} tok/s" if metrics.get("tokens_per_s") else "n/a"
+                        st.caption(
+                            f"⏱️ First token {metrics['ttft_s']:.2f}s · "
+                            f"{metrics['tokens']} tokens · {rate} · {metrics['total_s']:.1f}s total"
+                        )
+                    st.session_state.chat_messages.append({"role": "assistant", "content": response})
+                except Exception as e:
+                    error_msg = f"❌ Chat error: {str(e)}"
+                    st.error(error_msg)
+                    st.session_state.chat_messages.append({"role": "assistant", "content": error_msg})
 
         # Chat controls
         col1, col2 = st.columns(2)
@@ -254,11 +278,11 @@ with tab3:
         if st.button("📤 Process Document"):
             with st.spinner("Processing document..."):
                 try:
-                    # Read file content
-                    if uploaded_file.type == "text/plain":
-                        content = str(uploaded_file.read(), "utf-8")
+                    # Text is decoded here; PDF/DOCX bytes are extracted by the document index
+                    if uploaded_file.name.lower().endswith(('.pdf', '.docx')):
+                        content = uploaded_file.getvalue()
                     else:
-                        content = f"[{uploaded_file.type}] Document uploaded: {uploaded_file.name}"
+                        content = uploaded_file.getvalue().decode("utf-8", errors="replace")
                     
                     # Process with AI handler
                     if ai_handler:
@@ -277,15 +301,23 @@ with tab3:
     # RAG Chat Section
     st.subheader("🧠 RAG (Retrieval-Augmented Generation)")
     
-    st.info("""
-    **Coming Soon:** Advanced document-based conversations
+    try:
+        try:
+            from app.document_index import get_document_index
+        except ImportError:
+            from document_index import get_document_index
+        indexed = get_document_index().documents()
+    except Exception as e:
+        indexed = []
+        st.warning(f"Document index unavailable: {str(e)}")
     
-    Deploy LangChain features to unlock:
-    - 📄 Intelligent document analysis
-    - 🔍 Semantic search across documents
-    - 💬 Chat with your document knowledge base
-    - 🧩 Multi-document reasoning
-    """)
+    if indexed:
+        st.caption("Chat answers draw on excerpts from these documents:")
+        for doc in indexed:
+            state = f"embedding, {doc['pending']} chunks pending" if doc["state"] == "embedding" else "ready"
+            st.write(f"📄 **{doc['name']}** - {doc['chunks']} chunks ({state})")
+    else:
+        st.info("Process a document above and chat answers will draw on its most relevant passages.")
 
 # Footer
 st.markdown("---")
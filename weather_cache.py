@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Weather Cache Service
+Single cached, rate-limited proxy in front of the weather upstreams
+(Open-Meteo forecast, BOM, Home Assistant) for the dashboard and scripts.
+
+- Each upstream is fetched at most once per TTL (and never more often than
+  its min_interval, even when callers pass force=true)
+- Stale data is served immediately while a background refresh runs
+- Concurrent requests for the same upstream share one in-flight fetch
+- The last good response is persisted to disk for cold starts
+
+Run standalone to serve /api/solar/weather, /api/solar/weather-forecast
+and /api/solar/bom-forecast:
+    python3 weather_cache.py
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+log = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CACHE_DIR = Path(os.getenv('WEATHER_CACHE_DIR', Path(__file__).parent / "weather_cache"))
+SERVER_PORT = int(os.getenv('WEATHER_CACHE_PORT', '5001'))
+
+LATITUDE = -34.8481
+LONGITUDE = 138.5597
+
+OPEN_METEO_URL = os.getenv('OPEN_METEO_URL', "https://api.open-meteo.com/v1/forecast")
+BOM_ADELAIDE_FORECAST = os.getenv('BOM_FORECAST_URL', "http://www.bom.gov.au/fwo/IDS60901/IDS60901.94675.json")
+HA_URL = os.getenv('HA_URL', "http://192.168.68.60:8123")
+HA_TOKEN = os.getenv('HA_TOKEN', '')
+HA_WEATHER_ENTITY = os.getenv('HA_WEATHER_ENTITY', 'weather.forecast_home')
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# ============================================================================
+# UPSTREAMS
+# ============================================================================
+
+def _http_json(url: str, headers: Dict = None, body: Dict = None, timeout: float = 20) -> Any:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers=headers or {})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return json.loads(response.read().decode())
+
+
+class Upstream:
+    """
+    One cached upstream
+
+    Args:
+        name: Cache key (also the on-disk file name)
+        fetch: Callable returning the (already transformed) response data
+        ttl: Seconds a response is considered fresh
+        min_interval: Minimum seconds between upstream calls, even when forced
+        max_stale: Oldest response (seconds) served while refreshing in the background
+    """
+
+    def __init__(self, name: str, fetch: Callable[[], Any], ttl: float = 1800,
+                 min_interval: float = 60, max_stale: float = 86400):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self.max_stale = max_stale
+
+
+def open_meteo_upstream(base_url: str = OPEN_METEO_URL, ttl: float = 1800) -> Upstream:
+    """16-day Open-Meteo forecast in the dashboard's forecast_days shape"""
+    daily_vars = ("weather_code,temperature_2m_max,temperature_2m_min,cloud_cover_mean,"
+                  "precipitation_probability_max,shortwave_radiation_sum,sunshine_duration,uv_index_max")
+    url = (f"{base_url}?latitude={LATITUDE}&longitude={LONGITUDE}&daily={daily_vars}"
+           f"&hourly=shortwave_radiation&forecast_days=16&timezone=Australia%2FAdelaide")
+
+    def fetch():
+        response = _http_json(url)
+        daily = response['daily']
+        days = []
+        for i, date in enumerate(daily['time']):
+            sunshine_s = daily['sunshine_duration'][i]
+            days.append({
+                'date': date,
+                'weather_code': daily['weather_code'][i],
+                'temp_max': daily['temperature_2m_max'][i],
+                'temp_min': daily['temperature_2m_min'][i],
+                'cloud_cover_mean': daily['cloud_cover_mean'][i],
+                'precipitation_probability': daily['precipitation_probability_max'][i],
+                'shortwave_radiation_sum': daily['shortwave_radiation_sum'][i],
+                'sunshine_duration_hours': round(sunshine_s / 3600.0, 1) if sunshine_s is not None else None,
+                'uv_index_max': daily['uv_index_max'][i],
+            })
+        # Hourly radiation profile for intraday nowcasting (solar_nowcast.py)
+        hourly = response.get('hourly') or {}
+        return {
+            'forecast_days': days,
+            'hourly': {
+                'time': hourly.get('time', []),
+                'shortwave_radiation': hourly.get('shortwave_radiation', []),
+            },
+        }
+
+    return Upstream('open_meteo', fetch, ttl=ttl)
+
+
+def bom_upstream(url: str = BOM_ADELAIDE_FORECAST, ttl: float = 1800) -> Upstream:
+    """Raw BOM Adelaide forecast JSON (BOM blocks requests without a browser UA)"""
+    return Upstream('bom', lambda: _http_json(url, headers=BROWSER_HEADERS), ttl=ttl)
+
+
+def home_assistant_upstream(url: str = HA_URL, token: str = HA_TOKEN,
+                            entity: str = HA_WEATHER_ENTITY, ttl: float = 600) -> Upstream:
+    """HA weather entity + daily forecast in the dashboard's /weather shape"""
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+
+    def fetch():
+        state = _http_json(f"{url}/api/states/{entity}", headers=headers)
+        forecast_resp = _http_json(f"{url}/api/services/weather/get_forecasts?return_response",
+                                   headers=headers, body={'entity_id': entity, 'type': 'daily'})
+        forecast = forecast_resp.get('service_response', {}).get(entity, {}).get('forecast', [])
+        attrs = state.get('attributes', {})
+        return {
+            'location': attrs.get('friendly_name', 'Unknown'),
+            'current': {
+                'temp': attrs.get('temperature'),
+                'condition': state.get('state'),
+                'humidity': attrs.get('humidity'),
+                'pressure': attrs.get('pressure'),
+            },
+            'forecast': [{
+                'date': day['datetime'].split('T')[0],
+                'condition': day.get('condition'),
+                'temperature': day.get('temperature'),
+                'templow': day.get('templow'),
+                'precipitation': day.get('precipitation'),
+                'precipitation_probability': day.get('precipitation_probability'),
+                'wind_speed': day.get('wind_speed'),
+            } for day in forecast],
+        }
+
+    return Upstream('home_assistant', fetch, ttl=ttl)
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class _Entry:
+    def __init__(self, data: Any = None, fetched_at: float = 0.0):
+        self.data = data
+        self.fetched_at = fetched_at
+        self.last_attempt = 0.0
+        self.last_error = None
+        self.in_flight: Optional[threading.Event] = None
+
+
+class WeatherCache:
+    """Stale-while-revalidate cache with request coalescing and disk persistence"""
+
+    def __init__(self, upstreams, cache_dir: Path = CACHE_DIR, clock: Callable[[], float] = time.time):
+        self.upstreams = {u.name: u for u in upstreams}
+        self.cache_dir = Path(cache_dir)
+        self.clock = clock
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'upstream_calls': 0, 'upstream_errors': 0}
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.upstreams)),
+                                            thread_name_prefix='weather-refresh')
+        for name in self.upstreams:
+            self._entries[name] = self._load(name)
+
+    # -- Persistence ---------------------------------------------------------
+
+    def _path(self, name: str) -> Path:
+        return self.cache_dir / f"{name}.json"
+
+    def _load(self, name: str) -> _Entry:
+        try:
+            with open(self._path(name), 'r') as f:
+                saved = json.load(f)
+            return _Entry(saved['data'], saved['fetched_at'])
+        except (OSError, ValueError, KeyError):
+            return _Entry()
+
+    def _save(self, name: str, entry: _Entry):
+        # Created on first write, so importing/constructing the cache leaves no trace
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._path(name).with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'fetched_at': entry.fetched_at, 'data': entry.data}, f)
+        os.replace(tmp, self._path(name))
+
+    # -- Refresh -------------------------------------------------------------
+
+    def _start_refresh(self, name: str, entry: _Entry) -> threading.Event:
+        """Start (or join) the single in-flight fetch for an upstream. Caller holds the lock."""
+        if entry.in_flight is not None:
+            return entry.in_flight
+        done = threading.Event()
+        entry.in_flight = done
+        entry.last_attempt = self.clock()
+        self._executor.submit(self._refresh, name, entry, done)
+        return done
+
+    def _refresh(self, name: str, entry: _Entry, done: threading.Event):
+        upstream = self.upstreams[name]
+        try:
+            with self._lock:
+                self.stats['upstream_calls'] += 1
+            data = upstream.fetch()
+            with self._lock:
+                entry.data = data
+                entry.fetched_at = self.clock()
+                entry.last_error = None
+            self._save(name, entry)
+        except Exception as e:
+            with self._lock:
+                self.stats['upstream_errors'] += 1
+                entry.last_error = str(e)
+            log.warning(f"Weather upstream '{name}' failed: {e}")
+        finally:
+            with self._lock:
+                entry.in_flight = None
+            done.set()
+
+    # -- Public API ----------------------------------------------------------
+
+    def get(self, name: str, force: bool = False, timeout: float = 30) -> Tuple[Any, Dict]:
+        """
+        Get an upstream's data through the cache
+
+        Args:
+            name: Upstream name
+            force: Refresh now (still subject to the upstream's min_interval)
+            timeout: Seconds to wait when a blocking fetch is needed
+
+        Returns:
+            (data, meta) - meta describes cache state (fresh/stale/age/error)
+
+        Raises:
+            LookupError: Unknown upstream
+            RuntimeError: No cached data and the upstream fetch failed (or is
+                rate limited after a recent failure)
+        """
+        upstream = self.upstreams.get(name)
+        if upstream is None:
+            raise LookupError(f"Unknown weather upstream: {name}")
+
+        with self._lock:
+            entry = self._entries[name]
+            now = self.clock()
+            age = now - entry.fetched_at if entry.data is not None else None
+            rate_limited = now - entry.last_attempt < upstream.min_interval
+
+            if age is not None:
+                if age < upstream.ttl and not force:
+                    self.stats['hits'] += 1
+                    return entry.data, self._meta(entry, upstream, 'fresh')
+                if rate_limited:
+                    self.stats['hits'] += 1
+                    return entry.data, self._meta(entry, upstream, 'rate_limited')
+                if age < upstream.max_stale and not force:
+                    self.stats['stale_hits'] += 1
+                    self._start_refresh(name, entry)
+                    return entry.data, self._meta(entry, upstream, 'stale')
+            elif rate_limited and entry.in_flight is None:
+                # Nothing cached and the last attempt was too recent: fail fast
+                # rather than hitting a down upstream on every request
+                self.stats['misses'] += 1
+                raise RuntimeError(f"Weather upstream '{name}' unavailable: "
+                                   f"{entry.last_error or 'rate limited'} (retry in "
+                                   f"{upstream.min_interval - (now - entry.last_attempt):.0f}s)")
+
+            self.stats['misses'] += 1
+            done = self._start_refresh(name, entry)
+
+        done.wait(timeout)
+
+        with self._lock:
+            if entry.data is None:
+                raise RuntimeError(f"Weather upstream '{name}' unavailable: {entry.last_error or 'timed out'}")
+            state = 'fresh' if entry.last_error is None and entry.in_flight is None else 'stale'
+            return entry.data, self._meta(entry, upstream, state)
+
+    def _meta(self, entry: _Entry, upstream: Upstream, state: str) -> Dict:
+        age = self.clock() - entry.fetched_at
+        return {
+            'state': state,
+            'age_s': round(age, 1),
+            'ttl_s': upstream.ttl,
+            'fetched_at': entry.fetched_at,
+            'refreshing': entry.in_flight is not None,
+            'last_error': entry.last_error,
+        }
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'stats': dict(self.stats),
+                'upstreams': {
+                    name: {
+                        'cached': entry.data is not None,
+                        'age_s': round(self.clock() - entry.fetched_at, 1) if entry.data is not None else None,
+                        'refreshing': entry.in_flight is not None,
+                        'last_error': entry.last_error,
+                    } for name, entry in self._entries.items()
+                }
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_weather_cache() -> WeatherCache:
+    """Get or create the shared weather cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            upstreams = [open_meteo_upstream(), bom_upstream()]
+            if HA_TOKEN:
+                upstreams.append(home_assistant_upstream())
+            _cache = WeatherCache(upstreams)
+        return _cache
+
+# ============================================================================
+# HTTP SERVICE
+# ============================================================================
+
+ROUTES = {
+    '/api/solar/weather': 'home_assistant',
+    '/api/solar/weather-forecast': 'open_meteo',
+    '/api/solar/bom-forecast': 'bom',
+}
+
+
+def make_handler(cache: WeatherCache):
+    class WeatherHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: Dict):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path == '/api/solar/weather-cache/status':
+                return self._send(200, cache.status())
+
+            name = ROUTES.get(parsed.path)
+            if name is None or name not in cache.upstreams:
+                return self._send(404, {'error': f'Unknown endpoint {parsed.path}'})
+
+            force = parse_qs(parsed.query).get('force', ['false'])[0].lower() == 'true'
+            try:
+                data, meta = cache.get(name, force=force)
+            except RuntimeError as e:
+                return self._send(503, {'error': str(e)})
+            body = dict(data) if isinstance(data, dict) else {'data': data}
+            body['cache'] = meta
+            self._send(200, body)
+
+        def log_message(self, format, *args):
+            log.debug(format % args)
+
+    return WeatherHandler
+
+
+def serve(cache: WeatherCache, port: int = SERVER_PORT, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Create the HTTP server (call serve_forever() on the result)"""
+    return ThreadingHTTPServer((host, port), make_handler(cache))
+
+
+def main():
+    cache = get_weather_cache()
+    server = serve(cache)
+    log.info(f"Weather cache serving on port {SERVER_PORT} ({', '.join(cache.upstreams)})")
+    log.info(f"Cache directory: {cache.cache_dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        log.info("Weather cache stopped")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()